@@ -0,0 +1,123 @@
+# Lightweight stand-ins for the discord.py objects the benchmarked code reads,
+# only the attributes and methods the bot uses are implemented, with no network or gateway behind them
+import asyncio
+import bisect
+import datetime as dt
+
+# reactions are listed 100 users per request, like the real API
+USERS_PER_PAGE = 100
+
+
+class FakeUser:
+    __slots__ = ("id",)
+
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+class FakeMember:
+    __slots__ = ("id", "premium_since")
+
+    def __init__(self, user_id, premium_since=None):
+        self.id = user_id
+        self.premium_since = premium_since
+
+
+class FakeEmoji:
+    __slots__ = ("id", "name", "animated")
+
+    def __init__(self, emoji_id, name, animated=False):
+        self.id = emoji_id
+        self.name = name
+        self.animated = animated
+
+    def __str__(self):
+        return f"<{'a' if self.animated else ''}:{self.name}:{self.id}>"
+
+
+class FakeSticker:
+    __slots__ = ("id", "name")
+
+    def __init__(self, sticker_id, name):
+        self.id = sticker_id
+        self.name = name
+
+
+class FakeGuild:
+    def __init__(self, guild_id, members=(), emojis=(), stickers=(), premium_tier=0):
+        """
+        Args:
+            guild_id (int): ID of guild
+            members (Iterable[FakeMember], optional): cached members. Defaults to none.
+            emojis (Iterable[FakeEmoji], optional): emojis of the guild. Defaults to none.
+            stickers (Iterable[FakeSticker], optional): stickers of the guild. Defaults to none.
+            premium_tier (int, optional): boost tier. Defaults to 0.
+        """
+        self.id = guild_id
+        self._members = {member.id: member for member in members}
+        self.emojis = list(emojis)
+        self.stickers = list(stickers)
+        self.premium_tier = premium_tier
+
+    def get_member(self, user_id):
+        return self._members.get(user_id)
+
+
+class FakeReaction:
+    def __init__(self, emoji, user_ids):
+        """
+        Args:
+            emoji (str): emoji reacted with
+            user_ids (List[int]): IDs of users who reacted
+        """
+        self.emoji = emoji
+        # the API lists users by ID
+        self._user_ids = sorted(user_ids)
+        self.count = len(user_ids)
+
+    async def users(self, limit=None, after=None):
+        """Yield the users who reacted after a user ID, yielding to the event loop once per page like the real requests"""
+        if limit is None:
+            limit = self.count
+        start = bisect.bisect_right(self._user_ids, after.id) if after is not None else 0
+        while limit > 0 and start < len(self._user_ids):
+            await asyncio.sleep(0)
+            page = self._user_ids[start : start + min(limit, USERS_PER_PAGE)]
+            start += len(page)
+            limit -= len(page)
+            for user_id in page:
+                yield FakeUser(user_id)
+
+
+class FakeMessage:
+    def __init__(self, message_id, reactions, guild=None):
+        self.id = message_id
+        self.reactions = reactions
+        self.guild = guild
+
+
+def make_voters(voter_count, privileged_share, nitro_share, first_user_id=10**17):
+    """Make a guild full of voters, some privileged and some boosting
+
+    Args:
+        voter_count (int): number of voters
+        privileged_share (float): fraction of voters that are privileged users
+        nitro_share (float): fraction of voters boosting the guild, for up to two years
+
+    Returns:
+        List[int], set[int], FakeGuild: voter IDs, IDs of privileged voters, guild with every voter cached
+    """
+    now = dt.datetime.now(dt.timezone.utc)
+    user_ids = [first_user_id + i for i in range(voter_count)]
+    privileged_every = int(1 / privileged_share) if privileged_share else None
+    nitro_every = int(1 / nitro_share) if nitro_share else None
+    privileged_ids = set()
+    members = []
+    for i, user_id in enumerate(user_ids):
+        if privileged_every and i % privileged_every == 0:
+            privileged_ids.add(user_id)
+        premium_since = None
+        if nitro_every and i % nitro_every == 1:
+            premium_since = now - dt.timedelta(days=i % 730)
+        members.append(FakeMember(user_id, premium_since))
+    return user_ids, privileged_ids, FakeGuild(1, members=members)
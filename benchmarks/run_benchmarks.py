@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import datetime as dt
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# run from anywhere, the bot's modules and config.py are in the parent directory
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+
+from PIL import Image  # noqa: E402
+
+import guild_settings  # noqa: E402
+import poll_store  # noqa: E402
+import utils  # noqa: E402
+from benchmarks.fakes import FakeEmoji  # noqa: E402
+from benchmarks.fakes import FakeGuild  # noqa: E402
+from benchmarks.fakes import FakeMessage  # noqa: E402
+from benchmarks.fakes import FakeReaction  # noqa: E402
+from benchmarks.fakes import FakeSticker  # noqa: E402
+from benchmarks.fakes import make_voters  # noqa: E402
+from config import MAX_IMAGE_FILE_SIZE  # noqa: E402
+from config import MAX_IMAGE_SIZE  # noqa: E402
+from config import POLL_NO_EMOJI  # noqa: E402
+from config import POLL_YES_EMOJI  # noqa: E402
+from emoji_index import GuildEmojiIndex  # noqa: E402
+from poll_counters import PollCounter  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(REPO_DIRECTORY, "benchmarks", "baseline.json")
+# a benchmark is reported as a regression when its median is this much slower than the baseline
+DEFAULT_TOLERANCE = 0.25
+
+POLL_TYPES = ["addemoji", "addsticker", "deleteemoji", "renameemoji", "changeemoji"]
+
+# name -> (function doing the setup and returning the function to time, times to run it), see `benchmark`
+BENCHMARKS = {}
+
+
+def benchmark(name, repeat=5):
+    """Register a benchmark
+
+    The decorated function does the setup and returns the function to time, called `repeat` times.
+    Coroutine functions are run to completion on a fresh event loop each time.
+
+    Args:
+        name (str): name of benchmark, as saved in baselines
+        repeat (int, optional): how many times to time it. Defaults to 5.
+    """
+
+    def register(make_timed):
+        BENCHMARKS[name] = (make_timed, repeat)
+        return make_timed
+
+    return register
+
+
+def make_vote_benchmark(voter_count):
+    def setup(quick):
+        count = voter_count // 10 if quick else voter_count
+        user_ids, privileged_ids, guild = make_voters(
+            count, privileged_share=0.01, nitro_share=0.05
+        )
+        # give the fake guild the privileged voters made up above, in memory only
+        guild_settings.use_guild_settings(
+            guild.id,
+            guild_settings.DEFAULT_SETTINGS._replace(
+                privileged_user_ids=frozenset(privileged_ids)
+            ),
+        )
+        # roughly two thirds vote yes, a few vote both ways
+        split = count * 2 // 3
+        message = FakeMessage(
+            1,
+            [
+                FakeReaction(POLL_YES_EMOJI, user_ids[:split]),
+                FakeReaction(POLL_NO_EMOJI, user_ids[split - count // 100 :]),
+            ],
+            guild,
+        )
+
+        async def timed():
+            await utils.get_votes(message, self_bot_id=0, guild=guild)
+
+        return timed
+
+    return setup
+
+
+benchmark("get_votes_10k_voters")(make_vote_benchmark(10_000))
+benchmark("get_votes_100k_voters", repeat=3)(make_vote_benchmark(100_000))
+
+
+@benchmark("emoji_index_lookup_250_emojis", repeat=20)
+def emoji_index_lookup(quick):
+    emojis = [FakeEmoji(i, f"emoji_{i}", animated=i % 5 == 0) for i in range(250)]
+    stickers = [FakeSticker(i, f"sticker_{i}") for i in range(60)]
+    guild = FakeGuild(1, emojis=emojis, stickers=stickers, premium_tier=3)
+    # half of the lookups are for names that don't exist, like a poll for a new emoji
+    names = [f"emoji_{i}" for i in range(0, 500, 2)] * 4
+
+    def timed():
+        index = GuildEmojiIndex(guild.emojis, guild.stickers, guild.premium_tier)
+        for name in names:
+            index.get_emoji(name)
+        index.count_emojis(True)
+
+    return timed
+
+
+# temporary directory of the database fill_poll_store made last, deleted when the next one is made
+_poll_store_directory = None
+
+
+def fill_poll_store(poll_count, guild_count=50, channels_per_guild=4, creator_count=2000):
+    """Point the poll store at a new temporary database holding made up polls
+
+    Args:
+        poll_count (int): number of polls
+        guild_count (int, optional): guilds the polls are spread over. Defaults to 50.
+        channels_per_guild (int, optional): poll channels per guild. Defaults to 4.
+        creator_count (int, optional): distinct poll creators. Defaults to 2000.
+    """
+    global _poll_store_directory
+    directory = tempfile.TemporaryDirectory(prefix="poll-benchmark-")
+    poll_store.use_database(os.path.join(directory.name, "polls.db"))
+    if _poll_store_directory is not None:
+        _poll_store_directory.cleanup()
+    _poll_store_directory = directory
+    rng = random.Random(0)
+    now = time.time()
+    rows = []
+    for i in range(poll_count):
+        guild_id = 1000 + i % guild_count
+        message_id = poll_store.timestamp_to_snowflake(now - poll_count + i) + i
+        poll_type = POLL_TYPES[i % len(POLL_TYPES)]
+        rows.append(
+            poll_store.Poll(
+                guild_id=guild_id,
+                channel_id=guild_id * 10 + i % channels_per_guild,
+                message_id=message_id,
+                creator_id=rng.randrange(creator_count),
+                poll_type=poll_type,
+                created_at=now - poll_count + i,
+                expires_at=now + rng.randrange(24 * 60 * 60),
+                target_name=f"name_{i}",
+                new_name=f"new_name_{i}" if poll_type.startswith("rename") else None,
+                image_url=None,
+                image_hash=None,
+                animated=None,
+            )
+        )
+    poll_store.save_polls(rows)
+
+
+@benchmark("count_polls_by_creator_100k_polls")
+def count_polls_by_creator(quick):
+    fill_poll_store(10_000 if quick else 100_000)
+
+    def timed():
+        counter = PollCounter()
+        counter.load_all()
+        for creator_id in range(100):
+            counter.count(1000, 10000, creator_id)
+
+    return timed
+
+
+@benchmark("get_active_polls_100k_polls")
+def get_active_polls(quick):
+    fill_poll_store(10_000 if quick else 100_000)
+
+    def timed():
+        poll_store.get_active_polls()
+        poll_store.get_active_polls(guild_id=1000)
+
+    return timed
+
+
+@benchmark("get_polls_page_100k_polls", repeat=20)
+def get_polls_page(quick):
+    fill_poll_store(10_000 if quick else 100_000)
+
+    def timed():
+        polls, _ = poll_store.get_polls_page(1000, 10)
+        # the next page, filtered by type
+        poll_store.get_polls_page(
+            1000, 10, after_message_id=polls[-1].message_id, poll_type="addemoji"
+        )
+
+    return timed
+
+
+@benchmark("build_poll_digests_100k_polls", repeat=3)
+def build_poll_digests(quick):
+    fill_poll_store(10_000 if quick else 100_000)
+    polls = poll_store.get_active_polls()
+
+    def timed():
+        utils.build_poll_digests(polls)
+
+    return timed
+
+
+def make_image_corpus(directory):
+    """Write large images of the kinds users propose to a directory
+
+    Args:
+        directory (str): directory to write to
+    """
+    rng = random.Random(0)
+    noise = Image.frombytes("RGB", (2048, 2048), rng.randbytes(2048 * 2048 * 3))
+    noise.save(os.path.join(directory, "noise.png"))
+    gradient = Image.linear_gradient("L").resize((3000, 2000)).convert("RGB")
+    gradient.save(os.path.join(directory, "photo.jpg"), quality=95)
+    transparent = Image.radial_gradient("L").resize((1024, 1024))
+    transparent = Image.merge("RGBA", (transparent, transparent, transparent, transparent))
+    transparent.save(os.path.join(directory, "transparent.png"))
+    frames = [
+        Image.frombytes("RGB", (480, 480), rng.randbytes(480 * 480 * 3)) for _ in range(30)
+    ]
+    frames[0].save(
+        os.path.join(directory, "animated.gif"),
+        save_all=True,
+        append_images=frames[1:],
+        duration=40,
+        loop=0,
+    )
+
+
+def read_images(directory):
+    """Read every file in a directory
+
+    Args:
+        directory (str): directory to read
+
+    Returns:
+        List[bytes]: file contents, sorted by file name
+    """
+    images = []
+    for file_name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, file_name), "rb") as f:
+            images.append(f.read())
+    return images
+
+
+@benchmark("fit_images_corpus", repeat=3)
+def fit_images(quick, image_directory=None):
+    if image_directory is None:
+        with tempfile.TemporaryDirectory(prefix="image-benchmark-") as image_directory:
+            make_image_corpus(image_directory)
+            images = read_images(image_directory)
+    else:
+        images = read_images(image_directory)
+    if quick:
+        images = images[:2]
+
+    def timed():
+        for image in images:
+            utils.fit_any_image(image, MAX_IMAGE_SIZE, MAX_IMAGE_FILE_SIZE)
+
+    return timed
+
+
+def time_benchmark(timed, repeat):
+    """Time a benchmark
+
+    Args:
+        timed (Callable): function or coroutine function to time
+        repeat (int): how many times to time it
+
+    Returns:
+        dict[str,float]: fastest, median and mean time in seconds
+    """
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        if asyncio.iscoroutinefunction(timed):
+            asyncio.run(timed())
+        else:
+            timed()
+        times.append(time.perf_counter() - started)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.mean(times),
+        "repeat": repeat,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Compare results with a baseline
+
+    Args:
+        results (dict): benchmark results
+        baseline (dict): saved benchmark results
+        tolerance (float): slowdown allowed before a benchmark counts as a regression, e.g. 0.25 for 25%
+
+    Returns:
+        List[str]: names of benchmarks that regressed
+    """
+    regressions = []
+    for name, result in results["benchmarks"].items():
+        saved = baseline["benchmarks"].get(name)
+        if saved is None:
+            print(f"{name}: no baseline")
+            continue
+        change = result["median"] / saved["median"] - 1
+        regressed = change > tolerance
+        if regressed:
+            regressions.append(name)
+        print(f"{name}: {change:+.1%} against baseline{' REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the bot's hot paths against fake Discord objects and compare with a baseline"
+    )
+    parser.add_argument("--filter", default="", help="only run benchmarks whose name contains this")
+    parser.add_argument("--quick", action="store_true", help="run with a tenth of the data, to check the suite works")
+    parser.add_argument("--images", help="directory of images to fit instead of generated ones")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline to compare with")
+    parser.add_argument("--save-baseline", action="store_true", help="save the results as the new baseline")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args()
+
+    results = {
+        "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "benchmarks": {},
+    }
+    for name, (make_timed, repeat) in BENCHMARKS.items():
+        if args.filter not in name:
+            continue
+        if make_timed is fit_images:
+            timed = make_timed(args.quick, args.images)
+        else:
+            timed = make_timed(args.quick)
+        result = time_benchmark(timed, repeat)
+        results["benchmarks"][name] = result
+        print(f"{name}: median {result['median'] * 1000:.1f}ms, min {result['min'] * 1000:.1f}ms")
+    # let the temporary database be deleted
+    poll_store.close_connection()
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(output)
+        print(f"Saved baseline to {args.baseline}")
+        return
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("quick") != args.quick:
+            print("Baseline was made with a different --quick setting, not comparing")
+            return
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
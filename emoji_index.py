@@ -0,0 +1,175 @@
+class GuildEmojiIndex:
+    """Emojis and stickers of one guild by name, with the counts used for slot checks
+
+    Works with both discord.py and interactions objects, only `name` and `animated` are read.
+    """
+
+    def __init__(self, emojis, stickers, premium_tier):
+        """
+        Args:
+            emojis (list[Union(interaction.Emoji,discord.Emoji)]): emojis of the guild
+            stickers (list[Union(interaction.Sticker,discord.GuildSticker)]): stickers of the guild
+            premium_tier (int): boost tier of the guild
+        """
+        self.premium_tier = premium_tier
+        self.set_emojis(emojis)
+        self.set_stickers(stickers)
+
+    def set_emojis(self, emojis):
+        """Replace the indexed emojis
+
+        Args:
+            emojis (list[Union(interaction.Emoji,discord.Emoji)]): every emoji of the guild
+        """
+        self._emojis = {}
+        self.static_emoji_count = 0
+        self.animated_emoji_count = 0
+        for emoji in emojis:
+            # if two emojis share a name, keep the first like a scan of the list would
+            self._emojis.setdefault(emoji.name, emoji)
+            if emoji.animated:
+                self.animated_emoji_count += 1
+            else:
+                self.static_emoji_count += 1
+
+    def set_stickers(self, stickers):
+        """Replace the indexed stickers
+
+        Args:
+            stickers (list[Union(interaction.Sticker,discord.GuildSticker)]): every sticker of the guild
+        """
+        self._stickers = {}
+        self.sticker_count = 0
+        for sticker in stickers:
+            self._stickers.setdefault(sticker.name, sticker)
+            self.sticker_count += 1
+
+    def get_emoji(self, name):
+        """Get an emoji by name
+
+        Args:
+            name (str): name of emoji
+
+        Returns:
+            Union(interaction.Emoji,discord.Emoji): emoji, or None if the guild has no emoji with that name
+        """
+        return self._emojis.get(name)
+
+    def get_sticker(self, name):
+        """Get a sticker by name
+
+        Args:
+            name (str): name of sticker
+
+        Returns:
+            Union(interaction.Sticker,discord.GuildSticker): sticker, or None if the guild has no sticker with that name
+        """
+        return self._stickers.get(name)
+
+    def count_emojis(self, animated):
+        """Count the emojis using one kind of slot
+
+        Args:
+            animated (bool): count animated emojis if True, static emojis if False
+
+        Returns:
+            int: number of emojis
+        """
+        if animated:
+            return self.animated_emoji_count
+        return self.static_emoji_count
+
+
+class GuildEmojiIndexes:
+    """Emoji/sticker indexes of every guild a client is in
+
+    Each client keeps its own indexes, as the indexed objects belong to its library.
+    """
+
+    def __init__(self):
+        self._indexes = {}
+
+    def index_guild(self, guild):
+        """Build the index of a guild from its emojis and stickers, replacing any previous index
+
+        Args:
+            guild (Union(interactions.Guild,discord.Guild)): guild to index
+
+        Returns:
+            GuildEmojiIndex: index of the guild
+        """
+        index = GuildEmojiIndex(
+            guild.emojis or [], guild.stickers or [], guild.premium_tier or 0
+        )
+        self._indexes[int(guild.id)] = index
+        return index
+
+    def get(self, guild_id):
+        """Get the index of a guild, if it has been built
+
+        Args:
+            guild_id (int): ID of guild
+
+        Returns:
+            GuildEmojiIndex: index of the guild, or None if it hasn't been indexed
+        """
+        return self._indexes.get(int(guild_id))
+
+    def get_or_index_guild(self, guild):
+        """Get the index of a guild, building it on first use
+
+        Args:
+            guild (Union(interactions.Guild,discord.Guild)): guild to index
+
+        Returns:
+            GuildEmojiIndex: index of the guild
+        """
+        index = self.get(guild.id)
+        if index is None:
+            index = self.index_guild(guild)
+        return index
+
+    def update_emojis(self, guild_id, emojis):
+        """Update the index of a guild after its emojis changed
+
+        Does nothing if the guild hasn't been indexed, it is indexed in full on first use.
+
+        Args:
+            guild_id (int): ID of guild
+            emojis (list[Union(interaction.Emoji,discord.Emoji)]): every emoji of the guild after the change
+        """
+        index = self.get(guild_id)
+        if index is not None:
+            index.set_emojis(emojis or [])
+
+    def update_stickers(self, guild_id, stickers):
+        """Update the index of a guild after its stickers changed
+
+        Does nothing if the guild hasn't been indexed, it is indexed in full on first use.
+
+        Args:
+            guild_id (int): ID of guild
+            stickers (list[Union(interaction.Sticker,discord.GuildSticker)]): every sticker of the guild after the change
+        """
+        index = self.get(guild_id)
+        if index is not None:
+            index.set_stickers(stickers or [])
+
+    def update_premium_tier(self, guild_id, premium_tier):
+        """Update the boost tier of an indexed guild
+
+        Args:
+            guild_id (int): ID of guild
+            premium_tier (int): boost tier of the guild
+        """
+        index = self.get(guild_id)
+        if index is not None:
+            index.premium_tier = premium_tier or 0
+
+    def forget_guild(self, guild_id):
+        """Drop the index of a guild the bot left
+
+        Args:
+            guild_id (int): ID of guild
+        """
+        self._indexes.pop(int(guild_id), None)
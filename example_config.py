@@ -1,5 +1,8 @@
 # DO NOT PLACE ANY SENSITIVE INFORMATION, LIKE TOKENS OR PASSWORDS, IN THE CONFIG FILE
-# ITS FULL CONTENTS CAN BE DISPLAYED BY ANYONE ON THE SERVER WITH THE `/show-config` COMMAND
+# THE POLL SETTINGS CAN BE DISPLAYED BY ANYONE ON THE SERVER WITH THE `/show-config` COMMAND
+# The poll pass threshold and duration, minimum votes, privileged users and their weight, allowed channels,
+# protected names, active poll limit and its scope and whether to apply passed polls are defaults,
+# each server can change them for itself with `/set-config`
 # % of the people who voted must have voted yes
 POLL_PASS_THRESHOLD = 2 / 3
 # Time before poll is closed, in seconds
@@ -10,14 +13,54 @@ POLL_YES_EMOJI = "✅"
 POLL_NO_EMOJI = "❌"
 # file containing the bot's token
 TOKEN_FILE_NAME = ".TOKEN"
-# Time between checks for poll results, in seconds
+# SQLite database holding the active polls, shared by the poll creator and results checker
+POLL_DATABASE_FILE_NAME = "polls.db"
+# Unix socket the poll creator and results checker use to tell each other about new and closed polls
+POLL_EVENT_SOCKET_PATH = "poll_events.sock"
+# Number of gateway shards the bot runs in total, None to use the number Discord recommends (the poll creator then runs unsharded)
+SHARD_COUNT = None
+# Shards run by this process, e.g. [0, 1] for the first two of SHARD_COUNT shards, None to run all of them (needs SHARD_COUNT)
+# The poll creator runs one shard per process, so with more than one shard this must list exactly one shard ID
+SHARD_IDS = None
+# Time between checks for newly created polls, in seconds (polls are closed exactly at their deadline regardless)
 WAIT_TIME_BETWEEN_CHECKS = 10 * 60
+# How many due polls can be resolved at the same time
+MAX_CONCURRENT_POLL_RESOLUTIONS = 4
+# How many REST calls to Discord can be in flight at once, across every channel and guild
+MAX_CONCURRENT_REST_CALLS = 8
+# Address the bots serve Prometheus metrics on, at /metrics
+METRICS_HOST = "127.0.0.1"
+# Port of the poll creator's metrics, None to not serve them (main.py serves both bots' metrics on it,
+# or on RESULTS_CHECKER_METRICS_PORT if this is None)
+POLL_CREATOR_METRICS_PORT = 9101
+# Port of the results checker's metrics, None to not serve them
+RESULTS_CHECKER_METRICS_PORT = 9102
+# Interactions taking longer than this are logged with the time each step took, in seconds (Discord allows 3)
+SLOW_INTERACTION_THRESHOLD = 2
+# File every interaction's step timings are appended to as JSON lines, None to not export them
+TRACE_EXPORT_FILE = None
+# Unix socket to profile the poll creator through, with `python profiler.py`, None to not listen
+POLL_CREATOR_ADMIN_SOCKET_PATH = "poll_creator_admin.sock"
+# Unix socket to profile the results checker through, also used by `/debug-profile`, None to not listen
+RESULTS_CHECKER_ADMIN_SOCKET_PATH = "results_checker_admin.sock"
+# Longest CPU or memory profile `/debug-profile` and the admin sockets take, in seconds
+MAX_PROFILE_DURATION = 5 * 60
 # Max area of image in pixels, set by discord so be careful changing this
 MAX_IMAGE_SIZE = 320**2
 # Max file size of image, set by discord so be careful changing this)
 MAX_IMAGE_FILE_SIZE = 256000
-# Name of temporary image file for adding emojis and stickers
-TEMP_IMAGE_FILE_NAME = "adding_image_temp"
+# Longest time to wait for an image to download, in seconds
+IMAGE_DOWNLOAD_TIMEOUT = 30
+# Largest image that will be downloaded, in bytes
+MAX_IMAGE_DOWNLOAD_SIZE = 20 * 1024 * 1024
+# How many images can be downloaded from the same host at once
+MAX_IMAGE_DOWNLOAD_CONNECTIONS_PER_HOST = 4
+# How long to wait for a proposed image to download before making its poll anyway, in seconds
+IMAGE_PREFETCH_WAIT = 2
+# Directory where proposed images are kept, ready to be uploaded when their poll passes
+IMAGE_CACHE_DIRECTORY = "image_cache"
+# Largest total size of the image cache, in bytes
+IMAGE_CACHE_MAX_SIZE = 100 * 1024 * 1024
 # Whether to automatically add/delete emojis/stickers
 AUTOMATICALLY_ADD_EMOJIS = True
 # Minimum number of votes for a poll to be considered valid
@@ -34,10 +77,14 @@ ALLOWED_CHANNEL_IDS = [
 ]
 # Emoji names that can not be modified by the bot
 PROTECTED_EMOTE_NAMES = []
-# Hours to post poll updates, in UTC
+# Hours to refresh the pinned digest of active polls in each channel, in UTC
 POLL_UPDATE_POST_TIMES = []
 # How many polls can be active at once per user
 ACTIVE_POLLS_PER_USER_LIMIT = 2
+# Where the limit above applies, "channel" (per channel) or "guild" (across the whole server)
+ACTIVE_POLLS_LIMIT_SCOPE = "channel"
+# Seconds between checks that the in-memory count of active polls per user matches the poll store
+POLL_COUNTER_CHECK_INTERVAL = 60 * 60
 
 
 # Function to Determine how Nitro Booster Voting Weight scales with # months
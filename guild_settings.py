@@ -0,0 +1,333 @@
+import logging
+import math
+import re
+from collections import namedtuple
+
+from config import ACTIVE_POLLS_LIMIT_SCOPE
+from config import ACTIVE_POLLS_PER_USER_LIMIT
+from config import ALLOWED_CHANNEL_IDS
+from config import AUTOMATICALLY_ADD_EMOJIS
+from config import MINIMUM_VOTES_FOR_POLL
+from config import POLL_DURATION
+from config import POLL_PASS_THRESHOLD
+from config import PRIVILEGED_USER_IDS
+from config import PRIVILEGED_USER_VOTE_WEIGHT
+from config import PROTECTED_EMOTE_NAMES
+from poll_events import GUILD_SETTINGS_CHANGED
+from poll_events import publish
+from poll_events import subscribe
+from poll_store import get_guild_setting_overrides
+from poll_store import remove_guild_setting
+from poll_store import save_guild_setting
+
+
+class InvalidSettingError(ValueError):
+    """Raised when a setting doesn't exist or a value isn't allowed for it"""
+
+
+def _check_number(value):
+    # bools are ints to Python, and inf/nan would pass the range checks of some settings
+    if isinstance(value, bool) or not math.isfinite(value):
+        raise ValueError(value)
+
+
+def _parse_fraction(value):
+    if isinstance(value, str):
+        value = value.strip()
+        if value.endswith("%"):
+            value = float(value[:-1]) / 100
+        elif "/" in value:
+            numerator, denominator = value.split("/")
+            value = float(numerator) / float(denominator)
+        else:
+            value = float(value)
+    _check_number(value)
+    if not 0 < value <= 1:
+        raise ValueError(value)
+    return value
+
+
+def _parse_duration(value):
+    if isinstance(value, str):
+        value = value.strip().lower()
+        unit = {"s": 1, "m": 60, "h": 60 * 60, "d": 24 * 60 * 60}.get(value[-1:])
+        value = float(value[:-1]) * unit if unit else float(value)
+    _check_number(value)
+    if not value >= 1:
+        raise ValueError(value)
+    return int(value)
+
+
+def _parse_count(value):
+    if isinstance(value, str):
+        value = int(value.strip())
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(value)
+    return value
+
+
+def _parse_weight(value):
+    if isinstance(value, str):
+        value = float(value.strip())
+        value = int(value) if value.is_integer() else value
+    _check_number(value)
+    if not value >= 0:
+        raise ValueError(value)
+    return value
+
+
+def _parse_scope(value):
+    if value not in ("channel", "guild"):
+        raise ValueError(value)
+    return value
+
+
+def _parse_boolean(value):
+    if isinstance(value, str):
+        value = {"true": True, "yes": True, "on": True, "false": False, "no": False, "off": False}[
+            value.strip().lower()
+        ]
+    if not isinstance(value, bool):
+        raise ValueError(value)
+    return value
+
+
+def _parse_ids(value):
+    if isinstance(value, str):
+        if value.strip().lower() == "none":
+            return frozenset()
+        # bare IDs or mentions, e.g. "<#123> <#456>", anything else is likely a typo
+        ids = []
+        for part in re.split(r"[\s,]+|(?<=>)(?=<)", value.strip()):
+            match = re.fullmatch(r"<(?:#|@!?)(\d+)>|(\d+)", part)
+            if match is None:
+                raise ValueError(value)
+            ids.append(int(match.group(1) or match.group(2)))
+        return frozenset(ids)
+    return frozenset(int(i) for i in value)
+
+
+def _parse_names(value):
+    if isinstance(value, str):
+        value = [name.strip(":") for name in re.split(r"[\s,]+", value) if name.strip(":")]
+    if not all(isinstance(name, str) for name in value):
+        raise ValueError(value)
+    return frozenset(value)
+
+
+Setting = namedtuple("Setting", ["default", "parse", "requirement"])
+Setting.__doc__ = """A setting each guild can change, with its default from config.py
+
+parse turns a value from config.py, the poll store or a command into the value the bot uses, raising
+ValueError/TypeError/KeyError/ArithmeticError if it isn't allowed. requirement describes the allowed values.
+"""
+
+# settings each guild can change, named as in config.py
+SETTINGS = {
+    "POLL_PASS_THRESHOLD": Setting(
+        POLL_PASS_THRESHOLD,
+        _parse_fraction,
+        "a fraction of the votes above 0 and up to 1, like 0.66, 66% or 2/3",
+    ),
+    "POLL_DURATION": Setting(
+        POLL_DURATION,
+        _parse_duration,
+        "a number of seconds of at least 1, or a number followed by s, m, h or d, like 12h",
+    ),
+    "MINIMUM_VOTES_FOR_POLL": Setting(
+        MINIMUM_VOTES_FOR_POLL, _parse_weight, "a number of votes of at least 0"
+    ),
+    "ALLOWED_CHANNEL_IDS": Setting(
+        ALLOWED_CHANNEL_IDS, _parse_ids, "channel IDs or mentions, like <#123> <#456>, or none"
+    ),
+    "PROTECTED_EMOTE_NAMES": Setting(
+        PROTECTED_EMOTE_NAMES, _parse_names, "emoji/sticker names, like :name: or name1, name2"
+    ),
+    "ACTIVE_POLLS_PER_USER_LIMIT": Setting(
+        ACTIVE_POLLS_PER_USER_LIMIT, _parse_count, "a whole number of polls of at least 0"
+    ),
+    "ACTIVE_POLLS_LIMIT_SCOPE": Setting(
+        ACTIVE_POLLS_LIMIT_SCOPE, _parse_scope, '"channel" or "guild"'
+    ),
+    "PRIVILEGED_USER_IDS": Setting(
+        PRIVILEGED_USER_IDS, _parse_ids, "user IDs or mentions, like <@123> <@456>, or none"
+    ),
+    "PRIVILEGED_USER_VOTE_WEIGHT": Setting(
+        PRIVILEGED_USER_VOTE_WEIGHT, _parse_weight, "an extra weight of at least 0"
+    ),
+    "AUTOMATICALLY_ADD_EMOJIS": Setting(
+        AUTOMATICALLY_ADD_EMOJIS, _parse_boolean, "true or false"
+    ),
+}
+
+GuildSettings = namedtuple("GuildSettings", [name.lower() for name in SETTINGS])
+GuildSettings.__doc__ = """Settings of a guild, validated and ready to use
+
+Fields are the names in SETTINGS in lower case. ID and name lists are frozensets for O(1) lookups.
+"""
+
+
+def parse_setting(name, value):
+    """Check that a value is allowed for a setting and convert it to the value the bot uses
+
+    Args:
+        name (str): name of the setting, as in config.py
+        value (Any): value from config.py or the poll store, or text typed into a command
+
+    Raises:
+        InvalidSettingError: if there is no such setting or the value isn't allowed
+
+    Returns:
+        Any: value the bot uses
+    """
+    if name not in SETTINGS:
+        raise InvalidSettingError(f"There is no setting called {name}")
+    try:
+        return SETTINGS[name].parse(value)
+    except (ValueError, TypeError, KeyError, ArithmeticError):
+        raise InvalidSettingError(f"{name} must be {SETTINGS[name].requirement}, not {value!r}")
+
+
+def to_stored_value(value):
+    """Convert a parsed setting value to one that can be saved as JSON
+
+    Args:
+        value (Any): value returned by parse_setting
+
+    Returns:
+        Any: value with sets turned into sorted lists
+    """
+    if isinstance(value, frozenset):
+        return sorted(value)
+    return value
+
+
+## defaults for every guild, a mistake in config.py stops the bot at startup
+DEFAULT_SETTINGS = GuildSettings(
+    *(parse_setting(name, setting.default) for name, setting in SETTINGS.items())
+)
+
+# guild ID -> settings of guilds that changed any, others use DEFAULT_SETTINGS
+_guild_settings = {}
+# guild ID -> stored value of each setting the guild changed, by name
+_guild_overrides = {}
+
+
+def get_guild_settings(guild_id):
+    """Get the settings of a guild from memory
+
+    Args:
+        guild_id (int): ID of guild
+
+    Returns:
+        GuildSettings: settings of the guild
+    """
+    return _guild_settings.get(int(guild_id), DEFAULT_SETTINGS)
+
+
+def get_guild_overrides(guild_id):
+    """Get the settings a guild changed from their defaults
+
+    Args:
+        guild_id (int): ID of guild
+
+    Returns:
+        dict[str,Any]: stored value of each changed setting by name
+    """
+    return dict(_guild_overrides.get(int(guild_id), {}))
+
+
+def _apply_overrides(guild_id, overrides):
+    """Validate the stored settings of a guild and keep them in memory
+
+    Settings that no longer exist or whose value isn't allowed anymore are logged and left at their default.
+
+    Args:
+        guild_id (int): ID of guild
+        overrides (dict[str,Any]): stored value of each changed setting by name
+    """
+    values = {}
+    for name, value in overrides.items():
+        try:
+            values[name.lower()] = parse_setting(name, value)
+        except InvalidSettingError as e:
+            logging.warning(f"Ignoring a setting of guild {guild_id}: {e}")
+    if values:
+        _guild_settings[guild_id] = DEFAULT_SETTINGS._replace(**values)
+        _guild_overrides[guild_id] = {
+            name: value for name, value in overrides.items() if name.lower() in values
+        }
+    else:
+        _guild_settings.pop(guild_id, None)
+        _guild_overrides.pop(guild_id, None)
+
+
+def use_guild_settings(guild_id, settings):
+    """Give a guild settings in this process only, without storing them, e.g. for benchmarks
+
+    They last until the guild's settings are next read from the store.
+
+    Args:
+        guild_id (int): ID of guild
+        settings (GuildSettings): settings of the guild
+    """
+    _guild_settings[int(guild_id)] = settings
+
+
+def load_all_guild_settings():
+    """Read the settings of every guild from the store"""
+    overrides = get_guild_setting_overrides()
+    _guild_settings.clear()
+    _guild_overrides.clear()
+    for guild_id, guild_overrides in overrides.items():
+        _apply_overrides(guild_id, guild_overrides)
+
+
+def load_guild_settings(guild_id):
+    """Read the settings of one guild from the store, after they were changed
+
+    Args:
+        guild_id (int): ID of guild
+    """
+    guild_id = int(guild_id)
+    _apply_overrides(guild_id, get_guild_setting_overrides(guild_id).get(guild_id, {}))
+
+
+def set_guild_setting(guild_id, name, value):
+    """Change a setting of a guild, for both bots
+
+    Args:
+        guild_id (int): ID of guild
+        name (str): name of the setting, as in config.py
+        value (Any): new value, e.g. text typed into a command
+
+    Raises:
+        InvalidSettingError: if there is no such setting or the value isn't allowed
+
+    Returns:
+        Any: value the bot uses
+    """
+    parsed = parse_setting(name, value)
+    save_guild_setting(guild_id, name, to_stored_value(parsed))
+    publish(GUILD_SETTINGS_CHANGED, int(guild_id))
+    return parsed
+
+
+def reset_guild_setting(guild_id, name):
+    """Put a setting of a guild back to its default from config.py, for both bots
+
+    Args:
+        guild_id (int): ID of guild
+        name (str): name of the setting, as in config.py
+
+    Raises:
+        InvalidSettingError: if there is no such setting
+    """
+    if name not in SETTINGS:
+        raise InvalidSettingError(f"There is no setting called {name}")
+    remove_guild_setting(guild_id, name)
+    publish(GUILD_SETTINGS_CHANGED, int(guild_id))
+
+
+# a change made here or relayed from the other bot process is read back from the store
+subscribe(GUILD_SETTINGS_CHANGED, load_guild_settings)
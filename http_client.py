@@ -0,0 +1,104 @@
+import asyncio
+
+import aiohttp
+
+from config import IMAGE_DOWNLOAD_TIMEOUT
+from config import MAX_IMAGE_DOWNLOAD_CONNECTIONS_PER_HOST
+from config import MAX_IMAGE_DOWNLOAD_SIZE
+
+# read responses in pieces so oversized images are dropped before they are fully downloaded
+CHUNK_SIZE = 64 * 1024
+# Discord's address, loadtest/run_bot.py points it at a fake Discord
+DISCORD_URL = "https://discord.com"
+
+
+class ImageDownloadError(Exception):
+    """Raised when an image could not be downloaded"""
+
+
+_session = None
+
+
+def get_session():
+    """Get the HTTP session shared by every image download, creating it on first use
+
+    Must be called from inside the running event loop.
+
+    Returns:
+        aiohttp.ClientSession: shared session
+    """
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=MAX_IMAGE_DOWNLOAD_CONNECTIONS_PER_HOST
+            ),
+            timeout=aiohttp.ClientTimeout(total=IMAGE_DOWNLOAD_TIMEOUT),
+        )
+    return _session
+
+
+async def close_session():
+    """Close the shared HTTP session, if it is open"""
+    if _session is not None and not _session.closed:
+        await _session.close()
+
+
+async def download_image(url):
+    """Download an image
+
+    Args:
+        url (str): URL of image
+
+    Raises:
+        ImageDownloadError: if the request fails, times out, or the image is larger than MAX_IMAGE_DOWNLOAD_SIZE
+
+    Returns:
+        bytes: image file contents
+    """
+    try:
+        async with get_session().get(url) as response:
+            if response.status != 200:
+                raise ImageDownloadError(f"Status code: {response.status}")
+            if (
+                response.content_length is not None
+                and response.content_length > MAX_IMAGE_DOWNLOAD_SIZE
+            ):
+                raise ImageDownloadError(
+                    f"Image is larger than {MAX_IMAGE_DOWNLOAD_SIZE} bytes"
+                )
+            image = bytearray()
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                image += chunk
+                if len(image) > MAX_IMAGE_DOWNLOAD_SIZE:
+                    raise ImageDownloadError(
+                        f"Image is larger than {MAX_IMAGE_DOWNLOAD_SIZE} bytes"
+                    )
+            return bytes(image)
+    except asyncio.TimeoutError:
+        raise ImageDownloadError(
+            f"Timed out after {IMAGE_DOWNLOAD_TIMEOUT} seconds"
+        ) from None
+    except aiohttp.ClientError as e:
+        raise ImageDownloadError(str(e)) from e
+
+
+async def fetch_application_info(token):
+    """Get the bot's application from Discord's REST API, with its owner and team
+
+    Args:
+        token (str): bot token
+
+    Raises:
+        aiohttp.ClientError: if the request fails
+        asyncio.TimeoutError: if the request times out
+
+    Returns:
+        dict: application object, as sent by Discord
+    """
+    async with get_session().get(
+        f"{DISCORD_URL}/api/v10/oauth2/applications/@me",
+        headers={"Authorization": f"Bot {token}"},
+        raise_for_status=True,
+    ) as response:
+        return await response.json()
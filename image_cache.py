@@ -0,0 +1,279 @@
+import asyncio
+import hashlib
+import os
+import time
+from io import BytesIO
+
+from PIL import Image
+
+from config import IMAGE_CACHE_DIRECTORY
+from config import IMAGE_CACHE_MAX_SIZE
+from config import MAX_IMAGE_FILE_SIZE
+from config import MAX_IMAGE_SIZE
+from http_client import ImageDownloadError
+from http_client import download_image
+from metrics import Histogram
+from poll_store import get_active_image_hashes
+from poll_store import is_image_in_use
+from utils import ImageTooLargeError
+from utils import fit_any_image
+
+## make image cache directory if it doesn't exist
+os.makedirs(IMAGE_CACHE_DIRECTORY, exist_ok=True)
+
+# suffix of cached images, fitted images may be PNG, GIF or APNG
+IMAGE_SUFFIX = ".img"
+
+IMAGE_DOWNLOAD_SECONDS = Histogram("image_download_seconds", "Time to download an image")
+IMAGE_FIT_SECONDS = Histogram(
+    "image_fit_seconds",
+    "Time to fit an image to the emoji/sticker limits",
+    labels=("animated",),
+)
+
+# what Pillow raises for files that aren't images, are too large to decode or are truncated,
+# anything else is a bug in the fitting code and is left to surface
+IMAGE_READ_ERRORS = (
+    Image.UnidentifiedImageError,
+    Image.DecompressionBombError,
+    OSError,
+)
+
+
+def get_image_path(image_hash):
+    """Get the path of a cached image
+
+    Args:
+        image_hash (str): SHA-256 hex digest of the image
+
+    Returns:
+        str: path of the cached image file
+    """
+    return os.path.join(IMAGE_CACHE_DIRECTORY, image_hash + IMAGE_SUFFIX)
+
+
+def save_image(image):
+    """Add a fitted image to the cache, evicting old images if the cache is over IMAGE_CACHE_MAX_SIZE
+
+    Args:
+        image (bytes): fitted image file contents
+
+    Returns:
+        str: SHA-256 hex digest of the image, used to load it back
+    """
+    image_hash = hashlib.sha256(image).hexdigest()
+    path = get_image_path(image_hash)
+    try:
+        # already cached, mark as recently used
+        os.utime(path)
+    except FileNotFoundError:
+        # write to a temporary name first so the other bot process never reads half an image
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(image)
+        os.replace(temp_path, path)
+        # a prefetched image isn't referenced by a stored poll until the poll is saved
+        evict_images(keep=image_hash)
+    return image_hash
+
+
+def load_image(image_hash):
+    """Load an image from the cache
+
+    Args:
+        image_hash (str): SHA-256 hex digest of the image
+
+    Returns:
+        bytes: image file contents, or None if the image is not cached
+    """
+    try:
+        with open(get_image_path(image_hash), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def discard_image(image_hash):
+    """Delete an image from the cache unless an active poll still uses it
+
+    Args:
+        image_hash (str): SHA-256 hex digest of the image
+    """
+    if image_hash is None or is_image_in_use(image_hash):
+        return
+    try:
+        os.remove(get_image_path(image_hash))
+    except FileNotFoundError:
+        pass
+
+
+def evict_images(keep=None):
+    """Delete least recently used images until the cache is no larger than IMAGE_CACHE_MAX_SIZE
+
+    Images of active polls are only deleted once every other image is gone,
+    the checker downloads them again if it needs them.
+
+    Args:
+        keep (str, optional): SHA-256 hex digest of an image to never delete, e.g. one just saved. Defaults to None.
+    """
+    entries = []
+    total_size = 0
+    with os.scandir(IMAGE_CACHE_DIRECTORY) as it:
+        for entry in it:
+            if entry.name.endswith(IMAGE_SUFFIX):
+                stat = entry.stat()
+                total_size += stat.st_size
+                image_hash = entry.name[: -len(IMAGE_SUFFIX)]
+                if image_hash != keep:
+                    entries.append((image_hash, stat.st_mtime, stat.st_size))
+    if total_size <= IMAGE_CACHE_MAX_SIZE:
+        return
+    in_use = get_active_image_hashes()
+    # unused images first, then oldest first
+    entries.sort(key=lambda entry: (entry[0] in in_use, entry[1]))
+    for image_hash, _, size in entries:
+        if total_size <= IMAGE_CACHE_MAX_SIZE:
+            break
+        try:
+            os.remove(get_image_path(image_hash))
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+
+def get_animation_format(poll_type):
+    """Get the format animated images are encoded in for a type of poll
+
+    Discord accepts animated emojis as GIF and animated stickers as APNG.
+
+    Args:
+        poll_type (str): type of poll, e.g. "addemoji"
+
+    Returns:
+        str: "GIF" for emojis, "PNG" (APNG) for stickers
+    """
+    if poll_type.endswith("sticker"):
+        return "PNG"
+    return "GIF"
+
+
+def is_animated_image(image_bytes):
+    """Check if a downloaded image is animated, by opening it rather than trusting its URL
+
+    Only the headers are read, the frames aren't decoded.
+
+    Args:
+        image_bytes (bytes): contents of the downloaded image file
+
+    Returns:
+        boolean: True if the image has more than one frame, None if it isn't a readable image
+    """
+    try:
+        return getattr(Image.open(BytesIO(image_bytes)), "is_animated", False)
+    except IMAGE_READ_ERRORS:
+        return None
+
+
+async def fetch_image(url):
+    """Download an image
+
+    Args:
+        url (str): URL of image
+
+    Raises:
+        ImageDownloadError: if the image can't be downloaded
+
+    Returns:
+        bytes: contents of the image file
+    """
+    started = time.monotonic()
+    image_bytes = await download_image(url)
+    IMAGE_DOWNLOAD_SECONDS.observe(time.monotonic() - started)
+    return image_bytes
+
+
+async def fit_downloaded_image(image_bytes, animation_format="GIF"):
+    """Fit a downloaded image to the emoji/sticker limits
+
+    Args:
+        image_bytes (bytes): contents of the downloaded image file
+        animation_format (str, optional): format of animated results, see get_animation_format. Defaults to "GIF".
+
+    Raises:
+        ImageDownloadError: if the image can't be read, or can't be shrunk to fit
+
+    Returns:
+        bytes, boolean: fitted image file contents, whether the image is animated
+    """
+    started = time.monotonic()
+    try:
+        image, animated = await asyncio.to_thread(
+            fit_any_image,
+            image_bytes,
+            MAX_IMAGE_SIZE,
+            MAX_IMAGE_FILE_SIZE,
+            animation_format,
+        )
+    except ImageTooLargeError:
+        raise ImageDownloadError(
+            f"image can't be shrunk to fit the {MAX_IMAGE_FILE_SIZE // 1024} KB limit"
+        ) from None
+    except IMAGE_READ_ERRORS:
+        raise ImageDownloadError("file is not a readable image") from None
+    IMAGE_FIT_SECONDS.observe(time.monotonic() - started, animated)
+    return image, animated
+
+
+async def fetch_and_fit_image(url, animation_format="GIF"):
+    """Download an image and fit it to the emoji/sticker limits
+
+    Args:
+        url (str): URL of image
+        animation_format (str, optional): format of animated results, see get_animation_format. Defaults to "GIF".
+
+    Raises:
+        ImageDownloadError: if the image can't be downloaded or read, or can't be shrunk to fit
+
+    Returns:
+        bytes, boolean: fitted image file contents, whether the image is animated
+    """
+    return await fit_downloaded_image(await fetch_image(url), animation_format)
+
+
+async def fit_and_cache_image(download, animation_format="GIF"):
+    """Fit an image to the emoji/sticker limits once it is downloaded and cache the result
+
+    Args:
+        download (Awaitable[bytes]): download of the image, e.g. a task running fetch_image
+        animation_format (str, optional): format of animated results, see get_animation_format. Defaults to "GIF".
+
+    Raises:
+        ImageDownloadError: if the image can't be downloaded or read, or can't be shrunk to fit
+
+    Returns:
+        str, boolean: SHA-256 hex digest of the fitted image, whether the image is animated
+    """
+    image, animated = await fit_downloaded_image(await download, animation_format)
+    return save_image(image), animated
+
+
+async def get_fitted_image(image_hash, url, animation_format="GIF"):
+    """Get the fitted image of a poll, from the cache if possible
+
+    Args:
+        image_hash (str): SHA-256 hex digest of the image saved at poll creation, may be None
+        url (str): URL of image, downloaded again if the image isn't cached
+        animation_format (str, optional): format of animated results, see get_animation_format. Defaults to "GIF".
+
+    Raises:
+        ImageDownloadError: if the image isn't cached and can't be downloaded or read
+
+    Returns:
+        bytes: fitted image file contents
+    """
+    if image_hash is not None:
+        image = load_image(image_hash)
+        if image is not None:
+            return image
+    image, _ = await fetch_and_fit_image(url, animation_format)
+    return image
@@ -0,0 +1,1101 @@
+# A local stand-in for the parts of the Discord REST API and gateway the two bots use, to load test them
+# without touching real Discord. Run the bots against it with loadtest/run_bot.py.
+# It keeps everything in memory, skips authentication and permission checks, and rate limits each route
+# per channel or guild like Discord does, answering 429 with the usual headers once a bucket runs out.
+import argparse
+import asyncio
+import base64
+import datetime as dt
+import json
+import logging
+import time
+import uuid
+import zlib
+from collections import Counter
+from io import BytesIO
+
+from aiohttp import WSMsgType
+from aiohttp import web
+from PIL import Image
+
+DISCORD_EPOCH = 1420070400000
+BOT_ID = 900000000000000001
+# the bot's application has the same ID as the bot user, as on Discord
+APPLICATION_ID = BOT_ID
+# gateway presence, guild members and message content intents
+APPLICATION_FLAGS = (1 << 12) | (1 << 15) | (1 << 19)
+OWNER_ID = 900000000000000002
+FIRST_GUILD_ID = 100000000000000000
+FIRST_USER_ID = 300000000000000000
+HEARTBEAT_INTERVAL = 41250
+
+# requests allowed per bucket and window in seconds, for routes that don't use the default
+ROUTE_RATE_LIMITS = {
+    "create_reaction": (1, 0.25),
+    "delete_own_reaction": (1, 0.25),
+}
+# path parameters that give a route a bucket of its own, as on Discord
+MAJOR_PARAMETERS = ("channel_id", "guild_id", "interaction_id", "token")
+
+BOT_USER = {
+    "id": str(BOT_ID),
+    "username": "Poll Bot",
+    "discriminator": "0001",
+    "avatar": None,
+    "bot": True,
+    "flags": 0,
+    "verified": True,
+    "mfa_enabled": False,
+}
+
+
+def make_user(user_id):
+    return {
+        "id": str(user_id),
+        "username": f"user{user_id % 100000}",
+        "discriminator": f"{user_id % 10000:04}",
+        "avatar": None,
+        "public_flags": 0,
+    }
+
+
+def make_member(user, joined_at, premium_since=None):
+    return {
+        "user": user,
+        "nick": None,
+        "avatar": None,
+        "roles": [],
+        "joined_at": joined_at,
+        "premium_since": premium_since,
+        "deaf": False,
+        "mute": False,
+        "pending": False,
+        "flags": 0,
+    }
+
+
+def json_response(data, status=200, headers=None):
+    # discord.py only parses bodies whose content type is exactly this, without a charset
+    return web.Response(
+        body=json.dumps(data).encode(), status=status, headers=headers, content_type="application/json"
+    )
+
+
+def isoformat(timestamp):
+    return dt.datetime.fromtimestamp(timestamp, dt.timezone.utc).isoformat()
+
+
+def make_test_image(size=256):
+    """Make a PNG to serve for every image URL
+
+    Args:
+        size (int, optional): width and height. Defaults to 256.
+
+    Returns:
+        bytes: PNG file
+    """
+    image = Image.radial_gradient("L").resize((size, size)).convert("RGBA")
+    output = BytesIO()
+    image.save(output, "PNG")
+    return output.getvalue()
+
+
+class GatewaySession:
+    """Gateway connection of one shard of a bot"""
+
+    def __init__(self, websocket, compress):
+        """
+        Args:
+            websocket (web.WebSocketResponse): connection to the bot
+            compress (bool): whether the bot asked for a zlib stream
+        """
+        self.websocket = websocket
+        self._compressor = zlib.compressobj() if compress else None
+        self.session_id = uuid.uuid4().hex
+        self.shard_id = 0
+        self.shard_count = 1
+        self.sequence = 0
+        self.identified = False
+
+    def owns_guild(self, guild_id):
+        return (guild_id >> 22) % self.shard_count == self.shard_id
+
+    async def send(self, payload):
+        data = json.dumps(payload)
+        if self._compressor is None:
+            await self.websocket.send_str(data)
+        else:
+            compressed = self._compressor.compress(data.encode())
+            await self.websocket.send_bytes(compressed + self._compressor.flush(zlib.Z_SYNC_FLUSH))
+
+    async def dispatch(self, event, data):
+        self.sequence += 1
+        await self.send({"op": 0, "t": event, "s": self.sequence, "d": data})
+
+
+class FakeDiscord:
+    """In-memory guilds, channels, messages and reactions served over REST and the gateway
+
+    Tools driving it from the same event loop can send gateway events with `send_command` and `add_reaction`,
+    and watch the bots with `message_listeners` and `interaction_listeners`.
+    """
+
+    def __init__(
+        self,
+        guild_count=10,
+        channels_per_guild=2,
+        members_per_guild=100,
+        emojis_per_guild=10,
+        shard_count=1,
+        rate_limit=5,
+        rate_limit_window=5.0,
+    ):
+        """
+        Args:
+            guild_count (int, optional): guilds the bot is in. Defaults to 10.
+            channels_per_guild (int, optional): text channels in each guild. Defaults to 2.
+            members_per_guild (int, optional): members of each guild besides the bot. Defaults to 100.
+            emojis_per_guild (int, optional): emojis each guild starts with. Defaults to 10.
+            shard_count (int, optional): shards recommended to the bots. Defaults to 1.
+            rate_limit (int, optional): requests allowed per route and channel or guild in each window. Defaults to 5.
+            rate_limit_window (float, optional): length of a rate limit window, in seconds. Defaults to 5.
+        """
+        self.shard_count = shard_count
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.url = None
+        self.image = make_test_image()
+        self._last_snowflake = 0
+        self._runner = None
+        # ID -> object, as sent to the bots
+        self.guilds = {}
+        self.channels = {}
+        self.messages = {}
+        # guild ID -> members, not counting the bot
+        self.members = {}
+        # message ID -> emoji -> IDs of users who reacted, in the order they reacted
+        self.reactions = {}
+        self.pins = {}
+        # interaction token -> (interaction, ID of the response message or None)
+        self.interactions = {}
+        self.sessions = set()
+        # (route name, bucket) -> [requests left, time.monotonic() when the window resets]
+        self._buckets = {}
+        self.requests = Counter()
+        self.rate_limited = Counter()
+        # called with each message created, from the event loop
+        self.message_listeners = []
+        # called with the ID of each interaction when the bot responds to it
+        self.interaction_listeners = []
+        self._make_guilds(guild_count, channels_per_guild, members_per_guild, emojis_per_guild)
+
+    def make_snowflake(self):
+        """Make a new ID holding the current time, like Discord's
+
+        Returns:
+            int: ID
+        """
+        snowflake = (int(time.time() * 1000) - DISCORD_EPOCH) << 22
+        # IDs made in the same millisecond still have to be unique and increasing
+        self._last_snowflake = max(snowflake, self._last_snowflake + 1)
+        return self._last_snowflake
+
+    def _make_guilds(self, guild_count, channels_per_guild, members_per_guild, emojis_per_guild):
+        now = time.time()
+        joined_at = isoformat(now - 365 * 24 * 60 * 60)
+        for i in range(guild_count):
+            # spread the guilds over the shards the way Discord does, by the time in their IDs
+            guild_id = FIRST_GUILD_ID + (i << 22)
+            channels = []
+            for j in range(channels_per_guild):
+                channel = {
+                    "id": str(guild_id + j + 1),
+                    "type": 0,
+                    "guild_id": str(guild_id),
+                    "name": f"polls-{j}",
+                    "position": j,
+                    "permission_overwrites": [],
+                    "nsfw": False,
+                    "parent_id": None,
+                    "topic": None,
+                    "last_message_id": None,
+                    "rate_limit_per_user": 0,
+                }
+                channels.append(channel)
+                self.channels[guild_id + j + 1] = channel
+            members = []
+            for j in range(members_per_guild):
+                user_id = FIRST_USER_ID + i * members_per_guild + j
+                # every tenth member is boosting the guild
+                premium_since = isoformat(now - j * 24 * 60 * 60) if j % 10 == 1 else None
+                members.append(make_member(make_user(user_id), joined_at, premium_since))
+            self.members[guild_id] = members
+            self.guilds[guild_id] = {
+                "id": str(guild_id),
+                "name": f"Guild {i}",
+                "icon": None,
+                "splash": None,
+                "discovery_splash": None,
+                "banner": None,
+                "description": None,
+                "owner_id": str(OWNER_ID),
+                "afk_channel_id": None,
+                "afk_timeout": 300,
+                "verification_level": 0,
+                "default_message_notifications": 0,
+                "explicit_content_filter": 0,
+                "mfa_level": 0,
+                "nsfw_level": 0,
+                "application_id": None,
+                "system_channel_id": None,
+                "system_channel_flags": 0,
+                "rules_channel_id": None,
+                "public_updates_channel_id": None,
+                "vanity_url_code": None,
+                "preferred_locale": "en-US",
+                "features": [],
+                "premium_tier": 0,
+                "premium_subscription_count": len(members) // 10,
+                "premium_progress_bar_enabled": False,
+                "roles": [
+                    {
+                        "id": str(guild_id),
+                        "name": "@everyone",
+                        "permissions": str((1 << 41) - 1),
+                        "position": 0,
+                        "color": 0,
+                        "hoist": False,
+                        "managed": False,
+                        "mentionable": False,
+                    }
+                ],
+                "emojis": [self._make_emoji(f"emoji_{j}") for j in range(emojis_per_guild)],
+                "stickers": [],
+                "channels": channels,
+                "member_count": len(members) + 1,
+                "large": len(members) + 1 > 250,
+            }
+
+    def _make_emoji(self, name, animated=False):
+        return {
+            "id": str(self.make_snowflake()),
+            "name": name,
+            "roles": [],
+            "require_colons": True,
+            "managed": False,
+            "animated": animated,
+            "available": True,
+        }
+
+    def _make_sticker(self, guild_id, name, tags, description):
+        return {
+            "id": str(self.make_snowflake()),
+            "name": name,
+            "tags": tags,
+            "description": description,
+            "type": 2,
+            "format_type": 1,
+            "available": True,
+            "guild_id": str(guild_id),
+        }
+
+    def guild_create_payload(self, guild_id):
+        """The full guild, as sent in GUILD_CREATE when a shard connects
+
+        Args:
+            guild_id (int): ID of guild
+
+        Returns:
+            dict: guild with its channels and the bot as its only cached member
+        """
+        return {
+            **self.guilds[guild_id],
+            "joined_at": isoformat(time.time()),
+            "unavailable": False,
+            "members": [make_member(BOT_USER, isoformat(time.time()))],
+            "voice_states": [],
+            "threads": [],
+            "presences": [],
+            "stage_instances": [],
+            "guild_scheduled_events": [],
+        }
+
+    def message_payload(self, message_id):
+        message = self.messages[message_id]
+        reactions = [
+            {
+                "emoji": {"id": None, "name": emoji},
+                "count": len(user_ids),
+                "me": BOT_ID in user_ids,
+            }
+            for emoji, user_ids in self.reactions.get(message_id, {}).items()
+            if user_ids
+        ]
+        pinned = message_id in self.pins.get(int(message["channel_id"]), ())
+        return {**message, "reactions": reactions, "pinned": pinned}
+
+    def create_message(self, channel_id, data, author=BOT_USER, interaction=None):
+        """Post a message to a channel, telling the bots and the message listeners
+
+        Args:
+            channel_id (int): ID of channel
+            data (dict): content, embeds, message_reference, etc. of the message
+            author (dict, optional): user posting it. Defaults to the bot.
+            interaction (dict, optional): interaction the message responds to. Defaults to None.
+
+        Returns:
+            dict: the message
+        """
+        channel = self.channels[channel_id]
+        message_id = self.make_snowflake()
+        message = {
+            "id": str(message_id),
+            "channel_id": str(channel_id),
+            "guild_id": channel["guild_id"],
+            "author": author,
+            "content": data.get("content") or "",
+            "timestamp": isoformat(time.time()),
+            "edited_timestamp": None,
+            "tts": False,
+            "mention_everyone": False,
+            "mentions": [],
+            "mention_roles": [],
+            "attachments": [],
+            "embeds": data.get("embeds") or [],
+            "components": data.get("components") or [],
+            "flags": data.get("flags") or 0,
+            "type": 0,
+        }
+        if data.get("message_reference"):
+            reference = data["message_reference"]
+            message["type"] = 19
+            message["message_reference"] = {
+                "message_id": str(reference["message_id"]),
+                "channel_id": str(channel_id),
+                "guild_id": channel["guild_id"],
+            }
+        if interaction is not None:
+            message["type"] = 20
+            message["application_id"] = str(APPLICATION_ID)
+            message["interaction"] = {
+                "id": interaction["id"],
+                "type": interaction["type"],
+                "name": interaction["data"]["name"],
+                "user": interaction["member"]["user"],
+            }
+        self.messages[message_id] = message
+        channel["last_message_id"] = str(message_id)
+        # ephemeral responses are only shown to the user, the other bots never see them
+        if not message["flags"] & (1 << 6):
+            self._dispatch_soon(
+                "MESSAGE_CREATE", self.message_payload(message_id), int(channel["guild_id"])
+            )
+        for listener in self.message_listeners:
+            listener(message)
+        return message
+
+    # gateway
+
+    def _dispatch_soon(self, event, data, guild_id):
+        asyncio.get_running_loop().create_task(self.dispatch(event, data, guild_id))
+
+    async def dispatch(self, event, data, guild_id):
+        """Send an event to every connected shard the guild belongs to
+
+        Args:
+            event (str): name of event, e.g. "MESSAGE_REACTION_ADD"
+            data (dict): event data
+            guild_id (int): guild the event is about
+        """
+        sessions = [
+            session
+            for session in self.sessions
+            if session.identified and session.owns_guild(guild_id)
+        ]
+        await asyncio.gather(
+            *(session.dispatch(event, data) for session in sessions), return_exceptions=True
+        )
+
+    async def send_command(self, guild_id, channel_id, user_id, name, options):
+        """Send a slash command to the bots as if a member used it
+
+        Args:
+            guild_id (int): ID of guild
+            channel_id (int): ID of channel
+            user_id (int): ID of member using the command
+            name (str): name of command, e.g. "add-emoji"
+            options (dict[str,str]): value of each string option
+
+        Returns:
+            int: ID of the interaction
+        """
+        interaction_id = self.make_snowflake()
+        token = f"token-{interaction_id}"
+        member = {
+            **make_member(make_user(user_id), isoformat(time.time())),
+            "permissions": str((1 << 41) - 1),
+        }
+        interaction = {
+            "id": str(interaction_id),
+            "application_id": str(APPLICATION_ID),
+            "type": 2,
+            "data": {
+                "id": str(interaction_id - 1),
+                "name": name,
+                "type": 1,
+                "options": [
+                    {"name": option, "type": 3, "value": value} for option, value in options.items()
+                ],
+            },
+            "guild_id": str(guild_id),
+            "channel_id": str(channel_id),
+            "member": member,
+            "token": token,
+            "version": 1,
+            "app_permissions": str((1 << 41) - 1),
+            "locale": "en-US",
+            "guild_locale": "en-US",
+        }
+        self.interactions[token] = [interaction, None]
+        await self.dispatch("INTERACTION_CREATE", interaction, guild_id)
+        return interaction_id
+
+    async def add_reaction(self, message_id, user_id, emoji):
+        """React to a message as a member and tell the bots
+
+        Args:
+            message_id (int): ID of message
+            user_id (int): ID of member reacting
+            emoji (str): emoji reacted with
+        """
+        message = self.messages[message_id]
+        user_ids = self.reactions.setdefault(message_id, {}).setdefault(emoji, {})
+        if user_id in user_ids:
+            return
+        user_ids[user_id] = None
+        guild_id = int(message["guild_id"])
+        user = BOT_USER if user_id == BOT_ID else make_user(user_id)
+        await self.dispatch(
+            "MESSAGE_REACTION_ADD",
+            {
+                "user_id": str(user_id),
+                "channel_id": message["channel_id"],
+                "message_id": message["id"],
+                "guild_id": message["guild_id"],
+                "emoji": {"id": None, "name": emoji},
+                "member": make_member(user, isoformat(time.time())),
+            },
+            guild_id,
+        )
+
+    async def handle_gateway(self, request):
+        websocket = web.WebSocketResponse(max_msg_size=0)
+        await websocket.prepare(request)
+        session = GatewaySession(websocket, compress=request.query.get("compress") == "zlib-stream")
+        await session.send({"op": 10, "d": {"heartbeat_interval": HEARTBEAT_INTERVAL}})
+        self.sessions.add(session)
+        try:
+            async for message in websocket:
+                if message.type not in (WSMsgType.TEXT, WSMsgType.BINARY):
+                    continue
+                payload = json.loads(message.data)
+                await self._handle_gateway_payload(session, payload["op"], payload.get("d"))
+        finally:
+            self.sessions.discard(session)
+        return websocket
+
+    async def _handle_gateway_payload(self, session, op, data):
+        if op == 1:
+            await session.send({"op": 11})
+        elif op == 2:
+            session.shard_id, session.shard_count = data.get("shard") or (0, 1)
+            session.identified = True
+            guild_ids = [guild_id for guild_id in self.guilds if session.owns_guild(guild_id)]
+            logging.info(
+                f"Shard {session.shard_id}/{session.shard_count} identified, sending {len(guild_ids)} guild(s)"
+            )
+            await session.dispatch(
+                "READY",
+                {
+                    "v": 10,
+                    "user": BOT_USER,
+                    "guilds": [{"id": str(guild_id), "unavailable": True} for guild_id in guild_ids],
+                    "session_id": session.session_id,
+                    "resume_gateway_url": self.gateway_url,
+                    "shard": [session.shard_id, session.shard_count],
+                    "application": {"id": str(APPLICATION_ID), "flags": APPLICATION_FLAGS},
+                },
+            )
+            for guild_id in guild_ids:
+                await session.dispatch("GUILD_CREATE", self.guild_create_payload(guild_id))
+        elif op == 6:
+            # sessions aren't kept, the bot identifies again
+            await session.send({"op": 9, "d": False})
+        elif op == 8:
+            guild_id = int(data["guild_id"])
+            members = self.members[guild_id] + [make_member(BOT_USER, isoformat(time.time()))]
+            # Discord sends up to 1000 members per chunk
+            chunks = [members[i : i + 1000] for i in range(0, len(members), 1000)]
+            for index, chunk in enumerate(chunks):
+                await session.dispatch(
+                    "GUILD_MEMBERS_CHUNK",
+                    {
+                        "guild_id": str(guild_id),
+                        "members": chunk,
+                        "chunk_index": index,
+                        "chunk_count": len(chunks),
+                        "nonce": data.get("nonce"),
+                    },
+                )
+
+    # REST
+
+    @web.middleware
+    async def rate_limit_middleware(self, request, handler):
+        route = request.match_info.route
+        name = route.name or "unknown"
+        self.requests[name] += 1
+        if route.name is None:
+            logging.warning(f"No fake for {request.method} {request.path}")
+        bucket = next(
+            (request.match_info[key] for key in MAJOR_PARAMETERS if key in request.match_info), None
+        )
+        if bucket is None:
+            return await handler(request)
+        limit, window = ROUTE_RATE_LIMITS.get(name, (self.rate_limit, self.rate_limit_window))
+        now = time.monotonic()
+        state = self._buckets.get((name, bucket))
+        if state is None or now >= state[1]:
+            state = self._buckets[(name, bucket)] = [limit, now + window]
+        reset_after = state[1] - now
+        headers = {
+            "X-RateLimit-Limit": str(limit),
+            "X-RateLimit-Reset": f"{time.time() + reset_after:.3f}",
+            "X-RateLimit-Reset-After": f"{reset_after:.3f}",
+            "X-RateLimit-Bucket": name,
+        }
+        if state[0] == 0:
+            self.rate_limited[name] += 1
+            return json_response(
+                {"message": "You are being rate limited.", "retry_after": reset_after, "global": False},
+                status=429,
+                headers={**headers, "X-RateLimit-Remaining": "0", "Retry-After": f"{reset_after:.3f}"},
+            )
+        state[0] -= 1
+        response = await handler(request)
+        response.headers.update({**headers, "X-RateLimit-Remaining": str(state[0])})
+        return response
+
+    @staticmethod
+    def not_found(message, code):
+        return json_response({"message": message, "code": code}, status=404)
+
+    def _get_message(self, request):
+        message_id = int(request.match_info["message_id"])
+        message = self.messages.get(message_id)
+        if message is None or message["channel_id"] != request.match_info["channel_id"]:
+            return None
+        return message_id
+
+    async def get_gateway(self, request):
+        return json_response({"url": self.gateway_url})
+
+    async def get_gateway_bot(self, request):
+        return json_response(
+            {
+                "url": self.gateway_url,
+                "shards": self.shard_count,
+                "session_start_limit": {
+                    "total": 1000,
+                    "remaining": 1000,
+                    "reset_after": 0,
+                    "max_concurrency": 16,
+                },
+            }
+        )
+
+    async def get_current_user(self, request):
+        return json_response(BOT_USER)
+
+    async def get_application(self, request):
+        return json_response(
+            {
+                "id": str(APPLICATION_ID),
+                "name": BOT_USER["username"],
+                "icon": None,
+                "description": "",
+                "summary": "",
+                "bot_public": True,
+                "bot_require_code_grant": False,
+                "verify_key": "",
+                "owner": make_user(OWNER_ID),
+                "team": None,
+                "flags": APPLICATION_FLAGS,
+            }
+        )
+
+    async def get_current_user_guilds(self, request):
+        after = int(request.query.get("after", 0))
+        limit = int(request.query.get("limit", 200))
+        guild_ids = sorted(guild_id for guild_id in self.guilds if guild_id > after)[:limit]
+        return json_response(
+            [
+                {
+                    "id": str(guild_id),
+                    "name": self.guilds[guild_id]["name"],
+                    "icon": None,
+                    "owner": False,
+                    "permissions": str((1 << 41) - 1),
+                    "features": [],
+                }
+                for guild_id in guild_ids
+            ]
+        )
+
+    async def get_commands(self, request):
+        return json_response([])
+
+    async def overwrite_commands(self, request):
+        commands = await request.json()
+        return json_response(
+            [
+                {
+                    **command,
+                    "id": str(self.make_snowflake()),
+                    "application_id": str(APPLICATION_ID),
+                    "guild_id": request.match_info.get("guild_id"),
+                    "version": "1",
+                }
+                for command in commands
+            ]
+        )
+
+    async def create_command(self, request):
+        command = await request.json()
+        return json_response(
+            {**command, "id": str(self.make_snowflake()), "application_id": str(APPLICATION_ID), "version": "1"}
+        )
+
+    async def create_interaction_response(self, request):
+        token = request.match_info["token"]
+        if token not in self.interactions or self.interactions[token][1] is not None:
+            return self.not_found("Unknown interaction", 10062)
+        interaction = self.interactions[token][0]
+        response = await request.json()
+        for listener in self.interaction_listeners:
+            listener(int(interaction["id"]))
+        # 4 answers with a message, 5 shows that the bot is thinking until it edits the response
+        if response["type"] in (4, 5):
+            message = self.create_message(
+                int(interaction["channel_id"]),
+                response.get("data") or {},
+                interaction=interaction,
+            )
+            self.interactions[token][1] = int(message["id"])
+        return web.Response(status=204)
+
+    def _get_webhook_message(self, request):
+        token = request.match_info["token"]
+        if token not in self.interactions:
+            return None
+        message_id = request.match_info["message_id"]
+        if message_id == "@original":
+            return self.interactions[token][1]
+        message_id = int(message_id)
+        return message_id if message_id in self.messages else None
+
+    async def get_webhook_message(self, request):
+        message_id = self._get_webhook_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        return json_response(self.message_payload(message_id))
+
+    async def edit_webhook_message(self, request):
+        message_id = self._get_webhook_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        return await self._edit_message(message_id, await request.json())
+
+    async def delete_webhook_message(self, request):
+        message_id = self._get_webhook_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        return await self._delete_message(message_id)
+
+    async def create_followup_message(self, request):
+        token = request.match_info["token"]
+        if token not in self.interactions:
+            return self.not_found("Unknown Webhook", 10015)
+        interaction = self.interactions[token][0]
+        message = self.create_message(
+            int(interaction["channel_id"]), await request.json(), interaction=interaction
+        )
+        return json_response(self.message_payload(int(message["id"])))
+
+    async def get_channel(self, request):
+        channel = self.channels.get(int(request.match_info["channel_id"]))
+        if channel is None:
+            return self.not_found("Unknown Channel", 10003)
+        return json_response(channel)
+
+    async def create_channel_message(self, request):
+        channel_id = int(request.match_info["channel_id"])
+        if channel_id not in self.channels:
+            return self.not_found("Unknown Channel", 10003)
+        if request.content_type == "multipart/form-data":
+            form = await request.post()
+            data = json.loads(form["payload_json"])
+        else:
+            data = await request.json()
+        message = self.create_message(channel_id, data)
+        return json_response(self.message_payload(int(message["id"])))
+
+    async def get_channel_message(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        return json_response(self.message_payload(message_id))
+
+    async def edit_channel_message(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        return await self._edit_message(message_id, await request.json())
+
+    async def delete_channel_message(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        return await self._delete_message(message_id)
+
+    async def _edit_message(self, message_id, data):
+        message = self.messages[message_id]
+        for key in ("content", "embeds", "components", "flags"):
+            if key in data:
+                message[key] = data[key]
+        message["edited_timestamp"] = isoformat(time.time())
+        payload = self.message_payload(message_id)
+        self._dispatch_soon("MESSAGE_UPDATE", payload, int(message["guild_id"]))
+        return json_response(payload)
+
+    async def _delete_message(self, message_id):
+        message = self.messages.pop(message_id)
+        self.reactions.pop(message_id, None)
+        self.pins.get(int(message["channel_id"]), set()).discard(message_id)
+        self._dispatch_soon(
+            "MESSAGE_DELETE",
+            {"id": message["id"], "channel_id": message["channel_id"], "guild_id": message["guild_id"]},
+            int(message["guild_id"]),
+        )
+        return web.Response(status=204)
+
+    async def create_reaction(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        await self.add_reaction(message_id, BOT_ID, request.match_info["emoji"])
+        return web.Response(status=204)
+
+    async def delete_own_reaction(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        self.reactions.get(message_id, {}).get(request.match_info["emoji"], {}).pop(BOT_ID, None)
+        return web.Response(status=204)
+
+    async def get_reactions(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        after = int(request.query.get("after", 0))
+        limit = int(request.query.get("limit", 25))
+        user_ids = sorted(
+            user_id
+            for user_id in self.reactions.get(message_id, {}).get(request.match_info["emoji"], {})
+            if user_id > after
+        )[:limit]
+        return json_response(
+            [BOT_USER if user_id == BOT_ID else make_user(user_id) for user_id in user_ids]
+        )
+
+    async def get_pins(self, request):
+        channel_id = int(request.match_info["channel_id"])
+        return json_response(
+            [self.message_payload(message_id) for message_id in sorted(self.pins.get(channel_id, ()))]
+        )
+
+    async def pin_message(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        self.pins.setdefault(int(request.match_info["channel_id"]), set()).add(message_id)
+        return web.Response(status=204)
+
+    async def unpin_message(self, request):
+        message_id = self._get_message(request)
+        if message_id is None:
+            return self.not_found("Unknown Message", 10008)
+        self.pins.get(int(request.match_info["channel_id"]), set()).discard(message_id)
+        return web.Response(status=204)
+
+    def _get_guild(self, request):
+        return self.guilds.get(int(request.match_info["guild_id"]))
+
+    async def get_guild(self, request):
+        guild = self._get_guild(request)
+        if guild is None:
+            return self.not_found("Unknown Guild", 10004)
+        return json_response(guild)
+
+    async def get_guild_member(self, request):
+        guild = self._get_guild(request)
+        user_id = request.match_info["user_id"]
+        if guild is None:
+            return self.not_found("Unknown Guild", 10004)
+        if user_id == str(BOT_ID):
+            return json_response(make_member(BOT_USER, isoformat(time.time())))
+        for member in self.members[int(guild["id"])]:
+            if member["user"]["id"] == user_id:
+                return json_response(member)
+        return self.not_found("Unknown Member", 10007)
+
+    def _find(self, items, item_id):
+        return next((item for item in items if item["id"] == item_id), None)
+
+    async def get_guild_emojis(self, request):
+        guild = self._get_guild(request)
+        if guild is None:
+            return self.not_found("Unknown Guild", 10004)
+        return json_response(guild["emojis"])
+
+    async def create_guild_emoji(self, request):
+        guild = self._get_guild(request)
+        if guild is None:
+            return self.not_found("Unknown Guild", 10004)
+        data = await request.json()
+        # the image is a data URI, checking that it decodes is enough
+        base64.b64decode(data["image"].partition(",")[2])
+        emoji = self._make_emoji(data["name"], animated=data["image"].startswith("data:image/gif"))
+        guild["emojis"].append(emoji)
+        self._emojis_updated(guild)
+        return json_response(emoji, status=201)
+
+    async def edit_guild_emoji(self, request):
+        guild = self._get_guild(request)
+        emoji = guild and self._find(guild["emojis"], request.match_info["emoji_id"])
+        if emoji is None:
+            return self.not_found("Unknown Emoji", 10014)
+        data = await request.json()
+        if "name" in data:
+            emoji["name"] = data["name"]
+        self._emojis_updated(guild)
+        return json_response(emoji)
+
+    async def delete_guild_emoji(self, request):
+        guild = self._get_guild(request)
+        emoji = guild and self._find(guild["emojis"], request.match_info["emoji_id"])
+        if emoji is None:
+            return self.not_found("Unknown Emoji", 10014)
+        guild["emojis"].remove(emoji)
+        self._emojis_updated(guild)
+        return web.Response(status=204)
+
+    def _emojis_updated(self, guild):
+        self._dispatch_soon(
+            "GUILD_EMOJIS_UPDATE", {"guild_id": guild["id"], "emojis": guild["emojis"]}, int(guild["id"])
+        )
+
+    async def get_guild_stickers(self, request):
+        guild = self._get_guild(request)
+        if guild is None:
+            return self.not_found("Unknown Guild", 10004)
+        return json_response(guild["stickers"])
+
+    async def create_guild_sticker(self, request):
+        guild = self._get_guild(request)
+        if guild is None:
+            return self.not_found("Unknown Guild", 10004)
+        form = await request.post()
+        sticker = self._make_sticker(
+            int(guild["id"]), form["name"], form.get("tags", ""), form.get("description", "")
+        )
+        guild["stickers"].append(sticker)
+        self._stickers_updated(guild)
+        return json_response(sticker, status=201)
+
+    async def edit_guild_sticker(self, request):
+        guild = self._get_guild(request)
+        sticker = guild and self._find(guild["stickers"], request.match_info["sticker_id"])
+        if sticker is None:
+            return self.not_found("Unknown Sticker", 10060)
+        data = await request.json()
+        for key in ("name", "tags", "description"):
+            if key in data:
+                sticker[key] = data[key]
+        self._stickers_updated(guild)
+        return json_response(sticker)
+
+    async def delete_guild_sticker(self, request):
+        guild = self._get_guild(request)
+        sticker = guild and self._find(guild["stickers"], request.match_info["sticker_id"])
+        if sticker is None:
+            return self.not_found("Unknown Sticker", 10060)
+        guild["stickers"].remove(sticker)
+        self._stickers_updated(guild)
+        return web.Response(status=204)
+
+    def _stickers_updated(self, guild):
+        self._dispatch_soon(
+            "GUILD_STICKERS_UPDATE",
+            {"guild_id": guild["id"], "stickers": guild["stickers"]},
+            int(guild["id"]),
+        )
+
+    async def get_image(self, request):
+        return web.Response(body=self.image, content_type="image/png")
+
+    def make_app(self):
+        """Build the web application serving the fake API
+
+        Returns:
+            web.Application: application
+        """
+        app = web.Application(middlewares=[self.rate_limit_middleware], client_max_size=32 * 1024 * 1024)
+        routes = [
+            ("GET", "/gateway", self.get_gateway),
+            ("GET", "/gateway/bot", self.get_gateway_bot),
+            ("GET", "/users/@me", self.get_current_user),
+            ("GET", "/users/@me/guilds", self.get_current_user_guilds),
+            ("GET", "/oauth2/applications/@me", self.get_application),
+            ("GET", "/applications/{application_id}/commands", self.get_commands),
+            ("PUT", "/applications/{application_id}/commands", self.overwrite_commands),
+            ("POST", "/applications/{application_id}/commands", self.create_command),
+            (
+                "GET",
+                "/applications/{application_id}/guilds/{guild_id}/commands",
+                self.get_commands,
+                "get_guild_commands",
+            ),
+            (
+                "PUT",
+                "/applications/{application_id}/guilds/{guild_id}/commands",
+                self.overwrite_commands,
+                "overwrite_guild_commands",
+            ),
+            (
+                "POST",
+                "/applications/{application_id}/guilds/{guild_id}/commands",
+                self.create_command,
+                "create_guild_command",
+            ),
+            (
+                "GET",
+                "/applications/{application_id}/guilds/{guild_id}/commands/permissions",
+                self.get_commands,
+                "get_command_permissions",
+            ),
+            ("POST", "/interactions/{interaction_id}/{token}/callback", self.create_interaction_response),
+            ("POST", "/webhooks/{application_id}/{token}", self.create_followup_message),
+            ("GET", "/webhooks/{application_id}/{token}/messages/{message_id}", self.get_webhook_message),
+            ("PATCH", "/webhooks/{application_id}/{token}/messages/{message_id}", self.edit_webhook_message),
+            ("DELETE", "/webhooks/{application_id}/{token}/messages/{message_id}", self.delete_webhook_message),
+            ("GET", "/channels/{channel_id}", self.get_channel),
+            ("POST", "/channels/{channel_id}/messages", self.create_channel_message),
+            ("GET", "/channels/{channel_id}/messages/{message_id}", self.get_channel_message),
+            ("PATCH", "/channels/{channel_id}/messages/{message_id}", self.edit_channel_message),
+            ("DELETE", "/channels/{channel_id}/messages/{message_id}", self.delete_channel_message),
+            (
+                "PUT",
+                "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me",
+                self.create_reaction,
+            ),
+            (
+                "DELETE",
+                "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}/@me",
+                self.delete_own_reaction,
+            ),
+            ("GET", "/channels/{channel_id}/messages/{message_id}/reactions/{emoji}", self.get_reactions),
+            ("GET", "/channels/{channel_id}/pins", self.get_pins),
+            ("PUT", "/channels/{channel_id}/pins/{message_id}", self.pin_message),
+            ("DELETE", "/channels/{channel_id}/pins/{message_id}", self.unpin_message),
+            ("GET", "/guilds/{guild_id}", self.get_guild),
+            ("GET", "/guilds/{guild_id}/members/{user_id}", self.get_guild_member),
+            ("GET", "/guilds/{guild_id}/emojis", self.get_guild_emojis),
+            ("POST", "/guilds/{guild_id}/emojis", self.create_guild_emoji),
+            ("PATCH", "/guilds/{guild_id}/emojis/{emoji_id}", self.edit_guild_emoji),
+            ("DELETE", "/guilds/{guild_id}/emojis/{emoji_id}", self.delete_guild_emoji),
+            ("GET", "/guilds/{guild_id}/stickers", self.get_guild_stickers),
+            ("POST", "/guilds/{guild_id}/stickers", self.create_guild_sticker),
+            ("PATCH", "/guilds/{guild_id}/stickers/{sticker_id}", self.edit_guild_sticker),
+            ("DELETE", "/guilds/{guild_id}/stickers/{sticker_id}", self.delete_guild_sticker),
+        ]
+        for method, path, handler, *name in routes:
+            # routes are named after their handler unless it serves several, rate limits are looked up by name
+            app.router.add_route(
+                method, "/api/v10" + path, handler, name=name[0] if name else handler.__name__
+            )
+        app.router.add_get("/gateway", self.handle_gateway, name="gateway")
+        app.router.add_get("/images/{name}", self.get_image, name="image")
+        return app
+
+    @property
+    def gateway_url(self):
+        return self.url.replace("http://", "ws://") + "/gateway"
+
+    async def start(self, host="127.0.0.1", port=0):
+        """Start serving
+
+        Args:
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): port to listen on, 0 for any free port. Defaults to 0.
+
+        Returns:
+            str: base URL of the server, to pass to run_bot.py
+        """
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        for session in list(self.sessions):
+            await session.websocket.close()
+        await self._runner.cleanup()
+
+
+async def serve(args):
+    fake = FakeDiscord(
+        guild_count=args.guilds,
+        channels_per_guild=args.channels_per_guild,
+        members_per_guild=args.members_per_guild,
+        shard_count=args.shards,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+    )
+    url = await fake.start(args.host, args.port)
+    channel_ids = sorted(fake.channels)
+    logging.info(f"Serving a fake Discord, run the bots with python loadtest/run_bot.py {url} <script>")
+    logging.info(f"Channel IDs to allow: {channel_ids}")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a fake Discord API and gateway for the bots to connect to")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--guilds", type=int, default=10)
+    parser.add_argument("--channels-per-guild", type=int, default=2)
+    parser.add_argument("--members-per-guild", type=int, default=100)
+    parser.add_argument("--shards", type=int, default=1, help="shards recommended to the bots")
+    parser.add_argument("--rate-limit", type=int, default=5, help="requests per route and channel or guild in each window")
+    parser.add_argument("--rate-limit-window", type=float, default=5.0, help="length of a rate limit window in seconds")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    asyncio.run(serve(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Runs one of the bot's scripts against a fake Discord instead of Discord, e.g.
+#   python loadtest/run_bot.py http://127.0.0.1:8080 poll_creator.py
+# from a directory holding the config.py to use. The bots themselves only ever talk to Discord, the REST
+# calls of both libraries are pointed at the fake here, before the script runs.
+import argparse
+import importlib.abc
+import importlib.util
+import os
+import runpy
+import sys
+
+# run from anywhere, the bot's modules are in the parent directory
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class AfterImport(importlib.abc.MetaPathFinder):
+    """Calls a function with a module as soon as it is first imported, before anything else can use it"""
+
+    def __init__(self, name, callback):
+        """
+        Args:
+            name (str): full name of the module, e.g. "interactions.api.http.route"
+            callback (Callable[[module], None]): called with the imported module
+        """
+        self.name = name
+        self.callback = callback
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname != self.name:
+            return None
+        # let the usual finders find it, only once
+        sys.meta_path.remove(self)
+        spec = importlib.util.find_spec(fullname)
+        exec_module = spec.loader.exec_module
+
+        def exec_and_call_back(module):
+            exec_module(module)
+            self.callback(module)
+
+        spec.loader.exec_module = exec_and_call_back
+        return spec
+
+
+def redirect_apis(api_url):
+    """Send the REST calls of both libraries and of the bot's own HTTP session to another address than Discord's
+
+    The interactions library is patched when the script imports it. It can't be imported here, it binds an
+    HTTP session to the event loop current when it is imported, which main.py only creates later.
+
+    Args:
+        api_url (str): base URL of the API, without the path, e.g. "http://127.0.0.1:8080"
+    """
+    import discord
+
+    import http_client
+
+    discord.http.Route.BASE = f"{api_url}/api/v10"
+    http_client.DISCORD_URL = api_url
+
+    def redirect_interactions(route_module):
+        # the library sets the address on every route instead of reading it from a class attribute
+        route_init = route_module.Route.__init__
+
+        def redirected_route_init(self, *args, **kwargs):
+            route_init(self, *args, **kwargs)
+            self.__api__ = f"{api_url}/api/v10"
+
+        route_module.Route.__init__ = redirected_route_init
+
+    sys.meta_path.insert(0, AfterImport("interactions.api.http.route", redirect_interactions))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one of the bot's scripts against a fake Discord")
+    parser.add_argument("api_url", help="base URL of the fake, as printed by fake_discord.py")
+    parser.add_argument("script", help="script in the repo, e.g. poll_creator.py or main.py")
+    args = parser.parse_args()
+    # config.py in the working directory comes before the repo, like when the bots are run from it
+    sys.path[0:1] = [os.getcwd(), REPO_DIRECTORY]
+    redirect_apis(args.api_url)
+    sys.argv = [args.script]
+    runpy.run_path(os.path.join(REPO_DIRECTORY, args.script), run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter
+
+# run from anywhere, the bot's modules are in the parent directory
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+
+from loadtest.fake_discord import BOT_ID  # noqa: E402
+from loadtest.fake_discord import FakeDiscord  # noqa: E402
+
+# how the bots are run: the two processes of run.sh, main.py, or the results checker alone with this
+# script saving polls and announcing them over the poll event socket in place of the poll creator
+MODES = {
+    "processes": ["poll_results_checker.py", "poll_creator.py"],
+    "shared-loop": ["main.py"],
+    "checker-only": ["poll_results_checker.py"],
+}
+# relative share of each slash command replayed
+COMMAND_WEIGHTS = {"add-emoji": 45, "rename-emoji": 20, "delete-emoji": 20, "add-sticker": 15}
+# share of votes that are yes votes
+YES_SHARE = 0.7
+# seconds to wait for the bots to connect to the gateway
+STARTUP_TIMEOUT = 60
+# seconds to wait after every shard is ready, for the bots to finish their startup work
+SETTLE_TIME = 3
+
+
+def write_config(directory, overrides):
+    """Write a config.py for the bots, the repo's own (or the example) with some settings replaced
+
+    Args:
+        directory (str): directory to write it to
+        overrides (dict): setting name -> value
+    """
+    base = os.path.join(REPO_DIRECTORY, "config.py")
+    if not os.path.exists(base):
+        base = os.path.join(REPO_DIRECTORY, "example_config.py")
+    with open(base) as f:
+        config = f.read()
+    config += "\n\n# load test settings\n"
+    config += "".join(f"{name} = {value!r}\n" for name, value in overrides.items())
+    with open(os.path.join(directory, "config.py"), "w") as f:
+        f.write(config)
+
+
+async def start_bot(directory, script, api_url):
+    """Start one of the bot's scripts in its own process through run_bot.py, logging to a file in the directory
+
+    Args:
+        directory (str): directory holding the load test's config.py, also the working directory
+        script (str): file name of script in the repo, e.g. "poll_creator.py"
+        api_url (str): base URL of the fake Discord
+
+    Returns:
+        asyncio.subprocess.Process: started process
+    """
+    with open(os.path.join(directory, script.replace(".py", ".log")), "w") as log:
+        return await asyncio.create_subprocess_exec(
+            sys.executable,
+            os.path.join(REPO_DIRECTORY, "loadtest", "run_bot.py"),
+            api_url,
+            script,
+            cwd=directory,
+            stdout=log,
+            stderr=log,
+        )
+
+
+async def stop_bot(process):
+    if process.returncode is not None:
+        return
+    process.terminate()
+    try:
+        await asyncio.wait_for(process.wait(), 5)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+
+
+def percentile(values, fraction):
+    """
+    Args:
+        values (List[float]): values
+        fraction (float): e.g. 0.99 for the 99th percentile
+
+    Returns:
+        float: the value below which that fraction of the values are, None if there are no values
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoadTest:
+    """Replays slash commands and votes against the fake Discord and times the bots' answers"""
+
+    def __init__(self, fake, args, yes_emoji, no_emoji):
+        """
+        Args:
+            fake (FakeDiscord): started fake Discord the bots are connected to
+            args (argparse.Namespace): command line arguments
+            yes_emoji (str): POLL_YES_EMOJI of the bots
+            no_emoji (str): POLL_NO_EMOJI of the bots
+        """
+        self.fake = fake
+        self.args = args
+        self.yes_emoji = yes_emoji
+        self.no_emoji = no_emoji
+        self.rng = random.Random(args.seed)
+        # interaction ID -> time.monotonic() when sent / answered
+        self.commands_sent_at = {}
+        self.commands_answered_at = {}
+        # poll message ID -> time.monotonic() when posted / its result was posted
+        self.polls_created_at = {}
+        self.polls_closed_at = {}
+        self.votes = 0
+        self._tasks = set()
+        fake.message_listeners.append(self.on_message)
+        fake.interaction_listeners.append(self.on_interaction_answered)
+
+    def _start(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def on_interaction_answered(self, interaction_id):
+        self.commands_answered_at.setdefault(interaction_id, time.monotonic())
+
+    def on_message(self, message):
+        message_id = int(message["id"])
+        if message.get("interaction") and message["embeds"] and not message["flags"] & (1 << 6):
+            # the poll creator answered a command with a poll
+            self.poll_created(message_id, int(message["guild_id"]))
+        reference = message.get("message_reference")
+        if reference is not None and int(reference["message_id"]) in self.polls_created_at:
+            # the results checker replied to a poll with its result
+            self.polls_closed_at.setdefault(int(reference["message_id"]), time.monotonic())
+
+    def poll_created(self, message_id, guild_id):
+        self.polls_created_at[message_id] = time.monotonic()
+        self._start(self.vote(message_id, guild_id))
+
+    async def vote(self, message_id, guild_id):
+        """Have members vote on a poll at random times while it is open
+
+        Args:
+            message_id (int): ID of poll message
+            guild_id (int): ID of guild of poll
+        """
+        members = self.fake.members[guild_id]
+        voters = self.rng.sample(members, min(self.args.votes_per_poll, len(members)))
+        delays = sorted(self.rng.uniform(0, self.args.poll_duration * 0.8) for _ in voters)
+        started = time.monotonic()
+        for delay, voter in zip(delays, voters):
+            await asyncio.sleep(max(0, started + delay - time.monotonic()))
+            if message_id not in self.fake.messages:
+                return
+            emoji = self.yes_emoji if self.rng.random() < YES_SHARE else self.no_emoji
+            await self.fake.add_reaction(message_id, int(voter["user"]["id"]), emoji)
+            self.votes += 1
+
+    def pick_command(self, i):
+        """Make up the i-th command to replay
+
+        Args:
+            i (int): number of command
+
+        Returns:
+            tuple[int,int,int,str,dict]: guild ID, channel ID, user ID, command name and options
+        """
+        guild_id = self.rng.choice(list(self.fake.guilds))
+        guild = self.fake.guilds[guild_id]
+        channel_id = int(self.rng.choice(guild["channels"])["id"])
+        user_id = int(self.rng.choice(self.fake.members[guild_id])["user"]["id"])
+        name = self.rng.choices(list(COMMAND_WEIGHTS), weights=list(COMMAND_WEIGHTS.values()))[0]
+        if not guild["emojis"] and name in ("rename-emoji", "delete-emoji"):
+            name = "add-emoji"
+        if name == "add-emoji":
+            options = {"url": f"{self.fake.url}/images/load_{i}.png", "name": f"load_{i}"}
+        elif name == "add-sticker":
+            options = {"url": f"{self.fake.url}/images/sticker_{i}.png", "name": f"sticker_{i}"}
+        elif name == "rename-emoji":
+            emoji = self.rng.choice(guild["emojis"])
+            options = {"emoji-name": emoji["name"], "new-emoji-name": f"renamed_{i}"}
+        else:
+            options = {"emoji-name": self.rng.choice(guild["emojis"])["name"]}
+        return guild_id, channel_id, user_id, name, options
+
+    async def replay_commands(self):
+        """Send the commands at the configured rate"""
+        started = time.monotonic()
+        for i in range(self.args.commands):
+            await asyncio.sleep(max(0, started + i / self.args.rate - time.monotonic()))
+            guild_id, channel_id, user_id, name, options = self.pick_command(i)
+            sent_at = time.monotonic()
+            interaction_id = await self.fake.send_command(guild_id, channel_id, user_id, name, options)
+            self.commands_sent_at[interaction_id] = sent_at
+
+    async def replay_polls(self):
+        """Save polls and announce them to the results checker at the configured rate in place of the poll creator"""
+        # the poll store reads the load test's config.py, on the path by now
+        from poll_events import POLL_CREATED
+        from poll_events import publish
+        from poll_store import save_poll
+
+        started = time.monotonic()
+        for i in range(self.args.commands):
+            await asyncio.sleep(max(0, started + i / self.args.rate - time.monotonic()))
+            guild_id, channel_id, user_id, name, options = self.pick_command(i)
+            poll_type = name.replace("-", "")
+            message = self.fake.create_message(
+                channel_id, {"embeds": [{"title": f"{name} poll", "description": str(options)}]}
+            )
+            message_id = int(message["id"])
+            self.poll_created(message_id, guild_id)
+            await self.fake.add_reaction(message_id, BOT_ID, self.yes_emoji)
+            await self.fake.add_reaction(message_id, BOT_ID, self.no_emoji)
+            poll = save_poll(
+                guild_id,
+                channel_id,
+                message_id,
+                user_id,
+                poll_type,
+                target_name=options.get("name") or options.get("emoji-name"),
+                new_name=options.get("new-emoji-name"),
+                image_url=options.get("url"),
+            )
+            publish(POLL_CREATED, poll)
+
+    async def wait_for_polls(self):
+        """Wait until every poll is closed, or until the close timeout after the last one is due"""
+        while self._tasks or len(self.polls_closed_at) < len(self.polls_created_at):
+            last_due = max(self.polls_created_at.values(), default=time.monotonic())
+            if time.monotonic() > last_due + self.args.poll_duration + self.args.close_timeout:
+                return
+            await asyncio.sleep(0.5)
+
+    def results(self):
+        """
+        Returns:
+            dict: throughput, latencies, lateness and rate limiting of the run
+        """
+        latencies = [
+            self.commands_answered_at[interaction_id] - sent_at
+            for interaction_id, sent_at in self.commands_sent_at.items()
+            if interaction_id in self.commands_answered_at
+        ]
+        lateness = [
+            closed_at - (self.polls_created_at[message_id] + self.args.poll_duration)
+            for message_id, closed_at in self.polls_closed_at.items()
+        ]
+        answered = list(self.commands_answered_at.values())
+        sent = list(self.commands_sent_at.values())
+        span = max(answered) - min(sent) if answered and sent else None
+        return {
+            "commands_sent": len(self.commands_sent_at),
+            "commands_answered": len(latencies),
+            "commands_per_second": len(latencies) / span if span else None,
+            "command_latency_p50": percentile(latencies, 0.5),
+            "command_latency_p99": percentile(latencies, 0.99),
+            "polls_created": len(self.polls_created_at),
+            "polls_closed": len(self.polls_closed_at),
+            "close_lateness_p50": percentile(lateness, 0.5),
+            "close_lateness_p99": percentile(lateness, 0.99),
+            "votes": self.votes,
+            "rest_requests": sum(self.fake.requests.values()),
+            "rate_limited": sum(self.fake.rate_limited.values()),
+            "rate_limited_by_route": dict(self.fake.rate_limited),
+            "requests_by_route": dict(self.fake.requests),
+        }
+
+
+def print_results(results):
+    def seconds(value):
+        return "n/a" if value is None else f"{value * 1000:.0f}ms"
+
+    print(f"Commands: {results['commands_answered']}/{results['commands_sent']} answered", end="")
+    if results["commands_per_second"] is not None:
+        print(f", {results['commands_per_second']:.1f}/s", end="")
+    print(
+        f", latency p50 {seconds(results['command_latency_p50'])}"
+        f", p99 {seconds(results['command_latency_p99'])}"
+    )
+    print(
+        f"Polls: {results['polls_closed']}/{results['polls_created']} closed"
+        f", lateness p50 {seconds(results['close_lateness_p50'])}"
+        f", p99 {seconds(results['close_lateness_p99'])}"
+    )
+    print(f"Votes: {results['votes']}")
+    print(f"REST requests: {results['rest_requests']}, rate limited (429): {results['rate_limited']}")
+    for route, count in Counter(results["rate_limited_by_route"]).most_common():
+        print(f"  {route}: {count}")
+
+
+async def wait_for_shards(fake, processes, expected):
+    """Wait until the bots have identified the expected number of gateway shards
+
+    Raises:
+        RuntimeError: if a bot exits or the shards don't connect in STARTUP_TIMEOUT seconds
+    """
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while sum(session.identified for session in fake.sessions) < expected:
+        for process in processes:
+            if process.returncode is not None:
+                raise RuntimeError(f"A bot exited with code {process.returncode} while starting")
+        if time.monotonic() > deadline:
+            raise RuntimeError("The bots didn't connect to the fake gateway in time")
+        await asyncio.sleep(0.2)
+    await asyncio.sleep(SETTLE_TIME)
+
+
+async def run(args, directory):
+    fake = FakeDiscord(
+        guild_count=args.guilds,
+        channels_per_guild=args.channels_per_guild,
+        members_per_guild=args.members_per_guild,
+        shard_count=args.shards,
+        rate_limit=args.rate_limit,
+        rate_limit_window=args.rate_limit_window,
+    )
+    url = await fake.start()
+    write_config(
+        directory,
+        {
+            "TOKEN_FILE_NAME": os.path.join(directory, ".TOKEN"),
+            "POLL_DATABASE_FILE_NAME": os.path.join(directory, "polls.db"),
+            "POLL_EVENT_SOCKET_PATH": os.path.join(directory, "poll_events.sock"),
+            "IMAGE_CACHE_DIRECTORY": os.path.join(directory, "image_cache"),
+            "ALLOWED_CHANNEL_IDS": sorted(fake.channels),
+            "POLL_DURATION": args.poll_duration,
+            "SHARD_COUNT": None,
+            "SHARD_IDS": None,
+            "ACTIVE_POLLS_PER_USER_LIMIT": args.commands,
+            "PROTECTED_EMOTE_NAMES": [],
+            "PRIVILEGED_USER_IDS": [],
+            "AUTOMATICALLY_ADD_EMOJIS": True,
+            "POLL_UPDATE_POST_TIMES": [],
+            "POLL_CREATOR_METRICS_PORT": None,
+            "RESULTS_CHECKER_METRICS_PORT": None,
+            "TRACE_EXPORT_FILE": None,
+        },
+    )
+    with open(os.path.join(directory, ".TOKEN"), "w") as f:
+        f.write("load-test-token")
+    sys.path.insert(0, directory)
+    from config import POLL_NO_EMOJI
+    from config import POLL_YES_EMOJI
+
+    load_test = LoadTest(fake, args, POLL_YES_EMOJI, POLL_NO_EMOJI)
+    processes = []
+    poll_event_task = None
+    try:
+        for script in MODES[args.mode]:
+            processes.append(await start_bot(directory, script, url))
+        # the checker runs every shard, the creator runs unsharded
+        expected_shards = args.shards + (args.mode != "checker-only")
+        await wait_for_shards(fake, processes, expected_shards)
+        print(f"Bots ready, replaying {args.commands} commands at {args.rate}/s")
+        if args.mode == "checker-only":
+            from poll_events import POLL_CREATED
+            from poll_ipc import PollEventChannel
+
+            poll_event_channel = PollEventChannel(
+                os.path.join(directory, "poll_events.sock"),
+                outgoing_events=[POLL_CREATED],
+                resync=lambda: None,
+            )
+            poll_event_task = asyncio.create_task(poll_event_channel.connect())
+            while not poll_event_channel._writers:
+                await asyncio.sleep(0.1)
+            await load_test.replay_polls()
+        else:
+            await load_test.replay_commands()
+        print(f"Waiting for polls to close, {args.poll_duration}s after they were created")
+        await load_test.wait_for_polls()
+    finally:
+        if poll_event_task is not None:
+            poll_event_task.cancel()
+        for process in processes:
+            await stop_bot(process)
+        await fake.stop()
+    return load_test.results()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Load test the bots end to end against a local fake Discord"
+    )
+    parser.add_argument("--mode", choices=MODES, default="processes", help="how to run the bots")
+    parser.add_argument("--guilds", type=int, default=50)
+    parser.add_argument("--channels-per-guild", type=int, default=2)
+    parser.add_argument("--members-per-guild", type=int, default=200)
+    parser.add_argument("--shards", type=int, default=1, help="shards recommended to the results checker")
+    parser.add_argument("--commands", type=int, default=2000, help="slash commands to replay")
+    parser.add_argument("--rate", type=float, default=50, help="slash commands per second")
+    parser.add_argument("--votes-per-poll", type=int, default=20)
+    parser.add_argument("--poll-duration", type=int, default=60, help="POLL_DURATION of the bots")
+    parser.add_argument(
+        "--close-timeout", type=int, default=120, help="how long to wait for late polls to close"
+    )
+    parser.add_argument("--rate-limit", type=int, default=5, help="requests per route and channel or guild")
+    parser.add_argument("--rate-limit-window", type=float, default=5.0, help="length of a rate limit window")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="also write the results to this file as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep the bots' logs and database")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="poll-load-test-")
+    try:
+        results = asyncio.run(run(args, directory))
+    except BaseException:
+        print(f"Load test failed, the bots' logs are in {directory}")
+        raise
+    print_results(results)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.keep:
+        print(f"Logs and database kept in {directory}")
+    else:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
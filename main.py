@@ -0,0 +1,36 @@
+import asyncio
+import logging
+
+import discord
+
+# the interactions client binds to the current event loop when it is created,
+# so the loop both bots share has to exist before they are imported
+loop = asyncio.new_event_loop()
+asyncio.set_event_loop(loop)
+
+import poll_creator  # noqa: E402
+import poll_results_checker  # noqa: E402
+from config import METRICS_HOST  # noqa: E402
+from config import POLL_CREATOR_METRICS_PORT  # noqa: E402
+from metrics import start_metrics_server  # noqa: E402
+
+
+def log_checker_exit(task):
+    """Log why the results checker stopped, the poll creator keeps running the loop
+
+    Args:
+        task (asyncio.Task): task running the results checker
+    """
+    if not task.cancelled() and task.exception() is not None:
+        logging.error("Results checker stopped", exc_info=task.exception())
+
+
+if __name__ == "__main__":
+    discord.utils.setup_logging(root=True)
+    # the bots share this process and its event loop, each still has its own client and gateway session
+    # serves the metrics of both on the poll creator's port, the bots' own calls then do nothing
+    loop.create_task(start_metrics_server(METRICS_HOST, POLL_CREATOR_METRICS_PORT))
+    checker = loop.create_task(poll_results_checker.main())
+    checker.add_done_callback(log_checker_exit)
+    # runs the loop until the poll creator stops
+    poll_creator.bot.start()
@@ -0,0 +1,188 @@
+import bisect
+import logging
+
+from aiohttp import web
+
+# upper bounds of histogram buckets in seconds, for anything from a cache hit to a slow REST call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# every metric, in the order they are rendered
+_metrics = []
+
+_server = None
+
+
+def _format_labels(label_names, label_values, extra=()):
+    pairs = list(zip(label_names, label_values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in pairs
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    """Base of the metric types, one time series per combination of label values
+
+    Updates are plain dict and float operations on the event loop, cheap enough to leave on everywhere.
+    """
+
+    type_name = None
+
+    def __init__(self, name, description, labels=(), collect=None):
+        """
+        Args:
+            name (str): metric name, e.g. "poll_resolutions_total"
+            description (str): help text shown with the metric
+            labels (tuple[str], optional): names of the labels each sample is recorded with. Defaults to no labels.
+            collect (Callable[[], dict[tuple,float]], optional): reads the value for each combination of label
+                values when the metrics are collected, for values kept elsewhere. Defaults to None.
+        """
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.collect = collect
+        self._values = {}
+        _metrics.append(self)
+
+    def render(self):
+        """Render the metric in the Prometheus text format
+
+        Returns:
+            List[str]: lines of the metric
+        """
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for label_values, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+    def _samples(self):
+        if self.collect is not None:
+            return self.collect().items()
+        return self._values.items()
+
+
+class Counter(Metric):
+    """Value that only goes up, e.g. a number of calls"""
+
+    type_name = "counter"
+
+    def inc(self, *label_values, amount=1):
+        """Add to the counter
+
+        Args:
+            *label_values: value of each label, in the order the labels were named
+            amount (float, optional): how much to add. Defaults to 1.
+        """
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+
+class Gauge(Metric):
+    """Value that goes up and down, e.g. a queue length"""
+
+    type_name = "gauge"
+
+    def set(self, value, *label_values):
+        """Set the gauge
+
+        Args:
+            value (float): new value
+            *label_values: value of each label, in the order the labels were named
+        """
+        self._values[label_values] = value
+
+
+class Histogram(Metric):
+    """Distribution of observed values, e.g. durations, counted in fixed buckets"""
+
+    type_name = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=DEFAULT_BUCKETS):
+        """
+        Args:
+            name (str): metric name
+            description (str): help text shown with the metric
+            labels (tuple[str], optional): names of the labels. Defaults to no labels.
+            buckets (tuple[float], optional): upper bounds of the buckets, ascending. Defaults to DEFAULT_BUCKETS.
+        """
+        super().__init__(name, description, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *label_values):
+        """Record a value
+
+        Args:
+            value (float): observed value
+            *label_values: value of each label, in the order the labels were named
+        """
+        series = self._values.get(label_values)
+        if series is None:
+            # count per bucket (the last one is +Inf), sum of values
+            series = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for label_values, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, [("le", bound)])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {total}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def render_metrics():
+    """Render every metric of this process in the Prometheus text format
+
+    Returns:
+        str: metrics page
+    """
+    lines = []
+    for metric in _metrics:
+        try:
+            lines += metric.render()
+        except Exception:
+            # a failing gauge callback shouldn't take the other metrics down with it
+            logging.exception(f"Failed to collect metric {metric.name}")
+    return "\n".join(lines) + "\n"
+
+
+async def handle_metrics(request):
+    return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+
+async def start_metrics_server(host, port):
+    """Serve the metrics of this process at http://{host}:{port}/metrics, does nothing if already serving
+
+    When both bots run in one process, the first one to start serves the metrics of both.
+
+    Args:
+        host (str): address to listen on
+        port (int): port to listen on, None to not serve metrics
+    """
+    global _server
+    if port is None or _server is not None:
+        return
+    app = web.Application()
+    app.router.add_get("/metrics", handle_metrics)
+    _server = web.AppRunner(app, access_log=None)
+    await _server.setup()
+    try:
+        await web.TCPSite(_server, host, port).start()
+    except OSError as e:
+        logging.warning(f"Failed to serve metrics on {host}:{port}: {e}")
+        return
+    logging.info(f"Serving metrics at http://{host}:{port}/metrics")
@@ -0,0 +1,250 @@
+import asyncio
+import itertools
+import logging
+import time
+
+from config import MAX_CONCURRENT_REST_CALLS
+from metrics import Counter
+from metrics import Gauge
+from metrics import Histogram
+from tracing import span
+
+# priorities of outbound calls, lower runs first:
+# replies users are waiting for (poll messages, poll results)
+REPLY = 0
+# changes applied by polls (creating, renaming and deleting emojis/stickers)
+ACTION = 1
+# work nobody is waiting for (digests, backfilling poll details)
+BACKGROUND = 2
+
+PRIORITY_NAMES = {REPLY: "reply", ACTION: "action", BACKGROUND: "background"}
+
+# calls of one bucket allowed in flight at once by route, 1 for routes not listed.
+# Discord's own limits are still enforced by the libraries, this only keeps calls from queueing up behind each other
+ROUTE_CONCURRENCY = {"reaction": 2}
+# times a call that hit a rate limit is tried again before giving up
+RATE_LIMIT_RETRIES = 2
+# seconds a bucket is paused after a rate limit that didn't say how long to wait
+RATE_LIMIT_BACKOFF = 1
+# seconds between logs of the queue statistics
+STATS_LOG_INTERVAL = 60 * 60
+
+REST_CALLS = Counter(
+    "discord_rest_calls_total", "REST calls made to Discord", labels=("route", "priority")
+)
+REST_CALL_SECONDS = Histogram(
+    "discord_rest_call_seconds", "Time REST calls to Discord took", labels=("route",)
+)
+REST_RATE_LIMITS = Counter(
+    "discord_rest_rate_limits_total", "REST calls that hit a rate limit", labels=("route",)
+)
+REST_QUEUE_WAIT_SECONDS = Histogram(
+    "discord_rest_queue_wait_seconds",
+    "Time REST calls waited in the outbound queue",
+    labels=("priority",),
+)
+
+
+class OutboundStats:
+    """Queue depth and wait times of the calls of one priority"""
+
+    def __init__(self):
+        self.queued = 0
+        self.calls = 0
+        self.rate_limited = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def as_dict(self):
+        return {
+            "queued": self.queued,
+            "calls": self.calls,
+            "rate_limited": self.rate_limited,
+            "average_wait": self.total_wait / self.calls if self.calls else 0.0,
+            "max_wait": self.max_wait,
+        }
+
+
+class OutboundScheduler:
+    """Runs the bot's REST calls to Discord by priority, at most MAX_CONCURRENT_REST_CALLS at once
+
+    Each call names the bucket it falls in, a route and the channel/guild ID it is about, mirroring how
+    Discord rate limits them. Calls of different buckets run side by side, calls of the same bucket wait
+    for each other, and a bucket that hits a rate limit is paused for the time Discord asked for. Waiting
+    calls are started highest priority first, so replies don't queue up behind digests.
+    """
+
+    def __init__(self, max_concurrent_calls):
+        """
+        Args:
+            max_concurrent_calls (int): most calls in flight at once across every bucket
+        """
+        self.max_concurrent_calls = max_concurrent_calls
+        # (priority, sequence number, bucket, future, time queued), kept sorted
+        self._pending = []
+        self._sequence = itertools.count()
+        self._running = 0
+        self._in_flight = {}
+        self._paused_until = {}
+        # coalescing key -> task of the call queued or in flight for it
+        self._coalesced = {}
+        self.stats = {priority: OutboundStats() for priority in PRIORITY_NAMES}
+
+    def _bucket_is_free(self, bucket, now):
+        route = bucket[0]
+        return (
+            self._in_flight.get(bucket, 0) < ROUTE_CONCURRENCY.get(route, 1)
+            and self._paused_until.get(bucket, 0) <= now
+        )
+
+    def _dispatch(self):
+        """Start as many waiting calls as the limits allow, highest priority first"""
+        now = time.monotonic()
+        for entry in list(self._pending):
+            if self._running >= self.max_concurrent_calls:
+                break
+            priority, _, bucket, future, queued_at = entry
+            if not self._bucket_is_free(bucket, now):
+                continue
+            self._pending.remove(entry)
+            stats = self.stats[priority]
+            stats.queued -= 1
+            wait = now - queued_at
+            stats.calls += 1
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+            REST_QUEUE_WAIT_SECONDS.observe(wait, PRIORITY_NAMES[priority])
+            self._running += 1
+            self._in_flight[bucket] = self._in_flight.get(bucket, 0) + 1
+            future.set_result(None)
+
+    async def _acquire(self, priority, bucket):
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), bucket, future, time.monotonic())
+        # entries compare by priority then sequence number, so this keeps them in order
+        index = 0
+        while index < len(self._pending) and self._pending[index] < entry:
+            index += 1
+        self._pending.insert(index, entry)
+        self.stats[priority].queued += 1
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.cancelled():
+                self._pending.remove(entry)
+                self.stats[priority].queued -= 1
+            else:
+                # started right as the caller gave up
+                self._release(bucket)
+            raise
+
+    def _release(self, bucket):
+        self._running -= 1
+        self._in_flight[bucket] -= 1
+        if self._in_flight[bucket] == 0:
+            del self._in_flight[bucket]
+        self._dispatch()
+
+    def _pause_bucket(self, bucket, retry_after):
+        self._paused_until[bucket] = time.monotonic() + retry_after
+        # look at the queue again once the bucket can be used
+        asyncio.get_running_loop().call_later(retry_after, self._dispatch)
+
+    async def call(self, priority, bucket, make_call, coalesce_key=None):
+        """Make a REST call once its bucket and priority allow it
+
+        Args:
+            priority (int): REPLY, ACTION or BACKGROUND
+            bucket (tuple): route name and the ID of the channel/guild the call is about, e.g. ("send_message", channel_id)
+            make_call (Callable[[], Awaitable]): makes the call, called again if it is retried after a rate limit
+            coalesce_key (Hashable, optional): calls with the same key made while one is queued or in flight share
+                its result instead of being made again, only for calls that read. Defaults to None, never sharing.
+
+        Returns:
+            Any: result of the call
+        """
+        with span(f"rest {bucket[0]}"):
+            if coalesce_key is None:
+                return await self._call(priority, bucket, make_call)
+            task = self._coalesced.get(coalesce_key)
+            if task is None:
+                task = asyncio.ensure_future(self._call(priority, bucket, make_call))
+                self._coalesced[coalesce_key] = task
+                task.add_done_callback(lambda _: self._coalesced.pop(coalesce_key, None))
+            # one caller giving up doesn't cancel the call for the others
+            return await asyncio.shield(task)
+
+    async def _call(self, priority, bucket, make_call):
+        route = bucket[0]
+        for attempt in itertools.count():
+            await self._acquire(priority, bucket)
+            started = time.monotonic()
+            try:
+                return await make_call()
+            except Exception as e:
+                # discord.py puts the HTTP status of failed requests in `status`,
+                # interactions waits out rate limits itself and only fails for other errors
+                if getattr(e, "status", None) != 429 or attempt >= RATE_LIMIT_RETRIES:
+                    raise
+                self.stats[priority].rate_limited += 1
+                REST_RATE_LIMITS.inc(route)
+                retry_after = getattr(e, "retry_after", None) or RATE_LIMIT_BACKOFF
+                logging.info(f"Rate limited on {bucket}, retrying in {retry_after:.2f}s")
+                self._pause_bucket(bucket, retry_after)
+            finally:
+                REST_CALLS.inc(route, PRIORITY_NAMES[priority])
+                REST_CALL_SECONDS.observe(time.monotonic() - started, route)
+                self._release(bucket)
+
+    def get_stats(self):
+        """Get the queue statistics of each priority
+
+        Returns:
+            dict[str,dict[str,float]]: statistics by priority name
+        """
+        return {
+            PRIORITY_NAMES[priority]: stats.as_dict()
+            for priority, stats in self.stats.items()
+        }
+
+    def log_stats(self):
+        """Log the queue statistics of each priority"""
+        for name, stats in self.get_stats().items():
+            logging.info(
+                f"Outbound {name} calls: {stats['calls']} made, {stats['queued']} queued, "
+                f"{stats['rate_limited']} rate limited, waited {stats['average_wait'] * 1000:.0f}ms "
+                f"on average and {stats['max_wait'] * 1000:.0f}ms at most"
+            )
+
+
+# shared by both bots when they run in the same process, they use the same token and so the same limits
+outbound = OutboundScheduler(MAX_CONCURRENT_REST_CALLS)
+
+REST_QUEUE_DEPTH = Gauge(
+    "discord_rest_queue_depth",
+    "REST calls waiting in the outbound queue",
+    labels=("priority",),
+    collect=lambda: {
+        (PRIORITY_NAMES[priority],): stats.queued
+        for priority, stats in outbound.stats.items()
+    },
+)
+
+_stats_logger = None
+
+
+async def _log_stats_forever():
+    while True:
+        await asyncio.sleep(STATS_LOG_INTERVAL)
+        outbound.log_stats()
+
+
+def start_stats_logging():
+    """Log the queue statistics every STATS_LOG_INTERVAL seconds, does nothing if already started
+
+    Must be called from inside the running event loop.
+    """
+    global _stats_logger
+    if _stats_logger is None:
+        _stats_logger = asyncio.create_task(_log_stats_forever())
@@ -0,0 +1,134 @@
+import logging
+from collections import Counter
+
+from poll_store import count_polls_by_creator
+from poll_store import get_guild_revision
+from poll_store import get_guild_revisions
+
+
+class PollCounter:
+    """Counts active polls per creator in memory, so the per-user limit is checked without querying every poll
+
+    The results checker closes polls from another process. Every change to a guild's polls bumps its
+    revision in the store, and a guild whose revision moved is recounted before it is read.
+    """
+
+    def __init__(self):
+        # guild ID -> Counter of (channel ID, creator ID)
+        self._channel_counts = {}
+        # guild ID -> Counter of creator ID, across channels
+        self._guild_counts = {}
+        # guild ID -> revision of the guild's polls the counts are up to date with
+        self._revisions = {}
+
+    def load_all(self):
+        """Count the active polls of every guild from the store"""
+        # read revisions first, if polls change in between the guild is just recounted later
+        revisions = get_guild_revisions()
+        rows = count_polls_by_creator()
+        self._channel_counts = {}
+        self._guild_counts = {}
+        self._add_rows(rows)
+        self._revisions = revisions
+
+    def load_guild(self, guild_id):
+        """Count the active polls of one guild from the store
+
+        Args:
+            guild_id (int): ID of guild
+        """
+        guild_id = int(guild_id)
+        revision = get_guild_revision(guild_id)
+        rows = count_polls_by_creator(guild_id)
+        self._channel_counts.pop(guild_id, None)
+        self._guild_counts.pop(guild_id, None)
+        self._add_rows(rows)
+        self._revisions[guild_id] = revision
+
+    def _add_rows(self, rows):
+        for guild_id, channel_id, creator_id, count in rows:
+            self._channel_counts.setdefault(guild_id, Counter())[
+                (channel_id, creator_id)
+            ] += count
+            self._guild_counts.setdefault(guild_id, Counter())[creator_id] += count
+
+    def _sync_guild(self, guild_id):
+        if get_guild_revision(guild_id) != self._revisions.get(guild_id, 0):
+            self.load_guild(guild_id)
+
+    def count(self, guild_id, channel_id, creator_id, scope="channel"):
+        """Get how many active polls a user has created
+
+        Args:
+            guild_id (int): ID of guild
+            channel_id (int): ID of channel, ignored for the "guild" scope
+            creator_id (int): ID of poll creator
+            scope (str, optional): "channel" to count polls in the channel only, "guild" for the whole guild.
+                Defaults to "channel".
+
+        Returns:
+            int: number of active polls
+        """
+        guild_id, channel_id, creator_id = int(guild_id), int(channel_id), int(creator_id)
+        self._sync_guild(guild_id)
+        if scope == "guild":
+            return self._guild_counts.get(guild_id, Counter())[creator_id]
+        return self._channel_counts.get(guild_id, Counter())[(channel_id, creator_id)]
+
+    def _apply_change(self, guild_id, channel_id, creator_id, change):
+        guild_id, channel_id, creator_id = int(guild_id), int(channel_id), int(creator_id)
+        revision = get_guild_revision(guild_id)
+        if revision != self._revisions.get(guild_id, 0) + 1:
+            # something else changed too, recount the guild (including this poll)
+            self.load_guild(guild_id)
+            return
+        self._channel_counts.setdefault(guild_id, Counter())[
+            (channel_id, creator_id)
+        ] += change
+        self._guild_counts.setdefault(guild_id, Counter())[creator_id] += change
+        self._revisions[guild_id] = revision
+
+    def add(self, guild_id, channel_id, creator_id):
+        """Count a poll right after it was saved to the store
+
+        Args:
+            guild_id (int): ID of guild
+            channel_id (int): ID of channel
+            creator_id (int): ID of poll creator
+        """
+        self._apply_change(guild_id, channel_id, creator_id, 1)
+
+    def remove(self, guild_id, channel_id, creator_id):
+        """Stop counting a poll right after it was removed from the store
+
+        Args:
+            guild_id (int): ID of guild
+            channel_id (int): ID of channel
+            creator_id (int): ID of poll creator
+        """
+        self._apply_change(guild_id, channel_id, creator_id, -1)
+
+    def check_consistency(self):
+        """Compare the counts with the store, rebuilding them if they drifted
+
+        Returns:
+            bool: True if the counts matched the store
+        """
+        revisions = get_guild_revisions()
+        expected = {}
+        for guild_id, channel_id, creator_id, count in count_polls_by_creator():
+            expected.setdefault(guild_id, Counter())[(channel_id, creator_id)] = count
+        consistent = True
+        for guild_id in expected.keys() | self._channel_counts.keys():
+            if revisions.get(guild_id, 0) != self._revisions.get(guild_id, 0):
+                # changed by the other process since last read, recounted on next use anyway
+                continue
+            # compare without zero counts left behind by closed polls
+            if +self._channel_counts.get(guild_id, Counter()) != expected.get(
+                guild_id, Counter()
+            ):
+                consistent = False
+        if not consistent:
+            logging.warning("Active poll counts drifted from the poll store, rebuilding")
+            self.load_all()
+        return consistent
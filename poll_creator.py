@@ -1,18 +1,72 @@
-import os
-
+import asyncio
+import functools
+import logging
+import time
+from collections import namedtuple
+from io import BytesIO
+
+import aiohttp
 import interactions
 
-from config import ACTIVE_POLLS_PER_USER_LIMIT
-from config import ALLOWED_CHANNEL_IDS
+from config import IMAGE_PREFETCH_WAIT
+from config import MAX_PROFILE_DURATION
+from config import METRICS_HOST
+from config import POLL_COUNTER_CHECK_INTERVAL
+from config import POLL_CREATOR_ADMIN_SOCKET_PATH
+from config import POLL_CREATOR_METRICS_PORT
+from config import POLL_EVENT_SOCKET_PATH
 from config import POLL_NO_EMOJI
 from config import POLL_YES_EMOJI
-from config import PROTECTED_EMOTE_NAMES
+from config import RESULTS_CHECKER_ADMIN_SOCKET_PATH
+from config import SHARD_COUNT
+from config import SHARD_IDS
 from config import TOKEN_FILE_NAME
-from utils import check_if_user_reach_poll_limit
+from emoji_index import GuildEmojiIndexes
+from guild_settings import DEFAULT_SETTINGS
+from guild_settings import InvalidSettingError
+from guild_settings import SETTINGS
+from guild_settings import get_guild_overrides
+from guild_settings import get_guild_settings
+from guild_settings import load_all_guild_settings
+from guild_settings import reset_guild_setting
+from guild_settings import set_guild_setting
+from guild_settings import to_stored_value
+from http_client import fetch_application_info
+from image_cache import fetch_image
+from image_cache import fit_and_cache_image
+from image_cache import get_animation_format
+from image_cache import is_animated_image
+from metrics import Histogram
+from metrics import start_metrics_server
+from outbound import REPLY
+from outbound import outbound
+from outbound import start_stats_logging
+from poll_counters import PollCounter
+from poll_events import GUILD_SETTINGS_CHANGED
+from poll_events import POLL_CLOSED
+from poll_events import POLL_CREATED
+from poll_events import publish
+from poll_events import subscribe
+from poll_ipc import PollEventChannel
+from poll_store import count_polls_of_type
+from poll_store import get_guild_revision
+from poll_store import get_polls_page
+from poll_store import import_active_polls_directory
+from poll_store import save_poll
+from poll_store import update_poll_image_hash
+from profiler import DEFAULT_PROFILE_SECONDS
+from profiler import ProfileError
+from profiler import request_profile
+from profiler import run_profile
+from profiler import serve_admin_socket
+from tracing import start_trace
+from tracing import traced
 from utils import display_percent_str
 from utils import extract_emoji_name_from_syntax
+from utils import format_poll_line
 from utils import get_emoji_formatted_str
-from utils import get_existing_emoji_by_name
+from utils import is_animated_image_url
+from utils import log_startup_stats
 from utils import pretty_poll_type
 from utils import validate_emoji_name
 from utils import validate_image_url
@@ -38,14 +92,155 @@ sticker_limits = {
     3: 60,
 }
 
-## make active_polls directory if it doesn't exist
-if "active_polls" not in os.listdir():
-    os.mkdir("active_polls")
+## import polls saved by older versions of the bot
+import_active_polls_directory()
+
+## read the settings each guild changed from their defaults in config.py
+load_all_guild_settings()
+
+## count active polls per user once, kept up to date as polls are made and closed
+poll_counter = PollCounter()
+poll_counter.load_all()
+subscribe(
+    POLL_CLOSED,
+    lambda poll: poll_counter.remove(poll.guild_id, poll.channel_id, poll.creator_id),
+)
+# sends new polls and settings changes to the results checker and receives closed polls, when they run in separate processes
+poll_event_channel = PollEventChannel(
+    POLL_EVENT_SOCKET_PATH,
+    outgoing_events=[POLL_CREATED, GUILD_SETTINGS_CHANGED],
+    resync=poll_counter.load_all,
+)
+background_tasks = []
+# bots /debug-profile can profile, by option value
+PROFILE_TARGETS = {"checker": "results checker", "creator": "poll creator"}
+# profiles being taken for /debug-profile, until their report is sent
+profile_requests = set()
+# IDs of the users owning the bot's application, fetched on first use
+owner_ids = None
+
+# polls listed on each page of /show-polls
+POLLS_PER_PAGE = 10
+# rendered /show-polls pages kept per guild, the cache is dropped when the guild's polls change
+MAX_CACHED_POLL_PAGES = 64
+# prefix of the custom IDs of /show-polls page buttons
+SHOW_POLLS_CUSTOM_ID = "show-polls"
+POLL_TYPES = [
+    "addemoji",
+    "addsticker",
+    "deleteemoji",
+    "deletesticker",
+    "renameemoji",
+    "renamesticker",
+    "changeemoji",
+    "changesticker",
+]
+
+# guild ID -> (revision of the guild's polls, {page key: rendered page})
+poll_page_cache = {}
+
+# emojis and stickers of each guild by name
+emoji_indexes = GuildEmojiIndexes()
+
+
+def get_creator_shard():
+    """Get the shard the poll creator connects as, an interactions client runs a single shard
+
+    Returns:
+        list[int]: shard ID and shard count, empty to connect unsharded
+
+    Raises:
+        ValueError: more than one shard is configured but SHARD_IDS doesn't pick exactly one
+    """
+    if SHARD_COUNT is None or SHARD_COUNT == 1:
+        return []
+    if SHARD_IDS is None or len(SHARD_IDS) != 1:
+        raise ValueError(
+            "The poll creator runs one shard per process, set SHARD_IDS to a single shard ID"
+        )
+    return [SHARD_IDS[0], SHARD_COUNT]
+
 
 # used to create polls
-bot = interactions.Client(token)
+bot = interactions.Client(token, shards=get_creator_shard())
+
+
+COMMAND_SECONDS = Histogram(
+    "slash_command_seconds", "Time slash commands took to handle", labels=("command",)
+)
+
+
+def timed_command(coro):
+    """Record how long a slash command handler takes and trace its steps, placed between `@bot.command` and the handler
+
+    Args:
+        coro (Callable[..., Awaitable]): command handler
+
+    Returns:
+        Callable[..., Awaitable]: handler recording its duration in COMMAND_SECONDS
+    """
+
+    # interactions checks the handler's arguments, it takes any options when they are passed as **kwargs
+    @functools.wraps(coro)
+    async def wrapper(ctx, *args, **kwargs):
+        started = time.monotonic()
+        try:
+            with start_trace(
+                coro.__name__,
+                interaction_id=int(ctx.id),
+                guild_id=int(ctx.guild_id) if ctx.guild_id else None,
+                user_id=int(ctx.user.id),
+            ):
+                return await coro(ctx, *args, **kwargs)
+        finally:
+            COMMAND_SECONDS.observe(time.monotonic() - started, coro.__name__)
+
+    return wrapper
+
+
+async def check_poll_counter():
+    """Compare the active poll counts with the store every POLL_COUNTER_CHECK_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(POLL_COUNTER_CHECK_INTERVAL)
+        poll_counter.check_consistency()
+
+
+@bot.event
+async def on_ready():
+    # on_ready fires again after reconnecting, only start the background tasks once
+    if len(background_tasks) == 0:
+        log_startup_stats("Poll creator")
+        background_tasks.append(asyncio.create_task(check_poll_counter()))
+        start_stats_logging()
+        await start_metrics_server(METRICS_HOST, POLL_CREATOR_METRICS_PORT)
+
+
+@bot.event
+async def on_guild_create(guild: interactions.Guild):
+    emoji_indexes.index_guild(guild)
+
+
+@bot.event
+async def on_guild_update(guild: interactions.Guild):
+    emoji_indexes.update_premium_tier(guild.id, guild.premium_tier)
+
 
+@bot.event
+async def on_guild_delete(guild: interactions.Guild):
+    emoji_indexes.forget_guild(guild.id)
 
+
+@bot.event
+async def on_guild_emojis_update(event: interactions.GuildEmojis):
+    emoji_indexes.update_emojis(event.guild_id, event.emojis)
+
+
+@bot.event
+async def on_guild_stickers_update(event: interactions.GuildStickers):
+    emoji_indexes.update_stickers(event.guild_id, event.stickers)
+
+
+@traced
 async def check_channel_is_allowed(channel_id, ctx):
     """Check if a channel is allowed to be used for polls
 
@@ -56,10 +251,11 @@ async def check_channel_is_allowed(channel_id, ctx):
     Returns:
         bool: whether channel is allowed
     """
-    if channel_id in ALLOWED_CHANNEL_IDS:
+    allowed_channel_ids = get_guild_settings(ctx.guild_id).allowed_channel_ids
+    if int(channel_id) in allowed_channel_ids:
         return True
     else:
-        channel_mention = " ".join([f"<#{i}>" for i in ALLOWED_CHANNEL_IDS])
+        channel_mention = " ".join([f"<#{i}>" for i in sorted(allowed_channel_ids)])
         await ctx.send(
             "This channel is not allowed to be used for polls. Please use one of the following channels: "
             + channel_mention,
@@ -68,6 +264,23 @@ async def check_channel_is_allowed(channel_id, ctx):
         return False
 
 
+@traced
+async def get_emoji_index(ctx):
+    """Get the emoji/sticker index of the guild a command was used in, fetching the guild on first use
+
+    Args:
+        ctx (interactions.Context): context object
+
+    Returns:
+        emoji_index.GuildEmojiIndex: index of the guild
+    """
+    guild_index = emoji_indexes.get(ctx.guild_id)
+    if guild_index is None:
+        guild_index = emoji_indexes.index_guild(await ctx.get_guild())
+    return guild_index
+
+
+@traced
 async def check_emoji_is_modifiable(emoji_name, ctx):
     """Check if an emoji name is modifiable
 
@@ -78,21 +291,25 @@ async def check_emoji_is_modifiable(emoji_name, ctx):
     Returns:
         bool: whether emoji is modifiable
     """
-    if emoji_name in PROTECTED_EMOTE_NAMES:
+    if emoji_name in get_guild_settings(ctx.guild_id).protected_emote_names:
         await ctx.send("This name is protected and can not be modified", ephemeral=True)
         return False
     else:
         return True
 
 
+@traced
 async def check_user_reached_limit(ctx: interactions.CommandContext):
-    guild = await ctx.get_guild()
-
-    guild_id = guild.id
-
-    if check_if_user_reach_poll_limit(guild_id, ctx.channel_id, int(ctx.user.id)):
+    settings = get_guild_settings(ctx.guild_id)
+    if (
+        poll_counter.count(
+            ctx.guild_id, ctx.channel_id, ctx.user.id, settings.active_polls_limit_scope
+        )
+        >= settings.active_polls_per_user_limit
+    ):
+        where = "server" if settings.active_polls_limit_scope == "guild" else "channel"
         await ctx.send(
-            f"You have reached the limit of number of active polls per user, {ACTIVE_POLLS_PER_USER_LIMIT}",
+            f"You have reached the limit of number of active polls per user in this {where}, {settings.active_polls_per_user_limit}",
             ephemeral=True,
         )
         return True
@@ -100,7 +317,19 @@ async def check_user_reached_limit(ctx: interactions.CommandContext):
         return False
 
 
-def save_poll_to_memory(guild_id, channel_id, message_id, user_id, poll_type):
+@traced
+def save_poll_to_memory(
+    guild_id,
+    channel_id,
+    message_id,
+    user_id,
+    poll_type,
+    target_name,
+    new_name=None,
+    image_url=None,
+    image_hash=None,
+    animated=None,
+):
     """Save a poll to memory
 
     Args:
@@ -109,23 +338,111 @@ def save_poll_to_memory(guild_id, channel_id, message_id, user_id, poll_type):
         message_id (int): ID of message
         user_id (Snowflake): ID of poll creator
         poll_type (str): type of poll
+        target_name (str): name of the emoji/sticker the poll is about
+        new_name (str, optional): proposed new name, only used in renaming polls
+        image_url (str, optional): URL of the image shown in the poll
+        image_hash (str, optional): hash of the proposed image in the image cache
+        animated (bool, optional): whether the proposed image is animated
+    """
+    poll = save_poll(
+        guild_id,
+        channel_id,
+        message_id,
+        user_id,
+        poll_type,
+        target_name=target_name,
+        new_name=new_name,
+        image_url=image_url,
+        image_hash=image_hash,
+        animated=animated,
+        duration=get_guild_settings(guild_id).poll_duration,
+    )
+    poll_counter.add(guild_id, channel_id, user_id)
+    publish(POLL_CREATED, poll)
+
+
+# the download is kept apart from the fitting, so whether the image is animated can be read from it early
+ImagePrefetch = namedtuple("ImagePrefetch", ["download", "cached"])
+
+
+@traced
+async def prefetch_poll_image(ctx, image_url, poll_type):
+    """Start downloading and fitting the proposed image of a poll, so it is ready when the poll closes
+
+    Waits up to IMAGE_PREFETCH_WAIT seconds so a dead URL can be refused before the poll is made,
+    slower images keep processing in the background.
+
+    Args:
+        ctx (interactions.Context): context object
+        image_url (str): URL of the proposed image
+        poll_type (str): type of poll, decides the format of animated images
+
+    Returns:
+        ImagePrefetch: tasks resolving to the downloaded image file, and to the hash of the cached image
+            and whether it is animated, or None if the image could not be retrieved
+    """
+    download = asyncio.create_task(fetch_image(image_url))
+    cached = asyncio.create_task(
+        fit_and_cache_image(download, get_animation_format(poll_type))
+    )
+    await asyncio.wait([cached], timeout=IMAGE_PREFETCH_WAIT)
+    if cached.done() and cached.exception() is not None:
+        await ctx.send(
+            f"Image could not be retrieved, {cached.exception()}", ephemeral=True
+        )
+        return None
+    return ImagePrefetch(download, cached)
+
+
+def get_prefetched_image_hash(prefetch, message_id):
+    """Get the hash of a prefetched image, or save it to the poll later if it is still processing
+
+    Args:
+        prefetch (ImagePrefetch): prefetch returned by prefetch_poll_image
+        message_id (int): ID of poll message
+
+    Returns:
+        str: hash of the cached image, or None if it isn't ready yet
     """
-    try:
-        os.mkdir(f"active_polls/{guild_id}")
-    except FileExistsError:
-        pass
-    finally:
-        try:
-            os.mkdir(f"active_polls/{guild_id}/{channel_id}")
-        except FileExistsError:
-            pass
-    with open(
-        f"active_polls/{guild_id}/{channel_id}/{message_id}_{poll_type}",
-        "w",
-    ) as f:
-        f.write(str(user_id))
 
+    def save_image_hash(cached):
+        if cached.exception() is not None:
+            # the checker will try downloading it again when the poll closes
+            logging.warning(
+                f"Image of poll {message_id} could not be retrieved: {cached.exception()}"
+            )
+        else:
+            update_poll_image_hash(message_id, *cached.result())
+
+    if not prefetch.cached.done():
+        prefetch.cached.add_done_callback(save_image_hash)
+        return None
+    if prefetch.cached.exception() is not None:
+        save_image_hash(prefetch.cached)
+        return None
+    return prefetch.cached.result()[0]
+
+
+def is_prefetched_image_animated(prefetch, image_url):
+    """Check if a prefetched image is animated, guessing from its URL if it is still downloading
+
+    Args:
+        prefetch (ImagePrefetch): prefetch returned by prefetch_poll_image
+        image_url (str): URL of the proposed image
+
+    Returns:
+        boolean: True if the image is (probably) animated
+    """
+    if prefetch.cached.done() and prefetch.cached.exception() is None:
+        return prefetch.cached.result()[1]
+    if prefetch.download.done() and prefetch.download.exception() is None:
+        animated = is_animated_image(prefetch.download.result())
+        if animated is not None:
+            return animated
+    return is_animated_image_url(image_url)
 
+
+@traced
 async def create_poll_message(ctx, title, description, url=None, image_url=None):
     """Create a poll message
 
@@ -141,9 +458,20 @@ async def create_poll_message(ctx, title, description, url=None, image_url=None)
     """
     embed = interactions.Embed(title=title, url=url, description=description)
     embed.set_image(url=image_url)
-    poll = await ctx.send(embeds=[embed])
-    await poll.create_reaction(POLL_YES_EMOJI)
-    await poll.create_reaction(POLL_NO_EMOJI)
+    poll = await outbound.call(
+        REPLY, ("interaction", int(ctx.id)), lambda: ctx.send(embeds=[embed])
+    )
+    # both reactions at once, rather than waiting for the first to add the second
+    await asyncio.gather(
+        *(
+            outbound.call(
+                REPLY,
+                ("reaction", int(poll.channel_id)),
+                lambda emoji=emoji: poll.create_reaction(emoji),
+            )
+            for emoji in (POLL_YES_EMOJI, POLL_NO_EMOJI)
+        )
+    )
     return poll.id
 
 
@@ -167,6 +495,7 @@ async def create_poll_message(ctx, title, description, url=None, image_url=None)
         ),
     ],
 )
+@timed_command
 async def add_emoji(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to add an emoji to the server
 
@@ -187,39 +516,38 @@ async def add_emoji(ctx: interactions.CommandContext, **kwargs):
     if not await check_emoji_is_modifiable(emoji_name, ctx):
         return
 
-    guild = await ctx.get_guild()
-    existing_emojis = guild.emojis
-    if get_existing_emoji_by_name(emoji_name, existing_emojis) is not None:
+    guild_index = await get_emoji_index(ctx)
+    if guild_index.get_emoji(emoji_name) is not None:
         await ctx.send("Emoji name already on this server", ephemeral=True)
         return
 
-    if (
-        len([e for e in existing_emojis if not e.animated])
-        + len(
-            [
-                p
-                for p in os.listdir(f"active_polls/{guild.id}/{ctx.channel_id}")
-                if p.endswith("addemoji")
-            ]
-        )
-        >= emoji_limits[guild.premium_tier]
-    ):
+    if not validate_emoji_name(emoji_name):
         await ctx.send(
-            "Emoji limit reached for this server OR too many active adding polls",
+            "Emoji name must be alphanumeric characters and underscores only",
             ephemeral=True,
         )
         return
 
-    if not validate_emoji_name(emoji_name):
+    if not validate_image_url(emoji_url):
         await ctx.send(
-            "Emoji name must be alphanumeric characters and underscores only",
+            "Invalid image URL, emoji url must end in png, jpg, jpeg, gif, webp, or apng",
             ephemeral=True,
         )
         return
 
-    if not validate_image_url(emoji_url):
+    prefetch = await prefetch_poll_image(ctx, emoji_url, "addemoji")
+    if prefetch is None:
+        return
+
+    # static and animated emojis have separate slots
+    animated = is_prefetched_image_animated(prefetch, emoji_url)
+    if (
+        guild_index.count_emojis(animated)
+        + count_polls_of_type(ctx.guild_id, ctx.channel_id, "addemoji", animated)
+        >= emoji_limits[guild_index.premium_tier]
+    ):
         await ctx.send(
-            "Invalid image URL, emoji url must end in png, jpg, or jpeg (Animated Emojis are not currently supported)",
+            f"{'Animated emoji' if animated else 'Emoji'} limit reached for this server OR too many active adding polls",
             ephemeral=True,
         )
         return
@@ -232,10 +560,17 @@ async def add_emoji(ctx: interactions.CommandContext, **kwargs):
         emoji_url,
     )
 
-    # save poll to active_polls directory
-    poll_channel = await ctx.get_channel()
+    # save poll to the poll store
     save_poll_to_memory(
-        poll_channel.guild_id, poll_channel.id, poll_id, ctx.user.id, "addemoji"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "addemoji",
+        emoji_name,
+        image_url=emoji_url,
+        image_hash=get_prefetched_image_hash(prefetch, poll_id),
+        animated=animated,
     )
 
 
@@ -259,6 +594,7 @@ async def add_emoji(ctx: interactions.CommandContext, **kwargs):
         ),
     ],
 )
+@timed_command
 async def add_sticker(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to add a sticker to the server
 
@@ -279,21 +615,14 @@ async def add_sticker(ctx: interactions.CommandContext, **kwargs):
     if not await check_emoji_is_modifiable(sticker_name, ctx):
         return
 
-    guild = await ctx.get_guild()
-    existing_stickers = guild.stickers
-    if get_existing_emoji_by_name(sticker_name, existing_stickers) is not None:
+    guild_index = await get_emoji_index(ctx)
+    if guild_index.get_sticker(sticker_name) is not None:
         await ctx.send("Sticker name already exists on this server", ephemeral=True)
         return
     if (
-        len(existing_stickers)
-        + len(
-            [
-                p
-                for p in os.listdir(f"active_polls/{guild.id}/{ctx.channel_id}")
-                if p.endswith("addsticker")
-            ]
-        )
-        >= sticker_limits[guild.premium_tier]
+        guild_index.sticker_count
+        + count_polls_of_type(ctx.guild_id, ctx.channel_id, "addsticker")
+        >= sticker_limits[guild_index.premium_tier]
     ):
         await ctx.send(
             "Sticker limit reached for this server OR too many active adding polls",
@@ -309,12 +638,15 @@ async def add_sticker(ctx: interactions.CommandContext, **kwargs):
 
     if not validate_image_url(sticker_url):
         await ctx.send(
-            """Invalid image URL, stick url must end in png, jpg, or 
-            jpeg (Animated stickers are not currently supported)""",
+            "Invalid image URL, sticker url must end in png, jpg, jpeg, gif, webp, or apng",
             ephemeral=True,
         )
         return
 
+    prefetch = await prefetch_poll_image(ctx, sticker_url, "addsticker")
+    if prefetch is None:
+        return
+
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR NEW STICKER: :{sticker_name}:",
@@ -323,10 +655,17 @@ async def add_sticker(ctx: interactions.CommandContext, **kwargs):
         sticker_url,
     )
 
-    # save poll to active_polls directory
-    poll_channel = await ctx.get_channel()
+    # save poll to the poll store
     save_poll_to_memory(
-        poll_channel.guild_id, poll_channel.id, poll_id, ctx.user.id, "addsticker"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "addsticker",
+        sticker_name,
+        image_url=sticker_url,
+        image_hash=get_prefetched_image_hash(prefetch, poll_id),
+        animated=is_prefetched_image_animated(prefetch, sticker_url),
     )
 
 
@@ -343,6 +682,7 @@ async def add_sticker(ctx: interactions.CommandContext, **kwargs):
         )
     ],
 )
+@timed_command
 async def delete_emoji(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to delete an emoji from the server
 
@@ -362,27 +702,34 @@ async def delete_emoji(ctx: interactions.CommandContext, **kwargs):
         return
 
     # check if emoji exists and get emoji object if it does
-    guild = await ctx.get_guild()
-    existing_emojis = guild.emojis
-    emoji = get_existing_emoji_by_name(emoji_name, existing_emojis)
+    guild_index = await get_emoji_index(ctx)
+    emoji = guild_index.get_emoji(emoji_name)
     if emoji is None:
         await ctx.send("Emoji does not exist on this server", ephemeral=True)
         return
 
     emoji_str = get_emoji_formatted_str(emoji)
+    emoji_url = (
+        f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size=128&quality=lossless"
+    )
 
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR DELETING EMOJI: :{emoji_name}:",
         f"Should we delete this emoji? {emoji_str} (full size version below this poll)",
-        f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size=128&quality=lossless",
-        f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size=128&quality=lossless",
+        emoji_url,
+        emoji_url,
     )
 
-    # save poll to active_polls directory
-    poll_channel = await ctx.get_channel()
+    # save poll to the poll store
     save_poll_to_memory(
-        poll_channel.guild_id, poll_channel.id, poll_id, ctx.user.id, "deleteemoji"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "deleteemoji",
+        emoji_name,
+        image_url=emoji_url,
     )
 
 
@@ -399,6 +746,7 @@ async def delete_emoji(ctx: interactions.CommandContext, **kwargs):
         )
     ],
 )
+@timed_command
 async def delete_sticker(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to delete an emoji from the server
 
@@ -418,25 +766,31 @@ async def delete_sticker(ctx: interactions.CommandContext, **kwargs):
         return
 
     # check if sticker exists and get sticker object if it does
-    guild = await ctx.get_guild()
-    existing_stickers = guild.stickers
-    sticker = get_existing_emoji_by_name(sticker_name, existing_stickers)
+    guild_index = await get_emoji_index(ctx)
+    sticker = guild_index.get_sticker(sticker_name)
     if sticker is None:
         await ctx.send("Sticker does not exist on this server", ephemeral=True)
         return
 
+    sticker_url = f"https://cdn.discordapp.com/stickers/{sticker.id}.png"
+
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR DELETING STICKER: :{sticker_name}:",
         "Should we delete this sticker? (full size version below this poll)",
-        f"https://cdn.discordapp.com/stickers/{sticker.id}.png",
-        f"https://cdn.discordapp.com/stickers/{sticker.id}.png",
+        sticker_url,
+        sticker_url,
     )
 
-    # save poll to active_polls directory
-    poll_channel = await ctx.get_channel()
+    # save poll to the poll store
     save_poll_to_memory(
-        poll_channel.guild_id, poll_channel.id, poll_id, ctx.user.id, "deletesticker"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "deletesticker",
+        sticker_name,
+        image_url=sticker_url,
     )
 
 
@@ -460,6 +814,7 @@ async def delete_sticker(ctx: interactions.CommandContext, **kwargs):
         ),
     ],
 )
+@timed_command
 async def rename_emoji(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to rename an emoji on the server
 
@@ -479,32 +834,40 @@ async def rename_emoji(ctx: interactions.CommandContext, **kwargs):
     if not await check_emoji_is_modifiable(current_name, ctx):
         return
 
-    guild = await ctx.get_guild()
-    existing_emojis = guild.emojis
+    guild_index = await get_emoji_index(ctx)
 
     if not validate_emoji_name(new_name):
         await ctx.send("Invalid emoji name", ephemeral=True)
         return
 
-    emoji = get_existing_emoji_by_name(current_name, existing_emojis)
+    emoji = guild_index.get_emoji(current_name)
     if emoji is None:
         await ctx.send("Emoji does not exist on this server", ephemeral=True)
         return
 
     # get string representation of emoji
     emoji_str = get_emoji_formatted_str(emoji)
+    emoji_url = (
+        f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size=128&quality=lossless"
+    )
 
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR RENAMING EMOJI: :{current_name}: -> :{new_name}:",
         f"Should we rename this emoji ({emoji_str}) to :{new_name}:?",
-        f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size=128&quality=lossless",
-        f"https://cdn.discordapp.com/emojis/{emoji.id}.png?size=128&quality=lossless",
+        emoji_url,
+        emoji_url,
     )
 
-    poll_channel = await ctx.get_channel()
     save_poll_to_memory(
-        poll_channel.guild_id, poll_channel.id, poll_id, ctx.user.id, "renameemoji"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "renameemoji",
+        current_name,
+        new_name=new_name,
+        image_url=emoji_url,
     )
 
 
@@ -528,6 +891,7 @@ async def rename_emoji(ctx: interactions.CommandContext, **kwargs):
         ),
     ],
 )
+@timed_command
 async def rename_sticker(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to rename an sticker on the server
 
@@ -551,24 +915,31 @@ async def rename_sticker(ctx: interactions.CommandContext, **kwargs):
         ctx.send("Sticker name cannot contain colons", ephemeral=True)
         return
 
-    guild = await ctx.get_guild()
-    existing_stickers = guild.stickers
-    sticker = get_existing_emoji_by_name(current_name, existing_stickers)
+    guild_index = await get_emoji_index(ctx)
+    sticker = guild_index.get_sticker(current_name)
     if sticker is None:
         ctx.send("Sticker does not exist on this server", ephemeral=True)
         return
 
+    sticker_url = f"https://cdn.discordapp.com/stickers/{sticker.id}.png"
+
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR RENAMING STICKER: :{current_name}: -> :{new_name}:",
         f"Should we rename this sticker to :{new_name}:?",
-        f"https://cdn.discordapp.com/stickers/{sticker.id}.png",
-        f"https://cdn.discordapp.com/stickers/{sticker.id}.png",
+        sticker_url,
+        sticker_url,
     )
 
-    channel = await ctx.get_channel()
     save_poll_to_memory(
-        channel.guild_id, channel.id, poll_id, ctx.user.id, "renamesticker"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "renamesticker",
+        current_name,
+        new_name=new_name,
+        image_url=sticker_url,
     )
 
 
@@ -592,6 +963,7 @@ async def rename_sticker(ctx: interactions.CommandContext, **kwargs):
         ),
     ],
 )
+@timed_command
 async def change_emoji(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to change the image of an emoji on the server
 
@@ -615,9 +987,8 @@ async def change_emoji(ctx: interactions.CommandContext, **kwargs):
         await ctx.send("Invalid image URL", ephemeral=True)
         return
 
-    guild = await ctx.get_guild()
-    existing_emojis = guild.emojis
-    emoji = get_existing_emoji_by_name(emoji_name, existing_emojis)
+    guild_index = await get_emoji_index(ctx)
+    emoji = guild_index.get_emoji(emoji_name)
     if emoji is None:
         await ctx.send("Emoji does not exist on this server", ephemeral=True)
         return
@@ -625,6 +996,23 @@ async def change_emoji(ctx: interactions.CommandContext, **kwargs):
     # get string representation of emoji
     emoji_str = get_emoji_formatted_str(emoji)
 
+    prefetch = await prefetch_poll_image(ctx, image_url, "changeemoji")
+    if prefetch is None:
+        return
+
+    # changing between static and animated moves the emoji to the other kind of slot
+    animated = is_prefetched_image_animated(prefetch, image_url)
+    if animated != emoji.animated and (
+        guild_index.count_emojis(animated)
+        + count_polls_of_type(ctx.guild_id, ctx.channel_id, "addemoji", animated)
+        >= emoji_limits[guild_index.premium_tier]
+    ):
+        await ctx.send(
+            f"No {'animated' if animated else 'static'} emoji slot left for the new image",
+            ephemeral=True,
+        )
+        return
+
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR CHANGING EMOJI: :{emoji_name}:",
@@ -633,9 +1021,16 @@ async def change_emoji(ctx: interactions.CommandContext, **kwargs):
         image_url,
     )
 
-    poll_channel = await ctx.get_channel()
     save_poll_to_memory(
-        poll_channel.guild_id, poll_channel.id, poll_id, ctx.user.id, "changeemoji"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "changeemoji",
+        emoji_name,
+        image_url=image_url,
+        image_hash=get_prefetched_image_hash(prefetch, poll_id),
+        animated=animated,
     )
 
 
@@ -659,6 +1054,7 @@ async def change_emoji(ctx: interactions.CommandContext, **kwargs):
         ),
     ],
 )
+@timed_command
 async def change_sticker(ctx: interactions.CommandContext, **kwargs):
     """Create a poll to change the image of a sticker on the server
 
@@ -682,13 +1078,16 @@ async def change_sticker(ctx: interactions.CommandContext, **kwargs):
         await ctx.send("Invalid image URL", ephemeral=True)
         return
 
-    guild = await ctx.get_guild()
-    existing_stickers = guild.stickers
-    sticker = get_existing_emoji_by_name(sticker_name, existing_stickers)
+    guild_index = await get_emoji_index(ctx)
+    sticker = guild_index.get_sticker(sticker_name)
     if sticker is None:
         await ctx.send("Sticker does not exist on this server", ephemeral=True)
         return
 
+    prefetch = await prefetch_poll_image(ctx, image_url, "changesticker")
+    if prefetch is None:
+        return
+
     poll_id = await create_poll_message(
         ctx,
         f"POLL FOR CHANGING STICKER: :{sticker_name}:",
@@ -697,7 +1096,15 @@ async def change_sticker(ctx: interactions.CommandContext, **kwargs):
         image_url,
     )
     save_poll_to_memory(
-        ctx.guild_id, ctx.channel_id, poll_id, ctx.user.id, "changesticker"
+        ctx.guild_id,
+        ctx.channel_id,
+        poll_id,
+        ctx.user.id,
+        "changesticker",
+        sticker_name,
+        image_url=image_url,
+        image_hash=get_prefetched_image_hash(prefetch, poll_id),
+        animated=is_prefetched_image_animated(prefetch, image_url),
     )
 
 
@@ -705,76 +1112,305 @@ async def change_sticker(ctx: interactions.CommandContext, **kwargs):
     name="show-config",
     description="Show the current configuration of the bot",
 )
+@timed_command
 async def show_config(ctx: interactions.CommandContext):
     """Show the current configuration of the bot
-    Prints the current contents of `config.py` to the channel
+    Prints the settings of the server, marking the ones changed from the defaults in `config.py`
 
 
     Args:
         ctx (interactions.CommandContext): context of the command, inherited from decorator
     """
-    with open("config.py", "r") as f:
-        config = f.read()
-    f.close()
+    if ctx.guild_id is None:
+        settings, overrides = DEFAULT_SETTINGS, {}
+    else:
+        settings, overrides = get_guild_settings(ctx.guild_id), get_guild_overrides(ctx.guild_id)
+    lines = []
+    for name in SETTINGS:
+        line = f"{name} = {to_stored_value(getattr(settings, name.lower()))!r}"
+        if name in overrides:
+            line += "  # changed for this server"
+        lines.append(line)
+    config = "\n".join(lines)
     await ctx.send(f"```py\n{config}\n```", ephemeral=True)
 
 
+# settings /set-config and /reset-config can change, as command option choices
+SETTING_CHOICES = [interactions.Choice(name=name, value=name) for name in SETTINGS]
+
+
+@bot.command(
+    name="set-config",
+    description="Change a setting of the bot for this server",
+    default_member_permissions=interactions.Permissions.MANAGE_GUILD,
+    dm_permission=False,
+    options=[
+        interactions.Option(
+            type=interactions.OptionType.STRING,
+            name="setting",
+            description="setting to change, see /show-config for their current values",
+            choices=SETTING_CHOICES,
+            required=True,
+        ),
+        interactions.Option(
+            type=interactions.OptionType.STRING,
+            name="value",
+            description="new value, e.g. 66% for POLL_PASS_THRESHOLD or 12h for POLL_DURATION",
+            required=True,
+        ),
+    ],
+)
+@timed_command
+async def set_config(ctx: interactions.CommandContext, **kwargs):
+    """Change a setting of the bot for the server, for both bots and without a restart
+
+    Args:
+        ctx (interactions.CommandContext): context of the command, inherited from decorator
+        setting (str): name of the setting, as in config.py
+        value (str): new value
+    """
+    setting = kwargs["setting"]
+    try:
+        value = set_guild_setting(ctx.guild_id, setting, kwargs["value"])
+    except InvalidSettingError as e:
+        await ctx.send(str(e), ephemeral=True)
+        return
+    logging.info(f"{ctx.user.id} set {setting} of guild {ctx.guild_id} to {to_stored_value(value)!r}")
+    await ctx.send(
+        f"`{setting}` is now `{to_stored_value(value)!r}` on this server", ephemeral=True
+    )
+
+
+@bot.command(
+    name="reset-config",
+    description="Put a setting of the bot for this server back to its default",
+    default_member_permissions=interactions.Permissions.MANAGE_GUILD,
+    dm_permission=False,
+    options=[
+        interactions.Option(
+            type=interactions.OptionType.STRING,
+            name="setting",
+            description="setting to put back to its default",
+            choices=SETTING_CHOICES,
+            required=True,
+        ),
+    ],
+)
+@timed_command
+async def reset_config(ctx: interactions.CommandContext, **kwargs):
+    """Put a setting of the bot for the server back to its default from config.py
+
+    Args:
+        ctx (interactions.CommandContext): context of the command, inherited from decorator
+        setting (str): name of the setting, as in config.py
+    """
+    setting = kwargs["setting"]
+    try:
+        reset_guild_setting(ctx.guild_id, setting)
+    except InvalidSettingError as e:
+        await ctx.send(str(e), ephemeral=True)
+        return
+    logging.info(f"{ctx.user.id} reset {setting} of guild {ctx.guild_id}")
+    value = getattr(get_guild_settings(ctx.guild_id), setting.lower())
+    await ctx.send(
+        f"`{setting}` is back to its default `{to_stored_value(value)!r}` on this server",
+        ephemeral=True,
+    )
+
+
+def get_poll_page_custom_id(direction, cursor, poll_type, channel_id, creator_id):
+    """Encode what a /show-polls page button shows into its custom ID
+
+    Args:
+        direction (str): "prev" or "next"
+        cursor (int): message ID of the first poll (prev) or last poll (next) of the current page
+        poll_type (str): poll type filter, may be None
+        channel_id (int): channel filter, may be None
+        creator_id (int): creator filter, may be None
+
+    Returns:
+        str: custom ID of the button
+    """
+    fields = (direction, cursor, poll_type, channel_id, creator_id)
+    return "|".join(
+        [SHOW_POLLS_CUSTOM_ID] + ["" if field is None else str(field) for field in fields]
+    )
+
+
+def render_poll_page(guild_id, direction, cursor, poll_type, channel_id, creator_id):
+    """Render a page of /show-polls
+
+    Args:
+        guild_id (int): ID of guild
+        direction (str): "prev" to show the polls before the cursor, "next" for the polls after it
+        cursor (int): message ID to page from, None for the first page
+        poll_type (str): only show polls of this type, may be None
+        channel_id (int): only show polls in this channel, may be None
+        creator_id (int): only show polls created by this user, may be None
+
+    Returns:
+        str, list[interactions.Button]: page content, page buttons
+    """
+    filters = dict(poll_type=poll_type, channel_id=channel_id, creator_id=creator_id)
+    if direction == "prev":
+        polls, has_prev = get_polls_page(
+            guild_id, POLLS_PER_PAGE, before_message_id=cursor, **filters
+        )
+        has_next = True
+    else:
+        polls, has_next = get_polls_page(
+            guild_id, POLLS_PER_PAGE, after_message_id=cursor, **filters
+        )
+        has_prev = cursor is not None
+    if len(polls) == 0:
+        if cursor is not None:
+            # the polls on this side of the cursor closed, start over
+            return render_poll_page(guild_id, "next", None, **filters)
+        if poll_type is None and channel_id is None and creator_id is None:
+            return "No active polls", []
+        return "No active polls match these filters", []
+
+    content = "".join(format_poll_line(poll, show_creator=True) for poll in polls)
+    buttons = [
+        interactions.Button(
+            style=interactions.ButtonStyle.SECONDARY,
+            label="Previous",
+            custom_id=get_poll_page_custom_id("prev", polls[0].message_id, **filters),
+            disabled=not has_prev,
+        ),
+        interactions.Button(
+            style=interactions.ButtonStyle.SECONDARY,
+            label="Next",
+            custom_id=get_poll_page_custom_id("next", polls[-1].message_id, **filters),
+            disabled=not has_next,
+        ),
+    ]
+    return content, buttons
+
+
+def get_poll_page(guild_id, direction, cursor, poll_type, channel_id, creator_id):
+    """Get a page of /show-polls, from the cache if the guild's polls haven't changed since it was rendered
+
+    Args:
+        guild_id (int): ID of guild
+        direction (str): "prev" or "next"
+        cursor (int): message ID to page from, None for the first page
+        poll_type (str): poll type filter, may be None
+        channel_id (int): channel filter, may be None
+        creator_id (int): creator filter, may be None
+
+    Returns:
+        str, list[interactions.Button]: page content, page buttons
+    """
+    guild_id = int(guild_id)
+    revision = get_guild_revision(guild_id)
+    cached_revision, pages = poll_page_cache.get(guild_id, (None, {}))
+    if cached_revision != revision or len(pages) >= MAX_CACHED_POLL_PAGES:
+        pages = {}
+        poll_page_cache[guild_id] = (revision, pages)
+    key = (direction, cursor, poll_type, channel_id, creator_id)
+    if key not in pages:
+        pages[key] = render_poll_page(
+            guild_id, direction, cursor, poll_type, channel_id, creator_id
+        )
+    return pages[key]
+
+
 @bot.command(
     name="show-polls",
     description="Show currently active polls",
+    options=[
+        interactions.Option(
+            type=interactions.OptionType.STRING,
+            name="type",
+            description="only show polls of this type",
+            choices=[
+                interactions.Choice(name=pretty_poll_type(poll_type), value=poll_type)
+                for poll_type in POLL_TYPES
+            ],
+            required=False,
+        ),
+        interactions.Option(
+            type=interactions.OptionType.CHANNEL,
+            name="channel",
+            description="only show polls in this channel",
+            required=False,
+        ),
+        interactions.Option(
+            type=interactions.OptionType.USER,
+            name="creator",
+            description="only show polls made by this user",
+            required=False,
+        ),
+    ],
 )
-async def show_polls(ctx: interactions.CommandContext):
-    """Show currently active polls
+@timed_command
+async def show_polls(ctx: interactions.CommandContext, **kwargs):
+    """Show currently active polls, a page at a time
 
     Args:
         ctx (interactions.CommandContext): command context, inherited from decorator
+        type (str, optional): only show polls of this type
+        channel (interactions.Channel, optional): only show polls in this channel
+        creator (interactions.Member, optional): only show polls made by this user
     """
-    polls = []
-    guild = await ctx.get_guild()
-    if os.path.exists(f"active_polls/{guild.id}"):
-        for channel_id in os.listdir(f"active_polls/{guild.id}"):
-            for poll in os.listdir(f"active_polls/{guild.id}/{channel_id}"):
-                poll_id, poll_type = poll.split("_")
-                # TODO: figure out how to print emoji name like in poll_results_check.post_update
-                # Might need to finally migrate off interactions and make these commands properly
-                polls.append(
-                    "https://discord.com/channels/{}/{}/{} {}".format(
-                        guild.id,
-                        channel_id,
-                        poll_id,
-                        ctx.user.id,
-                        pretty_poll_type(poll_type),
-                    )
-                )
-    else:
-        await ctx.send("No active polls", ephemeral=True)
-    if len(polls) > 0:
-        message = ""
-        while len(message) < 2000 and len(polls) > 0:
-            message += polls.pop(0) + "\n"
-        await ctx.send(message, ephemeral=True)
-    else:
-        await ctx.send("No active polls", ephemeral=True)
+    channel = kwargs.get("channel")
+    creator = kwargs.get("creator")
+    content, buttons = get_poll_page(
+        ctx.guild_id,
+        "next",
+        None,
+        kwargs.get("type"),
+        int(channel.id) if channel is not None else None,
+        int(creator.id) if creator is not None else None,
+    )
+    await ctx.send(content, components=buttons, ephemeral=True)
+
+
+@bot.event
+async def on_component(ctx: interactions.ComponentContext):
+    """Turn the page of a /show-polls listing
+
+    Args:
+        ctx (interactions.ComponentContext): context of the button press
+    """
+    fields = ctx.data.custom_id.split("|")
+    if fields[0] != SHOW_POLLS_CUSTOM_ID:
+        return
+    direction, cursor, poll_type, channel_id, creator_id = [
+        field if field != "" else None for field in fields[1:]
+    ]
+    content, buttons = get_poll_page(
+        ctx.guild_id,
+        direction,
+        int(cursor),
+        poll_type,
+        int(channel_id) if channel_id is not None else None,
+        int(creator_id) if creator_id is not None else None,
+    )
+    await ctx.edit(content, components=buttons)
 
 
 @bot.command(
     name="show-limits",
     description="Show the current emoji and sticker limits for the server",
 )
+@timed_command
 async def show_limits(ctx: interactions.CommandContext):
     """Show the current emoji and sticker limits for the server
 
     Args:
         ctx (interactions.CommandContext): command context, inherited from decorator
     """
-    guild = await ctx.get_guild()
-    premium_tier = guild.premium_tier
-    emoji_count = len([e for e in guild.emojis if not e.animated])
-    animated_emoji_count = len([e for e in guild.emojis if e.animated])
-    sticker_count = len(guild.stickers)
+    guild_index = await get_emoji_index(ctx)
+    premium_tier = guild_index.premium_tier
+    emoji_count = guild_index.count_emojis(animated=False)
+    animated_emoji_count = guild_index.count_emojis(animated=True)
+    sticker_count = guild_index.sticker_count
 
     emoji_limit = emoji_limits[premium_tier]
-    animated_emoji_limit = 50
+    # servers get as many animated emoji slots as static ones
+    animated_emoji_limit = emoji_limits[premium_tier]
     sticker_limit = sticker_limits[premium_tier]
 
     emoji_count_message = f"{emoji_limit - emoji_count} emoji slots left ({display_percent_str(emoji_count/emoji_limit)} used)"
@@ -787,4 +1423,140 @@ async def show_limits(ctx: interactions.CommandContext):
     )
 
 
-bot.start()
+async def get_owner_ids():
+    """Get the IDs of the users owning the bot's application, fetching them from Discord once
+
+    The library parses team members as thread members, so the application is read from the REST API instead.
+
+    Raises:
+        aiohttp.ClientError: if the application can't be fetched
+        asyncio.TimeoutError: if fetching the application times out
+
+    Returns:
+        set[int]: ID of the owner, or of every member of the team owning the application
+    """
+    global owner_ids
+    if owner_ids is None:
+        application = await fetch_application_info(token)
+        if application.get("team"):
+            owner_ids = {
+                int(member["user"]["id"]) for member in application["team"]["members"]
+            }
+        else:
+            owner_ids = {int(application["owner"]["id"])}
+    return owner_ids
+
+
+async def send_profile(member, kind, seconds, target):
+    """Profile one of the bots and send the report to a member in a direct message
+
+    Args:
+        member (interactions.Member): member who asked for the profile
+        kind (str): "cpu" or "memory"
+        seconds (int): how long to profile for
+        target (str): "checker" or "creator", see PROFILE_TARGETS
+    """
+    try:
+        if target == "creator":
+            file_name, report = await run_profile(kind, seconds, "poll creator")
+        else:
+            file_name, report = await request_profile(
+                RESULTS_CHECKER_ADMIN_SOCKET_PATH, kind, seconds
+            )
+    except ProfileError as e:
+        await member.send(f"Failed to profile the {PROFILE_TARGETS[target]}: {e}")
+        return
+    await member.send(
+        f"{kind.upper()} profile of the {PROFILE_TARGETS[target]}",
+        files=interactions.File(file_name, fp=BytesIO(report.encode())),
+    )
+
+
+@bot.command(
+    name="debug-profile",
+    description="Profile the CPU or memory use of the bot and get the report in a DM (bot owners only)",
+    default_member_permissions=interactions.Permissions.ADMINISTRATOR,
+    dm_permission=False,
+    options=[
+        interactions.Option(
+            type=interactions.OptionType.STRING,
+            name="kind",
+            description="what to profile",
+            choices=[
+                interactions.Choice(name="CPU", value="cpu"),
+                interactions.Choice(name="Memory", value="memory"),
+            ],
+            required=True,
+        ),
+        interactions.Option(
+            type=interactions.OptionType.INTEGER,
+            name="seconds",
+            description=f"how long to profile for, {DEFAULT_PROFILE_SECONDS} by default",
+            min_value=1,
+            max_value=MAX_PROFILE_DURATION,
+            required=False,
+        ),
+        interactions.Option(
+            type=interactions.OptionType.STRING,
+            name="bot",
+            description="which bot to profile, the results checker by default",
+            choices=[
+                interactions.Choice(name=name, value=target)
+                for target, name in PROFILE_TARGETS.items()
+            ],
+            required=False,
+        ),
+    ],
+)
+@timed_command
+async def debug_profile(ctx: interactions.CommandContext, **kwargs):
+    """Profile one of the bots for a while and send the report to the user, only for the bot's owners
+
+    Args:
+        ctx (interactions.CommandContext): command context, inherited from decorator
+        kind (str): "cpu" or "memory"
+        seconds (int, optional): how long to profile for
+        bot (str, optional): "checker" or "creator"
+    """
+    try:
+        is_owner = int(ctx.user.id) in await get_owner_ids()
+    except (aiohttp.ClientError, asyncio.TimeoutError):
+        logging.exception("Failed to fetch the owners of the bot")
+        await ctx.send("Couldn't check who owns the bot, try again later", ephemeral=True)
+        return
+    if not is_owner:
+        await ctx.send("Only the owners of the bot can profile it", ephemeral=True)
+        return
+    kind = kwargs["kind"]
+    seconds = kwargs.get("seconds", DEFAULT_PROFILE_SECONDS)
+    target = kwargs.get("bot", "checker")
+    if target == "checker" and RESULTS_CHECKER_ADMIN_SOCKET_PATH is None:
+        await ctx.send(
+            "The results checker can't be profiled, `RESULTS_CHECKER_ADMIN_SOCKET_PATH` is turned off",
+            ephemeral=True,
+        )
+        return
+    # the profile outlasts the interaction, the report is sent when it is done
+    request = asyncio.create_task(send_profile(ctx.member, kind, seconds, target))
+    profile_requests.add(request)
+    request.add_done_callback(profile_requests.discard)
+    await ctx.send(
+        f"Profiling the {PROFILE_TARGETS[target]} for {seconds}s, the report will be sent to you in a DM",
+        ephemeral=True,
+    )
+
+
+if __name__ == "__main__":
+    # same format as the results checker's logs, which discord.py sets up
+    logging.basicConfig(
+        level=logging.INFO,
+        format="[%(asctime)s] [%(levelname)-8s] %(name)s: %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    # the interactions client runs on the event loop current when it was created
+    asyncio.get_event_loop().create_task(poll_event_channel.connect())
+    if POLL_CREATOR_ADMIN_SOCKET_PATH is not None:
+        asyncio.get_event_loop().create_task(
+            serve_admin_socket(POLL_CREATOR_ADMIN_SOCKET_PATH, "poll creator")
+        )
+    bot.start()
@@ -0,0 +1,40 @@
+import logging
+
+# a poll was saved to the store, sent with the saved poll_store.Poll
+POLL_CREATED = "poll_created"
+# a poll was resolved and removed from the store, sent with the removed poll_store.Poll
+POLL_CLOSED = "poll_closed"
+# a guild's settings were changed in the poll store, sent with the guild ID
+GUILD_SETTINGS_CHANGED = "guild_settings_changed"
+
+# event name -> callbacks, called in the order they subscribed
+_subscribers = {}
+
+
+def subscribe(event, callback):
+    """Call a function whenever a poll event is published
+
+    Args:
+        event (str): POLL_CREATED, POLL_CLOSED or GUILD_SETTINGS_CHANGED
+        callback (Callable[[Any], None]): function called with the poll or guild ID, must not block
+    """
+    _subscribers.setdefault(event, []).append(callback)
+
+
+def publish(event, payload):
+    """Tell every subscriber of this process about a poll event
+
+    A failing subscriber is logged and doesn't stop the others.
+
+    Args:
+        event (str): POLL_CREATED, POLL_CLOSED or GUILD_SETTINGS_CHANGED
+        payload (poll_store.Poll/int): poll the event is about, or ID of the guild for GUILD_SETTINGS_CHANGED
+    """
+    for callback in _subscribers.get(event, []):
+        try:
+            callback(payload)
+        except Exception:
+            if event == GUILD_SETTINGS_CHANGED:
+                logging.exception(f"Failed to handle {event} for guild {payload}")
+            else:
+                logging.exception(f"Failed to handle {event} for poll {payload.message_id}")
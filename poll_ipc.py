@@ -0,0 +1,137 @@
+import asyncio
+import functools
+import json
+import logging
+import os
+
+from poll_events import GUILD_SETTINGS_CHANGED
+from poll_events import publish
+from poll_events import subscribe
+from poll_store import Poll
+
+# seconds to wait before connecting again after the connection to the other bot drops
+RECONNECT_DELAY = 5
+
+# set while an event received from the other process is published, so it isn't sent straight back
+_relaying = False
+
+
+async def start_private_unix_server(handle_connection, path):
+    """Create a Unix socket server only the user running the bot can connect to
+
+    The socket file is created as 0600 rather than changed after binding, so there is no moment
+    another user could connect. It doesn't serve until serve_forever or start_serving is called,
+    so nothing awaits and no other task runs while the process-wide umask is changed.
+
+    Args:
+        handle_connection (Callable): called with the reader and writer of each connection
+        path (str): path of the socket file, one left behind by an earlier run is replaced
+
+    Returns:
+        asyncio.Server: server that isn't serving yet
+    """
+    try:
+        # left behind if the last run didn't shut down cleanly
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    old_umask = os.umask(0o177)
+    try:
+        return await asyncio.start_unix_server(
+            handle_connection, path, start_serving=False
+        )
+    finally:
+        os.umask(old_umask)
+
+
+class PollEventChannel:
+    """Forwards poll events between the two bot processes over a Unix domain socket
+
+    The results checker listens and the poll creator connects. Each side sends the events it publishes
+    itself and publishes the events it receives, one JSON object per line. Events published while the
+    connection is down are lost, so each side resyncs from the poll store every time it (re)connects.
+    """
+
+    def __init__(self, path, outgoing_events, resync):
+        """
+        Args:
+            path (str): path of the socket file
+            outgoing_events (list[str]): events published in this process to send to the other one
+            resync (Callable[[], None]): reloads this process's poll state from the store
+        """
+        self.path = path
+        self.resync = resync
+        self._writers = set()
+        for event in outgoing_events:
+            subscribe(event, functools.partial(self._send, event))
+
+    def _send(self, event, payload):
+        """Send a poll event to the other process, if it is connected
+
+        Args:
+            event (str): name of the event
+            payload (poll_store.Poll/int): poll the event is about, or guild ID for GUILD_SETTINGS_CHANGED
+        """
+        if _relaying:
+            return
+        if event == GUILD_SETTINGS_CHANGED:
+            message = {"event": event, "guild_id": payload}
+        else:
+            message = {"event": event, "poll": list(payload)}
+        line = json.dumps(message) + "\n"
+        for writer in self._writers:
+            # buffered by the transport, events are small and the other side reads them right away
+            writer.write(line.encode())
+
+    async def _handle_connection(self, reader, writer):
+        """Exchange events with the other process until the connection drops
+
+        Args:
+            reader (asyncio.StreamReader): incoming side of the connection
+            writer (asyncio.StreamWriter): outgoing side of the connection
+        """
+        self._writers.add(writer)
+        logging.info("Poll event channel connected")
+        # anything published while disconnected was missed
+        self.resync()
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                    if message["event"] == GUILD_SETTINGS_CHANGED:
+                        payload = int(message["guild_id"])
+                    else:
+                        payload = Poll(*message["poll"])
+                except (ValueError, KeyError, TypeError):
+                    logging.warning(f"Ignoring malformed poll event: {line!r}")
+                    continue
+                global _relaying
+                _relaying = True
+                try:
+                    publish(message["event"], payload)
+                finally:
+                    _relaying = False
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            logging.info("Poll event channel disconnected")
+
+    async def serve(self):
+        """Listen for the other process until cancelled"""
+        server = await start_private_unix_server(self._handle_connection, self.path)
+        async with server:
+            await server.serve_forever()
+
+    async def connect(self):
+        """Connect to the other process, reconnecting whenever the connection drops, until cancelled"""
+        while True:
+            try:
+                reader, writer = await asyncio.open_unix_connection(self.path)
+            except OSError:
+                # the other bot isn't up yet
+                await asyncio.sleep(RECONNECT_DELAY)
+                continue
+            await self._handle_connection(reader, writer)
+            await asyncio.sleep(RECONNECT_DELAY)
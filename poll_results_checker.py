@@ -1,26 +1,77 @@
 import asyncio
 import datetime as dt
+import hashlib
 import logging
-import os
+import time
+from collections import Counter
+from collections import defaultdict
+from io import BytesIO
 
 import discord
-import requests
 
-from config import AUTOMATICALLY_ADD_EMOJIS
-from config import MAX_IMAGE_FILE_SIZE
-from config import MAX_IMAGE_SIZE
-from config import POLL_DURATION
+from config import MAX_CONCURRENT_POLL_RESOLUTIONS
+from config import METRICS_HOST
+from config import POLL_EVENT_SOCKET_PATH
+from config import POLL_NO_EMOJI
 from config import POLL_UPDATE_POST_TIMES
-from config import TEMP_IMAGE_FILE_NAME
+from config import POLL_YES_EMOJI
+from config import RESULTS_CHECKER_ADMIN_SOCKET_PATH
+from config import RESULTS_CHECKER_METRICS_PORT
+from config import SHARD_COUNT
+from config import SHARD_IDS
 from config import TOKEN_FILE_NAME
 from config import WAIT_TIME_BETWEEN_CHECKS
-from utils import get_emoji_name_from_poll_message
-from utils import get_existing_emoji_by_name
+from emoji_index import GuildEmojiIndexes
+from guild_settings import get_guild_settings
+from guild_settings import load_all_guild_settings
+from http_client import ImageDownloadError
+from http_client import close_session
+from image_cache import discard_image
+from image_cache import get_animation_format
+from image_cache import get_fitted_image
+from metrics import Counter as MetricCounter
+from metrics import Gauge
+from metrics import Histogram
+from metrics import start_metrics_server
+from outbound import ACTION
+from outbound import BACKGROUND
+from outbound import REPLY
+from outbound import outbound
+from outbound import start_stats_logging
+from poll_events import POLL_CLOSED
+from poll_events import POLL_CREATED
+from poll_events import publish
+from poll_events import subscribe
+from poll_ipc import PollEventChannel
+from poll_scheduler import NEW_POLL_LOOKBACK_SECONDS
+from poll_scheduler import PollScheduler
+from poll_store import get_active_polls
+from poll_store import get_digest_channels
+from poll_store import get_digest_messages
+from poll_store import get_poll_voter_ids
+from poll_store import get_polls_missing_metadata
+from poll_store import import_active_polls_directory
+from poll_store import is_active_poll
+from poll_store import purge_orphan_votes
+from poll_store import record_vote
+from poll_store import remove_digest_messages
+from poll_store import remove_poll
+from poll_store import remove_vote
+from poll_store import replace_poll_votes
+from poll_store import save_digest_message
+from poll_store import snowflake_to_timestamp
+from poll_store import timestamp_to_snowflake
+from poll_store import update_poll_metadata
+from profiler import serve_admin_socket
+from utils import EMPTY_DIGEST
+from utils import build_poll_digests
+from utils import get_poll_metadata_from_message
 from utils import get_poll_result
 from utils import get_print_string_for_poll_result
-from utils import get_votes
-from utils import make_and_resize_image_from_url
-from utils import pretty_poll_type
+from utils import get_shard_id
+from utils import get_voter_ids
+from utils import log_startup_stats
+from utils import tally_votes
 
 # Setup
 ## read token from file
@@ -28,351 +79,941 @@ f = open(TOKEN_FILE_NAME, "r")
 token = f.read().strip()
 f.close()
 
-## make active_polls directory if it doesn't exist
-if "active_polls" not in os.listdir():
-    os.mkdir("active_polls")
+## import polls saved by older versions of the bot
+import_active_polls_directory()
+
+## read the settings each guild changed from their defaults in config.py, the poll creator tells of changes
+load_all_guild_settings()
 
 # used to get poll results
 intents = discord.Intents.default()
 intents.message_content = True
 intents.members = True
-client = discord.Client(intents=intents)
+# members are only needed to weight votes, they are loaded per guild when a poll of it is tallied
+client = discord.AutoShardedClient(
+    intents=intents,
+    shard_count=SHARD_COUNT,
+    shard_ids=SHARD_IDS,
+    chunk_guilds_at_startup=False,
+)
+
+# emojis and stickers of each guild by name
+emoji_indexes = GuildEmojiIndexes()
+
+# shard ID -> start of the shard's current gateway session, every reaction event since then has been received
+shard_sessions_started_at = {}
+
+# shard ID -> counts of the work done for the shard's guilds, logged every SHARD_STATS_LOG_INTERVAL seconds
+shard_stats = defaultdict(Counter)
+SHARD_STATS_LOG_INTERVAL = 60 * 60
+
+POLLS_RESOLVED = MetricCounter(
+    "polls_resolved_total", "Polls resolved, by outcome", labels=("outcome",)
+)
+POLL_CLOSE_LATENESS = Histogram(
+    "poll_close_lateness_seconds",
+    "Time between a poll's deadline and its result being posted",
+    buckets=(0.5, 1, 5, 10, 30, 60, 300, 600, 1800, 3600, 6 * 3600, 24 * 3600),
+)
+SHARD_LATENCY = Gauge(
+    "shard_latency_seconds",
+    "Gateway heartbeat latency of each shard",
+    labels=("shard",),
+    collect=lambda: {(shard_id,): latency for shard_id, latency in client.latencies},
+)
+SHARD_EVENTS = MetricCounter(
+    "shard_events_total",
+    "Work done for the guilds of each shard",
+    labels=("shard", "event"),
+    collect=lambda: {
+        (shard_id, event): count
+        for shard_id, stats in shard_stats.items()
+        for event, count in stats.items()
+    },
+)
+
+# guild ID -> task loading the guild's members, while it runs
+member_chunk_requests = {}
+
+# seconds between progress logs while catching up on polls that expired while the bot was down
+CATCH_UP_PROGRESS_INTERVAL = 10
+
+# times a poll is tried before it is closed without a result, when fetching, tallying or posting it fails
+MAX_RESOLVE_ATTEMPTS = 5
+# message ID -> failed attempts at resolving a poll, while it is being retried
+resolve_failures = {}
+
+
+class GuildUnavailableError(Exception):
+    """Raised when a poll's guild isn't available to the bot yet, e.g. during a Discord outage"""
+
+
+# resolves polls when they are due, created once the event loop is running
+scheduler = None
+resolution_semaphore = None
+background_tasks = []
+
+
+def get_guild_shard_id(guild_id):
+    """Get the shard a guild is on
 
-# clean existing images
-for file_name in os.listdir():
-    if file_name.startswith(TEMP_IMAGE_FILE_NAME):
-        os.remove(file_name)
+    Args:
+        guild_id (int): ID of guild
 
+    Returns:
+        int: ID of shard
+    """
+    return get_shard_id(guild_id, client.shard_count)
 
-def get_active_polls_list_from_memory():
-    """gets a list of (guild_id, channel_id, message_id, poll_type) tuples for each active poll in memory
+
+def owns_guild(guild_id):
+    """Check if a guild is on one of the shards this process runs, other processes deal with the rest
+
+    Args:
+        guild_id (int): ID of guild
 
     Returns:
-        List[Tuple[int,int,int,str]]: List of (guild_id, channel_id, message_id, poll_type) tuples
-        poll_type is one of "addemoji", "deleteemoji", "addsticker", "deletesticker"
+        bool: True if this process handles the guild's polls
     """
-    combos = []
-    for guild_id in os.listdir("active_polls"):
-        for channel_id in os.listdir(f"active_polls/{guild_id}"):
-            for poll in os.listdir(f"active_polls/{guild_id}/{channel_id}"):
-                poll_id, poll_type = poll.split("_")
-                combos.append((int(guild_id), int(channel_id), int(poll_id), poll_type))
-    return combos
+    return client.shard_ids is None or get_guild_shard_id(guild_id) in client.shard_ids
 
 
-async def add_poll_result(poll: discord.Message, poll_type: str):
+async def reply_to_poll(poll: discord.Message, content: str, **kwargs):
+    """Reply to a poll message, ahead of background messages
+
+    Args:
+        poll (discord.Message): poll message
+        content (str): content of the reply
+        **kwargs: passed on to `discord.TextChannel.send`
+
+    Returns:
+        discord.Message: reply message
+    """
+    return await outbound.call(
+        REPLY,
+        ("send_message", poll.channel.id),
+        lambda: poll.channel.send(content, reference=poll, **kwargs),
+    )
+
+
+async def add_poll_result(
+    poll: discord.Message, poll_type: str, name: str, image_url: str, image_hash: str
+):
     """Add an emoji to the server
 
     Args:
         poll (discord.Message): poll message
         poll_type (str): type of poll, either "emoji" or "sticker"
+        name (str): name of the new emoji/sticker
+        image_url (str): URL of the new emoji/sticker's image
+        image_hash (str): hash of the image fitted when the poll was created, None if it wasn't
     """
-    image_url = poll.embeds[0].image.url
-    request = requests.get(image_url)
-    if request.status_code == 200:
-        name = get_emoji_name_from_poll_message(poll)
-
-        # resizing image if necessary
-        make_and_resize_image_from_url(
-            image_url,
-            MAX_IMAGE_SIZE,
-            MAX_IMAGE_FILE_SIZE,
-            TEMP_IMAGE_FILE_NAME,
+    try:
+        image = await get_fitted_image(
+            image_hash, image_url, get_animation_format(poll_type)
+        )
+    except ImageDownloadError as e:
+        await reply_to_poll(
+            poll,
+            f"Failed to add emoji/sticker, image could not be retrieved, {e}",
         )
+        return
 
-        # getting image bytes
-        for file in os.listdir():
-            if file.startswith("adding_image_temp."):
-                temp_image_file_name = file
-                f = open(temp_image_file_name, "rb")
-                image = f.read()
-                f.close()
-                break
-
-        # adding emoji
-        if poll_type.endswith("emoji"):
-            new_emoji = await poll.channel.guild.create_custom_emoji(
-                name=name, image=image
-            )
-            await poll.channel.send(
-                f"Emoji added: {str(new_emoji)}",
-                reference=poll,
-            )
-        # add sticker
-        elif poll_type.endswith("sticker"):
-            new_sticker = await poll.channel.guild.create_sticker(
+    # adding emoji
+    if poll_type.endswith("emoji"):
+        new_emoji = await outbound.call(
+            ACTION,
+            ("emoji", poll.guild.id),
+            lambda: poll.guild.create_custom_emoji(name=name, image=image),
+        )
+        await reply_to_poll(
+            poll,
+            f"Emoji added: {str(new_emoji)}",
+        )
+    # add sticker
+    elif poll_type.endswith("sticker"):
+        new_sticker = await outbound.call(
+            ACTION,
+            ("sticker", poll.guild.id),
+            lambda: poll.guild.create_sticker(
                 name=name,
                 description="sticker automatically added by poll",
                 emoji="🤖",  # not sure what the point of this attribute is, but it's required
                 file=discord.File(
-                    fp=temp_image_file_name,
+                    fp=BytesIO(image),
                     filename="sticker.png",
                 ),
-            )
-            await poll.channel.send(
-                f"Sticker added: :{name}:",
-                stickers=[new_sticker],
-                reference=poll,
-            )
-    else:
-        await poll.channel.send(
-            "Failed to add emoji/sticker, image could not be retrieved, Status code: "
-            + str(request.status_code),
-            reference=poll,
+            ),
+        )
+        await reply_to_poll(
+            poll,
+            f"Sticker added: :{name}:",
+            stickers=[new_sticker],
         )
 
 
-async def delete_poll_result(poll: discord.Message, poll_type: str):
+async def delete_poll_result(poll: discord.Message, poll_type: str, name: str):
     """Delete an emoji from the server
 
     Args:
         poll (discord.Message): poll message
         poll_type (str): type of poll, either "emoji" or "sticker"
+        name (str): name of the emoji/sticker to delete
     """
-    name = get_emoji_name_from_poll_message(poll)
     emoji_or_sticker_found = False
     if poll_type.endswith("emoji"):
-        emoji = get_existing_emoji_by_name(name, poll.channel.guild.emojis)
+        emoji = emoji_indexes.get_or_index_guild(poll.guild).get_emoji(name)
         if emoji is not None:
-            await emoji.delete()
+            await outbound.call(ACTION, ("emoji", poll.guild.id), emoji.delete)
             emoji_or_sticker_found = True
-            await poll.channel.send(
+            await reply_to_poll(
+                poll,
                 f"Emoji deleted: {str(emoji)}",
-                reference=poll,
             )
     elif poll_type.endswith("sticker"):
-        sticker = get_existing_emoji_by_name(name, poll.channel.guild.stickers)
+        sticker = emoji_indexes.get_or_index_guild(poll.guild).get_sticker(name)
         if sticker is not None:
-            await sticker.delete()
+            await outbound.call(ACTION, ("sticker", poll.guild.id), sticker.delete)
             emoji_or_sticker_found = True
-            await poll.channel.send(
+            await reply_to_poll(
+                poll,
                 f"Sticker deleted: :{name}:",
-                reference=poll,
             )
     if not emoji_or_sticker_found:
-        await poll.channel.send(
+        await reply_to_poll(
+            poll,
             "Failed to delete emoji/sticker, emoji/sticker not found",
-            reference=poll,
         )
 
 
-async def rename_poll_result(poll: discord.Message, poll_type: str):
+async def rename_poll_result(
+    poll: discord.Message, poll_type: str, old_name: str, new_name: str
+):
     """Rename an emoji from the server
 
     Args:
         poll (discord.Message): poll message
         poll_type (str): type of poll, either "emoji" or "sticker"
+        old_name (str): current name of the emoji/sticker
+        new_name (str): new name of the emoji/sticker
     """
-    old_name = get_emoji_name_from_poll_message(poll)
-    new_name = get_emoji_name_from_poll_message(poll, new=True)
     emoji_or_sticker_found = False
     if poll_type.endswith("emoji"):
-        emoji = get_existing_emoji_by_name(old_name, poll.channel.guild.emojis)
+        emoji = emoji_indexes.get_or_index_guild(poll.guild).get_emoji(old_name)
         if emoji is not None:
-            emoji = await emoji.edit(name=new_name)
+            emoji = await outbound.call(
+                ACTION, ("emoji", poll.guild.id), lambda: emoji.edit(name=new_name)
+            )
             emoji_or_sticker_found = True
-            await poll.channel.send(
+            await reply_to_poll(
+                poll,
                 f"Emoji ({str(emoji)}) renamed `:{old_name}: -> :{new_name}:`",
-                reference=poll,
             )
 
     elif poll_type.endswith("sticker"):
-        sticker = get_existing_emoji_by_name(old_name, poll.channel.guild.stickers)
+        sticker = emoji_indexes.get_or_index_guild(poll.guild).get_sticker(old_name)
         if sticker is not None:
-            sticker = await sticker.edit(name=new_name)
+            sticker = await outbound.call(
+                ACTION, ("sticker", poll.guild.id), lambda: sticker.edit(name=new_name)
+            )
             emoji_or_sticker_found = True
-            await poll.channel.send(
+            await reply_to_poll(
+                poll,
                 f"Sticker renamed: `:{old_name}: -> :{new_name}:`",
                 stickers=[sticker],
-                reference=poll,
             )
     if not emoji_or_sticker_found:
-        await poll.channel.send(
+        await reply_to_poll(
+            poll,
             "Failed to rename emoji/sticker, emoji/sticker not found",
-            reference=poll,
         )
 
 
-async def change_poll_result(poll: discord.Message, poll_type: str):
-    image_url = poll.embeds[0].image.url
-    request = requests.get(image_url)
-    name = get_emoji_name_from_poll_message(poll)
-    emoji_or_sticker_found = False
-    if request.status_code == 200:
-        make_and_resize_image_from_url(
-            image_url,
-            MAX_IMAGE_SIZE,
-            MAX_IMAGE_FILE_SIZE,
-            TEMP_IMAGE_FILE_NAME,
+async def change_poll_result(
+    poll: discord.Message, poll_type: str, name: str, image_url: str, image_hash: str
+):
+    """Change the image of an emoji on the server
+
+    Args:
+        poll (discord.Message): poll message
+        poll_type (str): type of poll, either "emoji" or "sticker"
+        name (str): name of the emoji/sticker to change
+        image_url (str): URL of the new image
+        image_hash (str): hash of the image fitted when the poll was created, None if it wasn't
+    """
+    try:
+        image = await get_fitted_image(
+            image_hash, image_url, get_animation_format(poll_type)
+        )
+    except ImageDownloadError as e:
+        await reply_to_poll(
+            poll,
+            f"Failed to change emoji/sticker, image could not be retrieved, {e}",
         )
+        return
 
-        # getting image bytes
-        for file in os.listdir():
-            if file.startswith("adding_image_temp."):
-                temp_image_file_name = file
-                f = open(temp_image_file_name, "rb")
-                image = f.read()
-                f.close()
-                break
-
-        if poll_type.endswith("emoji"):
-            emoji = get_existing_emoji_by_name(name, poll.channel.guild.emojis)
-            if emoji is not None:
-                emoji_or_sticker_found = True
-                await emoji.delete()
-                new_emoji = await poll.guild.create_custom_emoji(name=name, image=image)
-                await poll.channel.send(
-                    f"Emoji changed: {str(new_emoji)}",
-                    reference=poll,
-                )
-        elif poll_type.endswith("sticker"):
-            sticker = get_existing_emoji_by_name(name, poll.channel.guild.stickers)
-            if sticker is not None:
-                emoji_or_sticker_found = True
-                await sticker.delete()
-                new_sticker = await poll.channel.guild.create_sticker(
+    emoji_or_sticker_found = False
+
+    if poll_type.endswith("emoji"):
+        emoji = emoji_indexes.get_or_index_guild(poll.guild).get_emoji(name)
+        if emoji is not None:
+            emoji_or_sticker_found = True
+            await outbound.call(ACTION, ("emoji", poll.guild.id), emoji.delete)
+            new_emoji = await outbound.call(
+                ACTION,
+                ("emoji", poll.guild.id),
+                lambda: poll.guild.create_custom_emoji(name=name, image=image),
+            )
+            await reply_to_poll(
+                poll,
+                f"Emoji changed: {str(new_emoji)}",
+            )
+    elif poll_type.endswith("sticker"):
+        sticker = emoji_indexes.get_or_index_guild(poll.guild).get_sticker(name)
+        if sticker is not None:
+            emoji_or_sticker_found = True
+            await outbound.call(ACTION, ("sticker", poll.guild.id), sticker.delete)
+            new_sticker = await outbound.call(
+                ACTION,
+                ("sticker", poll.guild.id),
+                lambda: poll.guild.create_sticker(
                     name=name,
                     description="sticker automatically added by poll",
                     emoji="🤖",  # not sure what the point of this attribute is, but it's required
                     file=discord.File(
-                        fp=temp_image_file_name,
+                        fp=BytesIO(image),
                         filename="sticker.png",
                     ),
-                )
-                await poll.channel.send(
-                    f"Sticker changed: :{name}:",
-                    stickers=[new_sticker],
-                    reference=poll,
-                )
-        if not emoji_or_sticker_found:
-            await poll.channel.send(
-                "Failed to change emoji/sticker, emoji/sticker not found",
-                reference=poll,
+                ),
             )
-    else:
-        await poll.channel.send(
-            "Failed to add emoji/sticker, image could not be retrieved, Status code: "
-            + str(request.status_code),
-            reference=poll,
+            await reply_to_poll(
+                poll,
+                f"Sticker changed: :{name}:",
+                stickers=[new_sticker],
+            )
+    if not emoji_or_sticker_found:
+        await reply_to_poll(
+            poll,
+            "Failed to change emoji/sticker, emoji/sticker not found",
         )
 
 
+async def post_digest_page(channel: discord.TextChannel, content: str):
+    """Post a new page of a channel's poll digest and pin it
+
+    Args:
+        channel (discord.TextChannel): channel to post in
+        content (str): page content
+
+    Returns:
+        discord.Message: posted message
+    """
+    message = await outbound.call(
+        BACKGROUND, ("send_message", channel.id), lambda: channel.send(content)
+    )
+    try:
+        await outbound.call(BACKGROUND, ("pin", channel.id), message.pin)
+    except discord.Forbidden:
+        logging.info(f"Missing permission to pin the poll digest in channel {channel.id}")
+    return message
+
+
+async def update_channel_digest(channel: discord.TextChannel, pages: list):
+    """Bring the pinned poll digest of a channel up to date, only editing pages whose content changed
+
+    Args:
+        channel (discord.TextChannel): channel of the digest
+        pages (list[str]): new content of each page
+    """
+    stored_pages = get_digest_messages(channel.id)
+    for page, content in enumerate(pages):
+        content_hash = hashlib.sha256(content.encode()).hexdigest()
+        if page < len(stored_pages):
+            message_id, stored_hash = stored_pages[page]
+            if stored_hash == content_hash:
+                continue
+            try:
+                await outbound.call(
+                    BACKGROUND,
+                    ("edit_message", channel.id),
+                    lambda: channel.get_partial_message(message_id).edit(content=content),
+                )
+            except discord.NotFound:
+                # digest message was deleted by hand
+                message_id = (await post_digest_page(channel, content)).id
+        else:
+            message_id = (await post_digest_page(channel, content)).id
+        save_digest_message(channel.id, channel.guild.id, page, message_id, content_hash)
+    # the digest got shorter, delete the pages it no longer needs
+    for message_id, _ in stored_pages[len(pages) :]:
+        try:
+            await outbound.call(
+                BACKGROUND,
+                ("delete_message", channel.id),
+                channel.get_partial_message(message_id).delete,
+            )
+        except discord.NotFound:
+            pass
+    remove_digest_messages(channel.id, first_page=len(pages))
+
+
 async def post_update():
-    """Post updates"""
-    channels_to_polls = {}
-    for (
-        guild_id,
-        channel_id,
-        message_id,
-        poll_type,
-    ) in get_active_polls_list_from_memory():
-        for channel_id in os.listdir(f"active_polls/{guild_id}"):
-            # if there are active polls, create strings for the update message
-            if len(os.listdir(f"active_polls/{guild_id}/{channel_id}")) > 0:
-                channel_id = int(channel_id)
-                channels_to_polls[channel_id] = []
-                channel = client.get_channel(channel_id)
-                for poll in os.listdir(f"active_polls/{guild_id}/{channel_id}"):
-                    poll_id, poll_type = poll.split("_")
-                    channels_to_polls[channel_id].append(
-                        "> https://discord.com/channels/{}/{}/{} {} `{}`\n".format(
-                            guild_id,
-                            channel_id,
-                            poll_id,
-                            pretty_poll_type(poll_type),
-                            get_emoji_name_from_poll_message(
-                                await channel.fetch_message(poll_id)
-                            ),
-                        )
-                    )
-    # put together and post update message
-    for channel_id_to_post_to, polls in channels_to_polls.items():
-        if len(polls) > 0:
-            channel_to_post_to = client.get_channel(channel_id_to_post_to)
-            message = "Here's an update on currently active polls:\n"
-            while len(message) < 2000 and len(polls) > 0:
-                try:
-                    if len(message + polls[0]) < 2000:
-                        message += polls.pop(0)
-                    else:
-                        await channel_to_post_to.send(message)
-                        message = ""
-                except IndexError:
-                    await channel_to_post_to.send(message)
-            await channel_to_post_to.send(message)
+    """Update the poll digest of every channel with active polls or an existing digest, in the guilds this process owns"""
+    digests = build_poll_digests(
+        [poll for poll in get_active_polls() if owns_guild(poll.guild_id)]
+    )
+    digest_channels = {
+        channel_id: guild_id
+        for channel_id, guild_id in get_digest_channels().items()
+        # a digest saved without its guild is only known to be ours once its channel is found
+        if guild_id is None or owns_guild(guild_id)
+    }
+    for channel_id in digests.keys() | digest_channels.keys():
+        channel = client.get_channel(channel_id)
+        if channel is None:
+            if digest_channels.get(channel_id) is None and client.shard_ids is not None:
+                # may be a channel of another process's guild
+                continue
+            # channel was deleted or the bot can't see it anymore
+            remove_digest_messages(channel_id)
+            continue
+        try:
+            await update_channel_digest(
+                channel, digests.get(channel_id, [EMPTY_DIGEST])
+            )
+        except discord.HTTPException as e:
+            logging.info(f"Failed to update the poll digest in channel {channel_id}: {e}")
+        else:
+            shard_stats[get_guild_shard_id(channel.guild.id)]["digests_updated"] += 1
+
+
+def is_vote(payload: discord.RawReactionActionEvent):
+    """Check if a reaction event is a vote on a poll, or on a message that may be a poll not saved yet
+
+    Args:
+        payload (discord.RawReactionActionEvent): reaction event
+
+    Returns:
+        bool: True if the reaction should be recorded
+    """
+    if str(payload.emoji) not in (POLL_YES_EMOJI, POLL_NO_EMOJI):
+        return False
+    if (
+        payload.guild_id is None
+        or payload.channel_id not in get_guild_settings(payload.guild_id).allowed_channel_ids
+    ):
+        return False
+    if snowflake_to_timestamp(payload.message_id) > time.time() - NEW_POLL_LOOKBACK_SECONDS:
+        return True
+    return is_active_poll(payload.message_id)
 
 
 @client.event
-async def on_ready():
-    last_update_hour = -1
-    while True:
-        for (
-            guild_id,
-            channel_id,
-            message_id,
-            poll_type,
-        ) in get_active_polls_list_from_memory():
+async def on_raw_reaction_add(payload: discord.RawReactionActionEvent):
+    if is_vote(payload):
+        record_vote(payload.message_id, payload.user_id, str(payload.emoji))
+        shard_stats[get_guild_shard_id(payload.guild_id)]["votes_recorded"] += 1
+
+
+@client.event
+async def on_raw_reaction_remove(payload: discord.RawReactionActionEvent):
+    if is_vote(payload):
+        remove_vote(payload.message_id, payload.user_id, str(payload.emoji))
+        shard_stats[get_guild_shard_id(payload.guild_id)]["votes_removed"] += 1
+
+
+@client.event
+async def on_guild_emojis_update(guild: discord.Guild, before, after):
+    emoji_indexes.update_emojis(guild.id, after)
+
+
+@client.event
+async def on_guild_stickers_update(guild: discord.Guild, before, after):
+    emoji_indexes.update_stickers(guild.id, after)
+
+
+@client.event
+async def on_guild_update(before: discord.Guild, after: discord.Guild):
+    emoji_indexes.update_premium_tier(after.id, after.premium_tier)
+
+
+@client.event
+async def on_guild_remove(guild: discord.Guild):
+    emoji_indexes.forget_guild(guild.id)
+
+
+async def load_members(guild: discord.Guild):
+    """Load the members of a guild if they haven't been yet, sharing one request between concurrent callers
+
+    Args:
+        guild (discord.Guild): guild to load the members of
+    """
+    if guild.chunked:
+        return
+    request = member_chunk_requests.get(guild.id)
+    if request is None:
+        request = asyncio.create_task(guild.chunk())
+        member_chunk_requests[guild.id] = request
+        request.add_done_callback(lambda _: member_chunk_requests.pop(guild.id, None))
+    await asyncio.shield(request)
+
+
+async def get_poll_votes(poll, message: discord.Message):
+    """Get the votes for a poll from the votes recorded from reaction events
+
+    Falls back to paging through the poll's reactions if events may have been missed,
+    i.e. the poll is older than the current gateway session of its guild's shard.
+
+    Args:
+        poll (poll_store.Poll): poll to count
+        message (discord.Message): message object of the poll
+
+    Returns:
+        utils.VoteTally: raw and weighted votes
+    """
+    session_started_at = shard_sessions_started_at.get(get_guild_shard_id(poll.guild_id))
+    if session_started_at is not None and poll.created_at >= session_started_at:
+        yes_voter_ids, no_voter_ids = get_poll_voter_ids(poll.message_id)
+    else:
+        yes_voter_ids, no_voter_ids = await get_voter_ids(message)
+        replace_poll_votes(poll.message_id, yes_voter_ids, no_voter_ids)
+    guild = client.get_guild(poll.guild_id)
+    await load_members(guild)
+    return tally_votes(
+        yes_voter_ids,
+        no_voter_ids,
+        self_bot_id=client.user.id,
+        guild=guild,
+    )
+
+
+def schedule_new_poll(poll):
+    """Schedule a poll as soon as it is created, instead of at the next look for new polls in the store
+
+    Args:
+        poll (poll_store.Poll): new poll
+    """
+    if scheduler is not None:
+        scheduler.schedule(poll)
+
+
+subscribe(POLL_CREATED, schedule_new_poll)
+
+
+def resync_with_store():
+    """Reload the settings and schedule every active poll again, after events from the creator may have been missed"""
+    load_all_guild_settings()
+    if scheduler is not None:
+        scheduler.load_all()
+
+
+# receives new polls and settings changes from the poll creator when it runs in its own process
+poll_event_channel = PollEventChannel(
+    POLL_EVENT_SOCKET_PATH, outgoing_events=[POLL_CLOSED], resync=resync_with_store
+)
+
+
+def close_poll(poll):
+    """Remove a resolved (or unresolvable) poll from the store and tell the poll creator it is closed
+
+    Args:
+        poll (poll_store.Poll): poll to close
+    """
+    remove_poll(poll.message_id)
+    publish(POLL_CLOSED, poll)
+    discard_image(poll.image_hash)
+    resolve_failures.pop(poll.message_id, None)
+
+
+async def apply_poll_result(poll, message: discord.Message):
+    """Add, delete, rename or change the emoji/sticker of a poll that passed
+
+    Args:
+        poll (poll_store.Poll): poll that passed
+        message (discord.Message): poll message
+    """
+    if poll.poll_type.startswith("add"):
+        await add_poll_result(
+            message,
+            poll.poll_type,
+            poll.target_name,
+            poll.image_url,
+            poll.image_hash,
+        )
+    elif poll.poll_type.startswith("delete"):
+        await delete_poll_result(message, poll.poll_type, poll.target_name)
+    elif poll.poll_type.startswith("rename"):
+        await rename_poll_result(
+            message, poll.poll_type, poll.target_name, poll.new_name
+        )
+    elif poll.poll_type.startswith("change"):
+        await change_poll_result(
+            message,
+            poll.poll_type,
+            poll.target_name,
+            poll.image_url,
+            poll.image_hash,
+        )
+
+
+async def get_poll_channel(poll):
+    """Get the channel of a poll, asking Discord when it isn't cached
+
+    A channel is missing from the cache while its guild is unavailable or its shard hasn't received it yet,
+    so only Discord can tell whether it is really gone.
+
+    Args:
+        poll (poll_store.Poll): poll whose channel to get
+
+    Raises:
+        discord.NotFound: if the channel was deleted
+        discord.Forbidden: if the bot can't see the channel anymore
+
+    Returns:
+        discord.abc.Messageable: channel of the poll
+    """
+    channel = client.get_channel(poll.channel_id)
+    if channel is None:
+        channel = await outbound.call(
+            REPLY,
+            ("fetch_channel", poll.channel_id),
+            lambda: client.fetch_channel(poll.channel_id),
+            coalesce_key=("fetch_channel", poll.channel_id),
+        )
+    return channel
+
+
+async def post_poll_result(poll):
+    """Fetch and tally a poll that is due and post its result, closing it if its message or channel is gone
+
+    Args:
+        poll (poll_store.Poll): poll to resolve
+
+    Raises:
+        GuildUnavailableError: if the poll's guild isn't available, the poll is kept
+        Exception: if the result couldn't be posted, nothing is posted yet so it can be retried
+
+    Returns:
+        tuple[poll_store.Poll,discord.Message,float,float]: poll with its details filled in, poll message,
+            weighted votes for and against, or None if the poll was closed without a result
+    """
+    try:
+        channel = await get_poll_channel(poll)
+    except (discord.errors.NotFound, discord.errors.Forbidden):
+        # deleted, or the bot can't see it anymore, like a deleted message
+        logging.info(
+            f"Channel of poll {poll.guild_id}-{poll.channel_id}-{poll.message_id} not found, skipping"
+        )
+        close_poll(poll)
+        return None
+    guild = client.get_guild(poll.guild_id)
+    if guild is None or guild.unavailable:
+        # the channel still exists, the result is posted once the guild's shard has it
+        raise GuildUnavailableError(f"Guild {poll.guild_id} is unavailable")
+    try:
+        message = await outbound.call(
+            REPLY,
+            ("fetch_message", poll.channel_id),
+            lambda: channel.fetch_message(poll.message_id),
+            coalesce_key=("fetch_message", poll.message_id),
+        )
+        if poll.target_name is None:
+            target_name, new_name, image_url = get_poll_metadata_from_message(
+                message, poll.poll_type
+            )
+            poll = poll._replace(
+                target_name=target_name, new_name=new_name, image_url=image_url
+            )
+        tally = await get_poll_votes(poll, message)
+        logging.info(
+            f"Poll {poll.guild_id}-{poll.channel_id}-{poll.message_id} tallied: {tally}"
+        )
+        await reply_to_poll(
+            message,
+            await get_print_string_for_poll_result(
+                message,
+                self_bot_id=client.user.id,
+                poll_type=poll.poll_type,
+                yes_count=tally.yes_count,
+                no_count=tally.no_count,
+                name=poll.target_name,
+            ),
+        )
+    except discord.errors.NotFound:
+        logging.info(
+            f"Message {poll.guild_id}-{poll.channel_id}-{poll.message_id} not found, skipping"
+        )
+        close_poll(poll)
+        return None
+    return poll, message, tally.yes_count, tally.no_count
+
+
+async def resolve_poll(poll):
+    """Post the result of a poll that is due and apply it if it passed
+
+    Only posting the result is retried. Once it is posted the poll is closed, a failure to apply it
+    is replied to the poll instead.
+
+    Args:
+        poll (poll_store.Poll): poll to resolve
+
+    Raises:
+        Exception: if the result couldn't be posted
+    """
+    try:
+        posted = await post_poll_result(poll)
+        if posted is None:
+            return
+        poll, message, yes_count, no_count = posted
+        try:
+            if (
+                await get_poll_result(
+                    message,
+                    self_bot_id=client.user.id,
+                    yes_count=yes_count,
+                    no_count=no_count,
+                )
+                and get_guild_settings(poll.guild_id).automatically_add_emojis
+            ):
+                await apply_poll_result(poll, message)
+        except Exception as e:
+            logging.exception(
+                f"Failed to apply the result of poll {poll.guild_id}-{poll.channel_id}-{poll.message_id}"
+            )
             try:
-                channel = client.get_channel(channel_id)
-                message = await channel.fetch_message(message_id)
-                if (
-                    dt.datetime.now(dt.timezone.utc) - message.created_at
-                ).total_seconds() > POLL_DURATION:
-                    yes_count, no_count = await get_votes(
-                        message,
-                        self_bot_id=client.user.id,
-                        guild=client.get_guild(guild_id),
-                    )
-                    await channel.send(
-                        await get_print_string_for_poll_result(
-                            message,
-                            self_bot_id=client.user.id,
-                            poll_type=poll_type,
-                            yes_count=yes_count,
-                            no_count=no_count,
-                        ),
-                        reference=message,
-                    )
-                    if (
-                        await get_poll_result(
-                            message,
-                            self_bot_id=client.user.id,
-                            yes_count=yes_count,
-                            no_count=no_count,
-                        )
-                        and AUTOMATICALLY_ADD_EMOJIS
-                    ):
-                        if poll_type.startswith("add"):
-                            await add_poll_result(message, poll_type)
-                        elif poll_type.startswith("delete"):
-                            await delete_poll_result(message, poll_type)
-                        elif poll_type.startswith("rename"):
-                            await rename_poll_result(message, poll_type)
-                        elif poll_type.startswith("change"):
-                            await change_poll_result(message, poll_type)
-                    os.remove(
-                        f"active_polls/{guild_id}/{channel.id}/{message.id}_{poll_type}"
-                    )
-            except discord.errors.NotFound:
-                logging.info(
-                    f"Message {guild_id}-{channel_id}-{message_id} not found, skipping"
+                await reply_to_poll(message, f"Failed to apply the poll result, {e}")
+            except Exception:
+                logging.exception(
+                    f"Failed to reply to poll {poll.guild_id}-{poll.channel_id}-{poll.message_id}"
                 )
-                try:
-                    os.remove(
-                        f"active_polls/{guild_id}/{channel_id}/{message_id}_{poll_type}"
-                    )
-                except FileNotFoundError:
-                    pass
-        # post updates
-        hour_right_now = dt.datetime.utcnow().hour
-        if (
-            hour_right_now in POLL_UPDATE_POST_TIMES
-            and hour_right_now != last_update_hour
-        ):
-            await post_update()
-            last_update_hour = hour_right_now
-
-        await asyncio.sleep(WAIT_TIME_BETWEEN_CHECKS)
-
-
-client.run(token)
+        try:
+            close_poll(poll)
+        except Exception:
+            # not raised, retrying would post the result again
+            logging.exception(
+                f"Failed to close poll {poll.guild_id}-{poll.channel_id}-{poll.message_id}"
+            )
+    finally:
+        scheduler.finish(poll.message_id)
+
+
+async def resolve_poll_isolated(poll):
+    """Resolve a poll under the resolution semaphore, keeping its failures away from other polls
+
+    A poll whose result couldn't be posted is retried WAIT_TIME_BETWEEN_CHECKS later, keeping its deadline,
+    and closed without a result after MAX_RESOLVE_ATTEMPTS attempts. Polls of unavailable guilds are
+    retried without counting an attempt, like the other polls of the guild, until Discord has it again.
+
+    Args:
+        poll (poll_store.Poll): poll to resolve
+
+    Returns:
+        bool: True if the poll was resolved
+    """
+    async with resolution_semaphore:
+        started = time.monotonic()
+        try:
+            await resolve_poll(poll)
+        except GuildUnavailableError:
+            logging.info(
+                f"Guild of poll {poll.guild_id}-{poll.channel_id}-{poll.message_id} is unavailable, retrying later"
+            )
+            scheduler.schedule(poll, retry_at=time.time() + WAIT_TIME_BETWEEN_CHECKS)
+            return False
+        except Exception:
+            attempts = resolve_failures.get(poll.message_id, 0) + 1
+            if attempts >= MAX_RESOLVE_ATTEMPTS:
+                logging.exception(
+                    f"Failed to resolve poll {poll.guild_id}-{poll.channel_id}-{poll.message_id} "
+                    f"{attempts} times, closing it without a result"
+                )
+                close_poll(poll)
+            else:
+                logging.exception(
+                    f"Failed to resolve poll {poll.guild_id}-{poll.channel_id}-{poll.message_id}, retrying later"
+                )
+                resolve_failures[poll.message_id] = attempts
+                scheduler.schedule(poll, retry_at=time.time() + WAIT_TIME_BETWEEN_CHECKS)
+            shard_stats[get_guild_shard_id(poll.guild_id)]["poll_failures"] += 1
+            POLLS_RESOLVED.inc("failed")
+            return False
+        shard_stats[get_guild_shard_id(poll.guild_id)]["polls_resolved"] += 1
+        POLLS_RESOLVED.inc("resolved")
+        POLL_CLOSE_LATENESS.observe(max(time.time() - poll.expires_at, 0))
+        logging.info(
+            f"Resolved poll {poll.guild_id}-{poll.channel_id}-{poll.message_id} in {time.monotonic() - started:.2f}s"
+        )
+        return True
+
+
+async def resolve_polls(polls):
+    """Resolve a batch of due polls concurrently, at most MAX_CONCURRENT_POLL_RESOLUTIONS at a time
+
+    Args:
+        polls (List[poll_store.Poll]): polls to resolve
+    """
+    started = time.monotonic()
+    resolved = await asyncio.gather(*(resolve_poll_isolated(poll) for poll in polls))
+    logging.info(
+        f"Resolved {sum(resolved)}/{len(polls)} due poll(s) in {time.monotonic() - started:.2f}s"
+    )
+    purge_orphan_votes(
+        timestamp_to_snowflake(time.time() - NEW_POLL_LOOKBACK_SECONDS)
+    )
+
+
+async def backfill_poll_metadata():
+    """Read the details of polls saved without them (e.g. imported from an active_polls/ directory) from their messages, once"""
+    for poll in get_polls_missing_metadata():
+        if not owns_guild(poll.guild_id):
+            continue
+        channel = client.get_channel(poll.channel_id)
+        if channel is None:
+            continue
+        try:
+            message = await outbound.call(
+                BACKGROUND,
+                ("fetch_message", poll.channel_id),
+                lambda: channel.fetch_message(poll.message_id),
+                coalesce_key=("fetch_message", poll.message_id),
+            )
+        except discord.errors.NotFound:
+            # dealt with when the poll is resolved
+            continue
+        update_poll_metadata(
+            poll.message_id, *get_poll_metadata_from_message(message, poll.poll_type)
+        )
+
+
+async def catch_up_overdue_polls(polls):
+    """Resolve the polls that expired while the bot was down, logging progress along the way
+
+    They run under the resolution semaphore like any other batch, which starts them in the order given.
+
+    Args:
+        polls (List[poll_store.Poll]): overdue polls, earliest deadline first
+    """
+    if not polls:
+        return
+    logging.info(f"Catching up on {len(polls)} poll(s) that expired while the bot was down")
+    started = last_report = time.monotonic()
+    resolved = 0
+    # tasks start in the order they are created, so the oldest polls get the semaphore first
+    resolutions = [asyncio.create_task(resolve_poll_isolated(poll)) for poll in polls]
+    for done, resolution in enumerate(asyncio.as_completed(resolutions), 1):
+        resolved += await resolution
+        if time.monotonic() - last_report >= CATCH_UP_PROGRESS_INTERVAL:
+            last_report = time.monotonic()
+            logging.info(f"Catch-up: {done}/{len(polls)} overdue poll(s) handled")
+    logging.info(
+        f"Caught up on {resolved}/{len(polls)} overdue poll(s) in {time.monotonic() - started:.2f}s"
+    )
+
+
+async def reconcile_polls():
+    """Resolve every poll that is already overdue at startup, then read the details of polls saved without them"""
+    await catch_up_overdue_polls(scheduler.pop_due())
+    await backfill_poll_metadata()
+
+
+async def check_polls():
+    """Resolve polls as their deadlines come up"""
+    scheduler.load_all()
+    # overdue polls are resolved right away, alongside the regular batches
+    reconcile = asyncio.create_task(reconcile_polls())
+    batches = {reconcile}
+    reconcile.add_done_callback(batches.discard)
+    while True:
+        # keep waiting for the next deadline while earlier batches are still resolving
+        batch = asyncio.create_task(resolve_polls(await scheduler.wait_for_due_polls()))
+        batches.add(batch)
+        batch.add_done_callback(batches.discard)
+
+
+async def post_updates():
+    """Post updates at the hours in POLL_UPDATE_POST_TIMES"""
+    if len(POLL_UPDATE_POST_TIMES) == 0:
+        return
+    while True:
+        now = dt.datetime.now(dt.timezone.utc)
+        next_post_time = min(
+            now.replace(hour=hour, minute=0, second=0, microsecond=0)
+            + dt.timedelta(days=1 if hour <= now.hour else 0)
+            for hour in POLL_UPDATE_POST_TIMES
+        )
+        await asyncio.sleep((next_post_time - now).total_seconds())
+        await post_update()
+
+
+async def log_shard_stats():
+    """Log the work done for each shard's guilds and its latency every SHARD_STATS_LOG_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(SHARD_STATS_LOG_INTERVAL)
+        guild_counts = Counter(guild.shard_id for guild in client.guilds)
+        for shard_id, latency in client.latencies:
+            stats = ", ".join(
+                f"{name} {count}" for name, count in sorted(shard_stats[shard_id].items())
+            )
+            logging.info(
+                f"Shard {shard_id}: {guild_counts[shard_id]} guild(s), latency {latency * 1000:.0f}ms"
+                + (f", {stats}" if stats else "")
+            )
+
+
+@client.event
+async def on_shard_ready(shard_id):
+    # fires again whenever a shard starts a new gateway session (resumed sessions replay
+    # missed events instead), so reaction events of its guilds before now may have been missed
+    shard_sessions_started_at[shard_id] = time.time()
+    logging.info(f"Shard {shard_id} ready")
+
+
+@client.event
+async def on_ready():
+    # only start the loops once
+    global background_tasks, scheduler, resolution_semaphore
+    if background_tasks:
+        return
+    log_startup_stats("Results checker")
+    logging.info(
+        f"Running shard(s) {', '.join(map(str, sorted(client.shards)))} of {client.shard_count}"
+    )
+    scheduler = PollScheduler(
+        refresh_interval=WAIT_TIME_BETWEEN_CHECKS, owns_guild=owns_guild
+    )
+    resolution_semaphore = asyncio.Semaphore(MAX_CONCURRENT_POLL_RESOLUTIONS)
+    background_tasks = [
+        asyncio.create_task(check_polls()),
+        asyncio.create_task(post_updates()),
+        asyncio.create_task(log_shard_stats()),
+    ]
+    start_stats_logging()
+    await start_metrics_server(METRICS_HOST, RESULTS_CHECKER_METRICS_PORT)
+
+
+async def main(serve_poll_events=False):
+    """Run the results checker
+
+    Args:
+        serve_poll_events (bool, optional): listen for the poll creator running in another process. Defaults to False.
+    """
+    async with client:
+        if serve_poll_events:
+            poll_event_server = asyncio.create_task(poll_event_channel.serve())
+        if RESULTS_CHECKER_ADMIN_SOCKET_PATH is not None:
+            admin_server = asyncio.create_task(
+                serve_admin_socket(RESULTS_CHECKER_ADMIN_SOCKET_PATH, "results checker")
+            )
+        try:
+            await client.start(token)
+        finally:
+            if serve_poll_events:
+                poll_event_server.cancel()
+            if RESULTS_CHECKER_ADMIN_SOCKET_PATH is not None:
+                admin_server.cancel()
+            await close_session()
+
+
+if __name__ == "__main__":
+    discord.utils.setup_logging(root=True)
+    asyncio.run(main(serve_poll_events=True))
@@ -0,0 +1,137 @@
+import asyncio
+import heapq
+import time
+
+from poll_store import get_active_polls
+from poll_store import get_polls_newer_than
+
+# how far back to look for polls saved out of order, e.g. when two polls are created at once
+NEW_POLL_LOOKBACK_SECONDS = 5 * 60
+
+
+class PollScheduler:
+    """Keeps active polls in a min-heap keyed by deadline so the checker only wakes up when a poll is due
+
+    Cancelled polls are left in the heap and skipped when they reach the top. Polls handed out by
+    `pop_due` are not scheduled again until `finish` is called for them.
+    """
+
+    def __init__(self, refresh_interval, owns_guild=None):
+        """
+        Args:
+            refresh_interval (float): longest time to sleep without looking for new polls in the store, in seconds
+            owns_guild (Callable[[int], bool], optional): tells if polls of a guild ID are resolved by this process,
+                others are ignored. Defaults to None, resolving the polls of every guild.
+        """
+        self.refresh_interval = refresh_interval
+        self.owns_guild = owns_guild
+        self._heap = []
+        self._scheduled = {}
+        self._in_progress = set()
+        self._newest_message_id = 0
+        self._wakeup = asyncio.Event()
+
+    def __len__(self):
+        return len(self._scheduled)
+
+    def schedule(self, poll, retry_at=None):
+        """Schedule a poll to be resolved at its deadline, does nothing if it is already scheduled or isn't ours
+
+        Args:
+            poll (poll_store.Poll): poll to schedule
+            retry_at (float, optional): UNIX timestamp to resolve the poll at instead, e.g. to retry it after
+                failing. The poll keeps its deadline. Defaults to None, resolving it at its deadline.
+        """
+        # remembered even for polls of other guilds, so they aren't looked at again by `load_new`
+        self._newest_message_id = max(self._newest_message_id, poll.message_id)
+        if self.owns_guild is not None and not self.owns_guild(poll.guild_id):
+            return
+        if poll.message_id in self._scheduled or poll.message_id in self._in_progress:
+            return
+        self._scheduled[poll.message_id] = poll
+        due_at = poll.expires_at if retry_at is None else retry_at
+        heapq.heappush(self._heap, (due_at, poll.message_id))
+        # wake the waiter up in case this poll is now the next one due
+        if self._heap[0][1] == poll.message_id:
+            self._wakeup.set()
+
+    def cancel(self, message_id):
+        """Stop tracking a poll
+
+        Args:
+            message_id (int): ID of poll message
+        """
+        self._scheduled.pop(message_id, None)
+
+    def finish(self, message_id):
+        """Mark a poll returned by `pop_due` as handled, so it can be scheduled again if it is still active
+
+        Args:
+            message_id (int): ID of poll message
+        """
+        self._in_progress.discard(message_id)
+
+    def load_all(self):
+        """Schedule every active poll in the store"""
+        for poll in get_active_polls():
+            self.schedule(poll)
+
+    def load_new(self):
+        """Schedule polls added to the store since the newest poll already scheduled"""
+        lookback = int(NEW_POLL_LOOKBACK_SECONDS * 1000) << 22
+        for poll in get_polls_newer_than(max(self._newest_message_id - lookback, 0)):
+            self.schedule(poll)
+
+    def next_deadline(self):
+        """Get when the next poll is due, its deadline or the time it is retried at
+
+        Returns:
+            float: UNIX timestamp, or None if no polls are scheduled
+        """
+        while self._heap and self._heap[0][1] not in self._scheduled:
+            heapq.heappop(self._heap)
+        if self._heap:
+            return self._heap[0][0]
+        return None
+
+    def pop_due(self, now=None):
+        """Remove and return every scheduled poll whose deadline has passed
+
+        Args:
+            now (float, optional): UNIX timestamp to compare deadlines to. Defaults to the current time.
+
+        Returns:
+            List[poll_store.Poll]: due polls, earliest deadline first
+        """
+        if now is None:
+            now = time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, message_id = heapq.heappop(self._heap)
+            poll = self._scheduled.pop(message_id, None)
+            if poll is not None:
+                self._in_progress.add(message_id)
+                due.append(poll)
+        return due
+
+    async def wait_for_due_polls(self):
+        """Sleep until at least one poll is due, picking up new polls from the store along the way
+
+        Returns:
+            List[poll_store.Poll]: due polls, earliest deadline first
+        """
+        while True:
+            self.load_new()
+            due = self.pop_due()
+            if due:
+                return due
+            timeout = self.refresh_interval
+            deadline = self.next_deadline()
+            if deadline is not None:
+                timeout = min(timeout, max(deadline - time.time(), 0))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
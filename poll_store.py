@@ -0,0 +1,838 @@
+import json
+import os
+import sqlite3
+from collections import namedtuple
+
+from config import POLL_DATABASE_FILE_NAME
+from config import POLL_DURATION
+from config import POLL_NO_EMOJI
+from config import POLL_YES_EMOJI
+from metrics import Gauge
+
+# Discord snowflakes count milliseconds from the start of 2015
+DISCORD_EPOCH_MS = 1420070400000
+
+Poll = namedtuple(
+    "Poll",
+    [
+        "guild_id",
+        "channel_id",
+        "message_id",
+        "poll_type",
+        "creator_id",
+        "created_at",
+        "expires_at",
+        "target_name",
+        "new_name",
+        "image_url",
+        "image_hash",
+        "animated",
+    ],
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS polls (
+    message_id INTEGER PRIMARY KEY,
+    guild_id INTEGER NOT NULL,
+    channel_id INTEGER NOT NULL,
+    poll_type TEXT NOT NULL,
+    creator_id INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    target_name TEXT,
+    new_name TEXT,
+    image_url TEXT,
+    image_hash TEXT,
+    animated INTEGER
+);
+CREATE INDEX IF NOT EXISTS polls_guild_channel_idx ON polls (guild_id, channel_id);
+CREATE INDEX IF NOT EXISTS polls_channel_idx ON polls (channel_id);
+CREATE INDEX IF NOT EXISTS polls_creator_idx ON polls (guild_id, channel_id, creator_id);
+CREATE INDEX IF NOT EXISTS polls_expiry_idx ON polls (expires_at);
+CREATE INDEX IF NOT EXISTS polls_image_hash_idx ON polls (image_hash);
+CREATE INDEX IF NOT EXISTS polls_guild_message_idx ON polls (guild_id, message_id);
+CREATE TABLE IF NOT EXISTS poll_votes (
+    message_id INTEGER NOT NULL,
+    user_id INTEGER NOT NULL,
+    emoji TEXT NOT NULL,
+    PRIMARY KEY (message_id, emoji, user_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS guild_revisions (
+    guild_id INTEGER PRIMARY KEY,
+    revision INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS digest_messages (
+    channel_id INTEGER NOT NULL,
+    guild_id INTEGER,
+    page INTEGER NOT NULL,
+    message_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    PRIMARY KEY (channel_id, page)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS guild_settings (
+    guild_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (guild_id, name)
+) WITHOUT ROWID;
+"""
+
+_POLL_COLUMNS = ", ".join(Poll._fields)
+_POLL_PLACEHOLDERS = ", ".join("?" for _ in Poll._fields)
+
+_connection = None
+
+
+def get_connection():
+    """Get the connection to the poll database, opening it on first use
+
+    Both the poll creator and the results checker open the same file, WAL mode
+    lets one process read while the other writes.
+
+    Returns:
+        sqlite3.Connection: connection to the poll database
+    """
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(POLL_DATABASE_FILE_NAME, isolation_level=None)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.execute("PRAGMA busy_timeout=5000")
+        _connection.executescript(_SCHEMA)
+    return _connection
+
+
+def close_connection():
+    """Close the connection to the poll database, the next query opens it again"""
+    global _connection
+    if _connection is not None:
+        _connection.close()
+        _connection = None
+
+
+def use_database(file_name):
+    """Switch this process to another poll database file, e.g. a temporary one for benchmarks
+
+    Args:
+        file_name (str): path of the database file, created on first use if it doesn't exist
+    """
+    global POLL_DATABASE_FILE_NAME
+    close_connection()
+    POLL_DATABASE_FILE_NAME = file_name
+
+
+def snowflake_to_timestamp(snowflake):
+    """Get the creation time encoded in a discord snowflake
+
+    Args:
+        snowflake (int/str): discord ID
+
+    Returns:
+        float: UNIX timestamp, in seconds
+    """
+    return ((int(snowflake) >> 22) + DISCORD_EPOCH_MS) / 1000
+
+
+def timestamp_to_snowflake(timestamp):
+    """Get the smallest discord ID that could be created at a given time
+
+    Args:
+        timestamp (float): UNIX timestamp, in seconds
+
+    Returns:
+        int: discord ID
+    """
+    return max(int(timestamp * 1000) - DISCORD_EPOCH_MS, 0) << 22
+
+
+def save_poll(
+    guild_id,
+    channel_id,
+    message_id,
+    creator_id,
+    poll_type,
+    target_name=None,
+    new_name=None,
+    image_url=None,
+    image_hash=None,
+    animated=None,
+    created_at=None,
+    duration=None,
+):
+    """Save a new active poll
+
+    Args:
+        guild_id (int): ID of guild
+        channel_id (int): ID of channel
+        message_id (int): ID of poll message
+        creator_id (int): ID of poll creator
+        poll_type (str): type of poll, e.g. "addemoji"
+        target_name (str, optional): name of the emoji/sticker the poll is about
+        new_name (str, optional): proposed new name, only used in renaming polls
+        image_url (str, optional): URL of the proposed image, or of the current image for deleting/renaming polls
+        image_hash (str, optional): hash of the proposed image in the image cache
+        animated (bool, optional): whether the proposed image is animated, None if unknown
+        created_at (float, optional): UNIX timestamp of poll creation. Defaults to the time in the message ID.
+        duration (float, optional): seconds until the poll closes. Defaults to POLL_DURATION.
+
+    Returns:
+        Poll: saved poll
+    """
+    if created_at is None:
+        created_at = snowflake_to_timestamp(message_id)
+    if duration is None:
+        duration = POLL_DURATION
+    poll = Poll(
+        int(guild_id),
+        int(channel_id),
+        int(message_id),
+        poll_type,
+        int(creator_id),
+        created_at,
+        created_at + duration,
+        target_name,
+        new_name,
+        image_url,
+        image_hash,
+        animated,
+    )
+    connection = get_connection()
+    with connection:
+        connection.execute("BEGIN")
+        connection.execute(
+            f"INSERT OR REPLACE INTO polls ({_POLL_COLUMNS}) VALUES ({_POLL_PLACEHOLDERS})",
+            poll,
+        )
+        _bump_guild_revision(connection, guild_id)
+    return poll
+
+
+def save_polls(polls):
+    """Save many active polls in one transaction, replacing any with the same message ID
+
+    Args:
+        polls (Iterable[Poll]): polls to save
+    """
+    polls = list(polls)
+    connection = get_connection()
+    with connection:
+        connection.execute("BEGIN")
+        connection.executemany(
+            f"INSERT OR REPLACE INTO polls ({_POLL_COLUMNS}) VALUES ({_POLL_PLACEHOLDERS})",
+            polls,
+        )
+        for guild_id in {poll.guild_id for poll in polls}:
+            _bump_guild_revision(connection, guild_id)
+
+
+def update_poll_metadata(message_id, target_name, new_name, image_url):
+    """Fill in the details of a poll saved without them, e.g. one imported from an active_polls/ directory
+
+    Args:
+        message_id (int): ID of poll message
+        target_name (str): name of the emoji/sticker the poll is about
+        new_name (str): proposed new name, only used in renaming polls
+        image_url (str): URL of the image shown in the poll
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute("BEGIN")
+        connection.execute(
+            "UPDATE polls SET target_name = ?, new_name = ?, image_url = ? WHERE message_id = ?",
+            (target_name, new_name, image_url, int(message_id)),
+        )
+        _bump_guild_revision_of_poll(connection, message_id)
+
+
+def remove_poll(message_id):
+    """Remove a poll from the active polls
+
+    Args:
+        message_id (int): ID of poll message
+    """
+    connection = get_connection()
+    with connection:
+        connection.execute("BEGIN")
+        _bump_guild_revision_of_poll(connection, message_id)
+        connection.execute("DELETE FROM polls WHERE message_id = ?", (int(message_id),))
+        connection.execute(
+            "DELETE FROM poll_votes WHERE message_id = ?", (int(message_id),)
+        )
+
+
+def _bump_guild_revision(connection, guild_id):
+    """Mark the active polls of a guild as changed, must be called inside the transaction that changes them
+
+    Args:
+        connection (sqlite3.Connection): connection to the poll database
+        guild_id (int): ID of guild
+    """
+    connection.execute(
+        "INSERT INTO guild_revisions (guild_id, revision) VALUES (?, 1) "
+        "ON CONFLICT (guild_id) DO UPDATE SET revision = revision + 1",
+        (int(guild_id),),
+    )
+
+
+def _bump_guild_revision_of_poll(connection, message_id):
+    """Mark the active polls of the guild a poll is in as changed
+
+    Args:
+        connection (sqlite3.Connection): connection to the poll database
+        message_id (int): ID of poll message
+    """
+    row = connection.execute(
+        "SELECT guild_id FROM polls WHERE message_id = ?", (int(message_id),)
+    ).fetchone()
+    if row is not None:
+        _bump_guild_revision(connection, row[0])
+
+
+def get_guild_revision(guild_id):
+    """Get a number that changes whenever a poll of a guild is created, changed or closed, by either bot
+
+    Args:
+        guild_id (int): ID of guild
+
+    Returns:
+        int: revision of the guild's active polls
+    """
+    row = (
+        get_connection()
+        .execute(
+            "SELECT revision FROM guild_revisions WHERE guild_id = ?", (int(guild_id),)
+        )
+        .fetchone()
+    )
+    return row[0] if row is not None else 0
+
+
+def is_active_poll(message_id):
+    """Check if a message is an active poll
+
+    Args:
+        message_id (int): ID of a discord message
+
+    Returns:
+        bool: True if the message is an active poll
+    """
+    return (
+        get_connection()
+        .execute("SELECT 1 FROM polls WHERE message_id = ?", (int(message_id),))
+        .fetchone()
+        is not None
+    )
+
+
+def get_active_polls(guild_id=None, channel_id=None):
+    """Get active polls, optionally restricted to a guild and/or channel
+
+    Args:
+        guild_id (int, optional): only return polls in this guild
+        channel_id (int, optional): only return polls in this channel
+
+    Returns:
+        List[Poll]: active polls, oldest first
+    """
+    query = f"SELECT {_POLL_COLUMNS} FROM polls"
+    conditions = []
+    parameters = []
+    if guild_id is not None:
+        conditions.append("guild_id = ?")
+        parameters.append(int(guild_id))
+    if channel_id is not None:
+        conditions.append("channel_id = ?")
+        parameters.append(int(channel_id))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY message_id"
+    return [Poll(*row) for row in get_connection().execute(query, parameters)]
+
+
+def get_polls_page(
+    guild_id,
+    limit,
+    after_message_id=None,
+    before_message_id=None,
+    poll_type=None,
+    channel_id=None,
+    creator_id=None,
+):
+    """Get one page of a guild's active polls, using the message ID of a poll on a neighbouring page as cursor
+
+    Args:
+        guild_id (int): ID of guild
+        limit (int): maximum number of polls on the page
+        after_message_id (int, optional): get the polls right after this message
+        before_message_id (int, optional): get the polls right before this message
+        poll_type (str, optional): only return polls of this type
+        channel_id (int, optional): only return polls in this channel
+        creator_id (int, optional): only return polls created by this user
+
+    Returns:
+        List[Poll], bool: polls on the page oldest first, whether there are more polls past the page
+    """
+    conditions = ["guild_id = ?"]
+    parameters = [int(guild_id)]
+    if after_message_id is not None:
+        conditions.append("message_id > ?")
+        parameters.append(int(after_message_id))
+    if before_message_id is not None:
+        conditions.append("message_id < ?")
+        parameters.append(int(before_message_id))
+    if poll_type is not None:
+        conditions.append("poll_type = ?")
+        parameters.append(poll_type)
+    if channel_id is not None:
+        conditions.append("channel_id = ?")
+        parameters.append(int(channel_id))
+    if creator_id is not None:
+        conditions.append("creator_id = ?")
+        parameters.append(int(creator_id))
+    # walk backwards from the cursor when paging back
+    order = "DESC" if before_message_id is not None else "ASC"
+    polls = [
+        Poll(*row)
+        for row in get_connection().execute(
+            f"SELECT {_POLL_COLUMNS} FROM polls WHERE {' AND '.join(conditions)} "
+            f"ORDER BY message_id {order} LIMIT ?",
+            parameters + [limit + 1],
+        )
+    ]
+    has_more = len(polls) > limit
+    polls = polls[:limit]
+    if order == "DESC":
+        polls.reverse()
+    return polls, has_more
+
+
+def get_polls_expiring_before(timestamp):
+    """Get active polls whose deadline is at or before a given time
+
+    Args:
+        timestamp (float): UNIX timestamp, in seconds
+
+    Returns:
+        List[Poll]: expired polls, earliest deadline first
+    """
+    return [
+        Poll(*row)
+        for row in get_connection().execute(
+            f"SELECT {_POLL_COLUMNS} FROM polls WHERE expires_at <= ? ORDER BY expires_at",
+            (timestamp,),
+        )
+    ]
+
+
+def update_poll_image_hash(message_id, image_hash, animated):
+    """Record the cached image of a poll whose image finished processing after the poll was saved
+
+    Args:
+        message_id (int): ID of poll message
+        image_hash (str): hash of the proposed image in the image cache
+        animated (bool): whether the proposed image is animated
+    """
+    get_connection().execute(
+        "UPDATE polls SET image_hash = ?, animated = ? WHERE message_id = ?",
+        (image_hash, animated, int(message_id)),
+    )
+
+
+def is_image_in_use(image_hash):
+    """Check if an active poll uses a cached image
+
+    Args:
+        image_hash (str): hash of an image in the image cache
+
+    Returns:
+        bool: True if an active poll uses the image
+    """
+    return (
+        get_connection()
+        .execute("SELECT 1 FROM polls WHERE image_hash = ? LIMIT 1", (image_hash,))
+        .fetchone()
+        is not None
+    )
+
+
+def get_active_image_hashes():
+    """Get the cached images used by active polls
+
+    Returns:
+        set[str]: hashes of images in the image cache
+    """
+    return {
+        image_hash
+        for (image_hash,) in get_connection().execute(
+            "SELECT DISTINCT image_hash FROM polls WHERE image_hash IS NOT NULL"
+        )
+    }
+
+
+def get_polls_missing_metadata():
+    """Get active polls saved without their emoji/sticker name
+
+    Returns:
+        List[Poll]: polls missing metadata, oldest first
+    """
+    return [
+        Poll(*row)
+        for row in get_connection().execute(
+            f"SELECT {_POLL_COLUMNS} FROM polls WHERE target_name IS NULL ORDER BY message_id"
+        )
+    ]
+
+
+def get_polls_newer_than(message_id):
+    """Get active polls whose message is newer than a given message
+
+    Args:
+        message_id (int): ID of a discord message
+
+    Returns:
+        List[Poll]: newer polls, oldest first
+    """
+    return [
+        Poll(*row)
+        for row in get_connection().execute(
+            f"SELECT {_POLL_COLUMNS} FROM polls WHERE message_id > ? ORDER BY message_id",
+            (int(message_id),),
+        )
+    ]
+
+
+def count_polls_by_creator(guild_id=None):
+    """Count the active polls of each poll creator in each channel
+
+    Args:
+        guild_id (int, optional): only count polls in this guild
+
+    Returns:
+        List[Tuple[int,int,int,int]]: guild ID, channel ID, creator ID and number of active polls
+    """
+    query = "SELECT guild_id, channel_id, creator_id, COUNT(*) FROM polls"
+    parameters = ()
+    if guild_id is not None:
+        query += " WHERE guild_id = ?"
+        parameters = (int(guild_id),)
+    query += " GROUP BY guild_id, channel_id, creator_id"
+    return get_connection().execute(query, parameters).fetchall()
+
+
+def count_polls_by_guild():
+    """Count the active polls of each guild
+
+    Returns:
+        dict[int,int]: number of active polls by guild ID, guilds without any are left out
+    """
+    return dict(
+        get_connection().execute("SELECT guild_id, COUNT(*) FROM polls GROUP BY guild_id")
+    )
+
+
+ACTIVE_POLLS = Gauge(
+    "active_polls",
+    "Active polls per guild",
+    labels=("guild_id",),
+    collect=lambda: {
+        (guild_id,): count for guild_id, count in count_polls_by_guild().items()
+    },
+)
+
+
+def get_guild_revisions():
+    """Get the revision of every guild's active polls, see get_guild_revision
+
+    Returns:
+        dict[int,int]: revision of each guild that ever had a poll
+    """
+    return dict(
+        get_connection().execute("SELECT guild_id, revision FROM guild_revisions")
+    )
+
+
+def count_polls_of_type(guild_id, channel_id, poll_type, animated=None):
+    """Count the active polls of one type in a channel
+
+    Args:
+        guild_id (int): ID of guild
+        channel_id (int): ID of channel
+        poll_type (str): type of poll, e.g. "addemoji"
+        animated (bool, optional): only count polls with animated (True) or static (False) images.
+            Polls whose image hasn't been processed count as static. Defaults to counting every poll.
+
+    Returns:
+        int: number of active polls
+    """
+    query = "SELECT COUNT(*) FROM polls WHERE guild_id = ? AND channel_id = ? AND poll_type = ?"
+    parameters = (int(guild_id), int(channel_id), poll_type)
+    if animated is not None:
+        query += " AND COALESCE(animated, 0) = ?"
+        parameters += (int(animated),)
+    (count,) = get_connection().execute(query, parameters).fetchone()
+    return count
+
+
+def record_vote(message_id, user_id, emoji):
+    """Record a vote reaction
+
+    Args:
+        message_id (int): ID of poll message
+        user_id (int): ID of voter
+        emoji (str): emoji the voter reacted with
+    """
+    get_connection().execute(
+        "INSERT OR IGNORE INTO poll_votes (message_id, emoji, user_id) VALUES (?, ?, ?)",
+        (int(message_id), emoji, int(user_id)),
+    )
+
+
+def remove_vote(message_id, user_id, emoji):
+    """Remove a vote reaction
+
+    Args:
+        message_id (int): ID of poll message
+        user_id (int): ID of voter
+        emoji (str): emoji the voter removed
+    """
+    get_connection().execute(
+        "DELETE FROM poll_votes WHERE message_id = ? AND emoji = ? AND user_id = ?",
+        (int(message_id), emoji, int(user_id)),
+    )
+
+
+def get_poll_voter_ids(message_id):
+    """Get the recorded voters of a poll
+
+    Args:
+        message_id (int): ID of poll message
+
+    Returns:
+        List[int], List[int]: IDs of users who voted for and IDs of users who voted against
+    """
+    voter_ids = {POLL_YES_EMOJI: [], POLL_NO_EMOJI: []}
+    for emoji, user_id in get_connection().execute(
+        "SELECT emoji, user_id FROM poll_votes WHERE message_id = ?",
+        (int(message_id),),
+    ):
+        if emoji in voter_ids:
+            voter_ids[emoji].append(user_id)
+    return (voter_ids[POLL_YES_EMOJI], voter_ids[POLL_NO_EMOJI])
+
+
+def replace_poll_votes(message_id, yes_voter_ids, no_voter_ids):
+    """Replace the recorded votes of a poll, e.g. after recounting them from the poll's reactions
+
+    Args:
+        message_id (int): ID of poll message
+        yes_voter_ids (Iterable[int]): IDs of users who voted for
+        no_voter_ids (Iterable[int]): IDs of users who voted against
+    """
+    rows = [(int(message_id), POLL_YES_EMOJI, int(i)) for i in yes_voter_ids]
+    rows += [(int(message_id), POLL_NO_EMOJI, int(i)) for i in no_voter_ids]
+    connection = get_connection()
+    with connection:
+        connection.execute("BEGIN")
+        connection.execute(
+            "DELETE FROM poll_votes WHERE message_id = ?", (int(message_id),)
+        )
+        connection.executemany(
+            "INSERT OR IGNORE INTO poll_votes (message_id, emoji, user_id) VALUES (?, ?, ?)",
+            rows,
+        )
+
+
+def purge_orphan_votes(message_id_before):
+    """Delete votes recorded on messages that never became polls
+
+    Args:
+        message_id_before (int): only delete votes on messages older than this message ID
+    """
+    get_connection().execute(
+        "DELETE FROM poll_votes WHERE message_id < ? AND message_id NOT IN (SELECT message_id FROM polls)",
+        (int(message_id_before),),
+    )
+
+
+def get_digest_messages(channel_id):
+    """Get the messages the poll digest of a channel is posted in
+
+    Args:
+        channel_id (int): ID of channel
+
+    Returns:
+        List[Tuple[int,str]]: message ID and hash of the content of each digest page, in page order
+    """
+    return get_connection().execute(
+        "SELECT message_id, content_hash FROM digest_messages WHERE channel_id = ? ORDER BY page",
+        (int(channel_id),),
+    ).fetchall()
+
+
+def get_digest_channels():
+    """Get the channels that have a poll digest
+
+    Returns:
+        dict[int,int]: guild ID of each channel by channel ID, None for digests saved before guild IDs were recorded
+    """
+    return dict(
+        get_connection().execute(
+            "SELECT channel_id, MAX(guild_id) FROM digest_messages GROUP BY channel_id"
+        )
+    )
+
+
+def save_digest_message(channel_id, guild_id, page, message_id, content_hash):
+    """Record the message a page of a channel's poll digest is posted in
+
+    Args:
+        channel_id (int): ID of channel
+        guild_id (int): ID of the channel's guild
+        page (int): page number, starting at 0
+        message_id (int): ID of digest message
+        content_hash (str): hash of the page content, to tell if the message needs editing
+    """
+    get_connection().execute(
+        "INSERT OR REPLACE INTO digest_messages (channel_id, guild_id, page, message_id, content_hash) VALUES (?, ?, ?, ?, ?)",
+        (int(channel_id), int(guild_id), page, int(message_id), content_hash),
+    )
+
+
+def remove_digest_messages(channel_id, first_page=0):
+    """Forget the digest pages of a channel from a given page on
+
+    Args:
+        channel_id (int): ID of channel
+        first_page (int, optional): first page to forget. Defaults to 0, forgetting the whole digest.
+    """
+    get_connection().execute(
+        "DELETE FROM digest_messages WHERE channel_id = ? AND page >= ?",
+        (int(channel_id), first_page),
+    )
+
+
+def get_guild_setting_overrides(guild_id=None):
+    """Get the settings changed from their defaults in config.py, optionally for a single guild
+
+    Args:
+        guild_id (int, optional): only return the settings of this guild
+
+    Returns:
+        dict[int,dict[str,Any]]: value of each changed setting by name, by guild ID. Guilds without any are left out.
+    """
+    query = "SELECT guild_id, name, value FROM guild_settings"
+    parameters = ()
+    if guild_id is not None:
+        query += " WHERE guild_id = ?"
+        parameters = (int(guild_id),)
+    overrides = {}
+    for row_guild_id, name, value in get_connection().execute(query, parameters):
+        overrides.setdefault(row_guild_id, {})[name] = json.loads(value)
+    return overrides
+
+
+def save_guild_setting(guild_id, name, value):
+    """Change a setting of a guild from its default
+
+    Args:
+        guild_id (int): ID of guild
+        name (str): name of the setting, as in config.py
+        value (Any): new value, saved as JSON
+    """
+    get_connection().execute(
+        "INSERT OR REPLACE INTO guild_settings (guild_id, name, value) VALUES (?, ?, ?)",
+        (int(guild_id), name, json.dumps(value)),
+    )
+
+
+def remove_guild_setting(guild_id, name):
+    """Put a setting of a guild back to its default
+
+    Args:
+        guild_id (int): ID of guild
+        name (str): name of the setting, as in config.py
+    """
+    get_connection().execute(
+        "DELETE FROM guild_settings WHERE guild_id = ? AND name = ?", (int(guild_id), name)
+    )
+
+
+def import_active_polls_directory(path="active_polls"):
+    """Import polls saved by older versions of the bot as `{path}/{guild}/{channel}/{message}_{type}` files
+
+    The directory is renamed to `{path}.imported` afterwards so it is only imported once,
+    or to `{path}.imported.1`, `{path}.imported.2`... if an earlier import already used that name.
+    Polls already in the database are left untouched, so running this twice is harmless.
+
+    Args:
+        path (str, optional): directory to import. Defaults to "active_polls".
+
+    Returns:
+        int: number of polls imported
+    """
+    if not os.path.isdir(path):
+        return 0
+    rows = []
+    for guild_id in os.listdir(path):
+        for channel_id in os.listdir(os.path.join(path, guild_id)):
+            channel_path = os.path.join(path, guild_id, channel_id)
+            for poll in os.listdir(channel_path):
+                message_id, poll_type = poll.split("_")
+                with open(os.path.join(channel_path, poll), "r") as f:
+                    content = f.read().strip()
+                # polls saved before creators were recorded have empty files
+                creator_id = int(content) if content != "" else 0
+                created_at = snowflake_to_timestamp(message_id)
+                rows.append(
+                    (
+                        int(guild_id),
+                        int(channel_id),
+                        int(message_id),
+                        poll_type,
+                        creator_id,
+                        created_at,
+                        created_at + POLL_DURATION,
+                        None,
+                        None,
+                        None,
+                        None,
+                        None,
+                    )
+                )
+    connection = get_connection()
+    with connection:
+        connection.execute("BEGIN")
+        cursor = connection.executemany(
+            f"INSERT OR IGNORE INTO polls ({_POLL_COLUMNS}) VALUES ({_POLL_PLACEHOLDERS})",
+            rows,
+        )
+    _rename_imported_directory(path)
+    return cursor.rowcount
+
+
+def _rename_imported_directory(path):
+    """Rename an imported active_polls/ directory to a name no earlier import used
+
+    Args:
+        path (str): imported directory
+    """
+    target = path + ".imported"
+    suffix = 0
+    while True:
+        if not os.path.exists(target):
+            try:
+                os.rename(path, target)
+                return
+            except FileNotFoundError:
+                # the other bot process got here first
+                return
+            except OSError:
+                # the target was made since it was checked
+                if not os.path.exists(path):
+                    return
+        suffix += 1
+        target = f"{path}.imported.{suffix}"
+
+
+if __name__ == "__main__":
+    print(f"Imported {import_active_polls_directory()} poll(s) into {POLL_DATABASE_FILE_NAME}")
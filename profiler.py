@@ -0,0 +1,288 @@
+import argparse
+import asyncio
+import datetime as dt
+import functools
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+from config import MAX_PROFILE_DURATION
+from poll_ipc import start_private_unix_server
+
+PROFILE_KINDS = ("cpu", "memory")
+# seconds a profile lasts when no duration is given
+DEFAULT_PROFILE_SECONDS = 30
+# seconds of CPU time between samples of the event loop's stack
+SAMPLE_INTERVAL = 0.005
+# stacks, functions or allocation sites listed in a report
+TOP_COUNT = 30
+# frames kept of each allocation's traceback while tracing memory
+TRACEMALLOC_FRAMES = 10
+# largest profile report read from an admin socket, in bytes
+MAX_REPORT_SIZE = 64 * 1024 * 1024
+
+# set while a profile is being taken, only one runs at a time
+_running = False
+
+
+class ProfileError(Exception):
+    """Raised when a profile can't be taken"""
+
+
+def _describe_frame(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _is_idle(stack):
+    # the event loop waits for sockets and timers in its selector when there is nothing to run
+    return bool(stack) and stack[-1].startswith(("select (selectors.py", "poll (selectors.py"))
+
+
+async def profile_cpu(seconds):
+    """Sample the stack of the event loop for a while, every SAMPLE_INTERVAL seconds of CPU time used by the process
+
+    The sampling signal is only set up while profiling. The event loop has to run on the main thread,
+    where Python runs signal handlers.
+
+    Args:
+        seconds (float): how long to sample for
+
+    Raises:
+        ProfileError: if the event loop isn't running on the main thread
+
+    Returns:
+        str: report of the busiest functions and stacks, ending with every stack in the folded format
+            read by flame graph tools
+    """
+    samples = Counter()
+
+    def take_sample(signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(_describe_frame(frame))
+            frame = frame.f_back
+        samples[tuple(reversed(stack))] += 1
+
+    if threading.current_thread() is not threading.main_thread():
+        raise ProfileError("CPU profiles need the event loop to run on the main thread")
+    previous_handler = signal.signal(signal.SIGPROF, take_sample)
+    signal.setitimer(signal.ITIMER_PROF, SAMPLE_INTERVAL, SAMPLE_INTERVAL)
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous_handler)
+
+    total = sum(samples.values())
+    busy = Counter({stack: count for stack, count in samples.items() if not _is_idle(stack)})
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in busy.items():
+        own[stack[-1]] += count
+        for function in set(stack):
+            inclusive[function] += count
+
+    def share(count):
+        return f"{count / total:6.1%}" if total else "   n/a"
+
+    cpu_seconds = total * SAMPLE_INTERVAL
+    lines = [
+        f"CPU profile of the event loop, {seconds}s, a sample every {SAMPLE_INTERVAL * 1000:g}ms of CPU time",
+        f"{total} samples, about {cpu_seconds:.1f}s of CPU time ({cpu_seconds / seconds:.0%} of one core)",
+        f"{share(sum(busy.values())).strip()} of samples running code, the rest waiting for events"
+        " while other threads used the CPU",
+        "",
+        f"Top {TOP_COUNT} functions by samples in the function itself:",
+        "   own   total  function",
+    ]
+    for function, count in own.most_common(TOP_COUNT):
+        lines.append(f"{share(count)}  {share(inclusive[function])}  {function}")
+    lines += ["", f"Top {TOP_COUNT} functions by samples in the function or what it called:"]
+    for function, count in inclusive.most_common(TOP_COUNT):
+        lines.append(f"{share(count)}  {function}")
+    lines += ["", f"Top {TOP_COUNT} stacks, innermost frame first:"]
+    for stack, count in busy.most_common(TOP_COUNT):
+        lines.append(f"{share(count)}  {stack[-1]}")
+        lines += [f"        {function}" for function in reversed(stack[:-1])]
+    lines += ["", "Folded stacks:"]
+    lines += [f"{';'.join(stack)} {count}" for stack, count in samples.most_common()]
+    return "\n".join(lines) + "\n"
+
+
+async def profile_memory(seconds):
+    """Compare what is allocated before and after a while with tracemalloc
+
+    Memory is only traced while profiling, unless it was already being traced, e.g. with PYTHONTRACEMALLOC.
+    Tracing slows down code that allocates a lot many times over, so the bot responds slowly until it's done.
+
+    Args:
+        seconds (float): how long to trace for
+
+    Returns:
+        str: report of the allocation sites that grew the most, with their tracebacks
+    """
+    started_tracing = not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    try:
+        before = tracemalloc.take_snapshot()
+        await asyncio.sleep(seconds)
+        after = tracemalloc.take_snapshot()
+        traced_size, peak_size = tracemalloc.get_traced_memory()
+    finally:
+        if started_tracing:
+            tracemalloc.stop()
+
+    # leave out the bookkeeping of tracemalloc itself
+    filters = [tracemalloc.Filter(False, tracemalloc.__file__)]
+    differences = after.filter_traces(filters).compare_to(
+        before.filter_traces(filters), "traceback"
+    )
+    growth = sum(difference.size_diff for difference in differences)
+    lines = [
+        f"Memory profile, {seconds}s, allocations traced with {TRACEMALLOC_FRAMES} frames each",
+        f"Traced memory {traced_size / 1024:.0f} KiB (peak {peak_size / 1024:.0f} KiB)"
+        + ("" if started_tracing else " since tracing was started before this profile"),
+        f"Grew by {growth / 1024:+.0f} KiB",
+        "",
+        f"Top {TOP_COUNT} allocation sites by growth, most recent call first:",
+    ]
+    for difference in differences[:TOP_COUNT]:
+        lines.append(
+            f"{difference.size_diff / 1024:+.1f} KiB in {difference.count_diff:+d} blocks"
+            f" ({difference.size / 1024:.1f} KiB in {difference.count} blocks now)"
+        )
+        lines += [f"    {line}" for line in difference.traceback.format(most_recent_first=True)]
+    return "\n".join(lines) + "\n"
+
+
+async def run_profile(kind, seconds, process_name):
+    """Take a CPU or memory profile of this process
+
+    Args:
+        kind (str): "cpu" or "memory"
+        seconds (float): how long to profile for, up to MAX_PROFILE_DURATION
+        process_name (str): name of the bot running in this process, for the report's file name
+
+    Raises:
+        ProfileError: if the kind or duration is invalid, or another profile is running
+
+    Returns:
+        tuple[str,str]: file name and contents of the report
+    """
+    global _running
+    if kind not in PROFILE_KINDS:
+        raise ProfileError(f"Unknown profile kind {kind!r}, use one of {', '.join(PROFILE_KINDS)}")
+    if not 1 <= seconds <= MAX_PROFILE_DURATION:
+        raise ProfileError(f"Profiles can last from 1 to {MAX_PROFILE_DURATION} seconds")
+    if _running:
+        raise ProfileError("A profile is already being taken, try again when it is done")
+    _running = True
+    logging.info(f"Taking a {seconds}s {kind} profile")
+    started = dt.datetime.now(dt.timezone.utc)
+    try:
+        if kind == "cpu":
+            report = await profile_cpu(seconds)
+        else:
+            report = await profile_memory(seconds)
+    finally:
+        _running = False
+    file_name = f"{process_name.replace(' ', '_')}-{kind}-{started:%Y%m%d-%H%M%S}.txt"
+    return file_name, report
+
+
+async def _handle_admin_connection(process_name, reader, writer):
+    """Take the profile asked for on an admin socket connection and send back the report
+
+    Args:
+        process_name (str): name of the bot running in this process
+        reader (asyncio.StreamReader): incoming side of the connection
+        writer (asyncio.StreamWriter): outgoing side of the connection
+    """
+    try:
+        request = json.loads(await reader.readline())
+        file_name, report = await run_profile(request["kind"], request["seconds"], process_name)
+        response = {"file_name": file_name, "report": report}
+    except (ValueError, KeyError, TypeError, ProfileError) as e:
+        response = {"error": str(e)}
+    try:
+        writer.write(json.dumps(response).encode() + b"\n")
+        await writer.drain()
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def serve_admin_socket(path, process_name):
+    """Take profiles asked for on a Unix socket until cancelled
+
+    Each connection sends one JSON line like {"kind": "cpu", "seconds": 30} and gets back one JSON line
+    with the "file_name" and "report", or an "error".
+
+    Args:
+        path (str): path of the socket file, only the user running the bot can connect
+        process_name (str): name of the bot running in this process
+    """
+    server = await start_private_unix_server(
+        functools.partial(_handle_admin_connection, process_name), path
+    )
+    async with server:
+        await server.serve_forever()
+
+
+async def request_profile(path, kind, seconds):
+    """Have the bot listening on an admin socket take a profile
+
+    Args:
+        path (str): path of the bot's admin socket
+        kind (str): "cpu" or "memory"
+        seconds (float): how long to profile for
+
+    Raises:
+        ProfileError: if the bot isn't listening or can't take the profile
+
+    Returns:
+        tuple[str,str]: file name and contents of the report
+    """
+    try:
+        reader, writer = await asyncio.open_unix_connection(path, limit=MAX_REPORT_SIZE)
+    except OSError as e:
+        raise ProfileError(f"Can't connect to the bot at {path}: {e}")
+    try:
+        writer.write(json.dumps({"kind": kind, "seconds": seconds}).encode() + b"\n")
+        await writer.drain()
+        line = await reader.readline()
+    finally:
+        writer.close()
+    if not line:
+        raise ProfileError("The bot closed the connection without sending a report")
+    response = json.loads(line)
+    if "error" in response:
+        raise ProfileError(response["error"])
+    return response["file_name"], response["report"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Profile a running bot through its admin socket and save the report"
+    )
+    parser.add_argument("socket", help="admin socket of the bot, e.g. results_checker_admin.sock")
+    parser.add_argument("kind", choices=PROFILE_KINDS)
+    parser.add_argument("seconds", type=float)
+    args = parser.parse_args()
+    started = time.monotonic()
+    try:
+        file_name, report = asyncio.run(request_profile(args.socket, args.kind, args.seconds))
+    except ProfileError as e:
+        sys.exit(str(e))
+    with open(file_name, "w") as f:
+        f.write(report)
+    print(f"Saved the report to {file_name} after {time.monotonic() - started:.0f}s")
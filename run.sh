@@ -1,5 +1,9 @@
 #!/bin/sh
 
 source venv/bin/activate
-python poll_results_checker.py &
-python poll_creator.py &
+if [ "$1" = "--shared-loop" ]; then
+    python main.py &
+else
+    python poll_results_checker.py &
+    python poll_creator.py &
+fi
@@ -0,0 +1,13 @@
+import importlib
+import os
+import sys
+
+# run from anywhere, the bot's modules are in the parent directory
+REPO_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIRECTORY)
+
+# the bot's modules read config.py, fall back to the example settings when there isn't one
+try:
+    importlib.import_module("config")
+except ModuleNotFoundError:
+    sys.modules["config"] = importlib.import_module("example_config")
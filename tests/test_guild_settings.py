@@ -0,0 +1,73 @@
+import pytest
+
+from guild_settings import InvalidSettingError
+from guild_settings import parse_setting
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("POLL_PASS_THRESHOLD", "1/0"),
+        ("POLL_PASS_THRESHOLD", "nan"),
+        ("POLL_PASS_THRESHOLD", "inf%"),
+        ("POLL_DURATION", "inf"),
+        ("POLL_DURATION", "infd"),
+        ("POLL_DURATION", "nan"),
+        ("POLL_DURATION", "1e400"),
+        ("POLL_DURATION", float("inf")),
+        ("MINIMUM_VOTES_FOR_POLL", "inf"),
+        ("MINIMUM_VOTES_FOR_POLL", "nan"),
+        ("PRIVILEGED_USER_VOTE_WEIGHT", "inf"),
+        ("PRIVILEGED_USER_VOTE_WEIGHT", float("inf")),
+        ("PRIVILEGED_USER_VOTE_WEIGHT", True),
+    ],
+)
+def test_rejects_non_finite_and_arithmetic_errors(name, value):
+    with pytest.raises(InvalidSettingError, match=f"^{name} must be"):
+        parse_setting(name, value)
+
+
+@pytest.mark.parametrize(
+    "name, value, expected",
+    [
+        ("POLL_PASS_THRESHOLD", "2/3", 2 / 3),
+        ("POLL_PASS_THRESHOLD", "75%", 0.75),
+        ("POLL_DURATION", "12h", 12 * 60 * 60),
+        ("MINIMUM_VOTES_FOR_POLL", "3", 3),
+        ("PRIVILEGED_USER_VOTE_WEIGHT", "0.5", 0.5),
+    ],
+)
+def test_parses_finite_values(name, value, expected):
+    assert parse_setting(name, value) == expected
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("ALLOWED_CHANNEL_IDS", ""),
+        ("ALLOWED_CHANNEL_IDS", "all"),
+        ("ALLOWED_CHANNEL_IDS", "<#12> #general"),
+        ("ALLOWED_CHANNEL_IDS", "chanel 12"),
+        ("PRIVILEGED_USER_IDS", "nobody"),
+    ],
+)
+def test_rejects_ids_with_typos_or_no_ids(name, value):
+    with pytest.raises(InvalidSettingError, match=f"^{name} must be"):
+        parse_setting(name, value)
+
+
+@pytest.mark.parametrize(
+    "name, value, expected",
+    [
+        ("ALLOWED_CHANNEL_IDS", "<#12> <#34>", {12, 34}),
+        ("ALLOWED_CHANNEL_IDS", "<#12><#34>", {12, 34}),
+        ("ALLOWED_CHANNEL_IDS", "12, 34", {12, 34}),
+        ("ALLOWED_CHANNEL_IDS", " none ", set()),
+        ("ALLOWED_CHANNEL_IDS", [12, 34], {12, 34}),
+        ("ALLOWED_CHANNEL_IDS", [], set()),
+        ("PRIVILEGED_USER_IDS", "<@12> <@!34>", {12, 34}),
+        ("PRIVILEGED_USER_IDS", "None", set()),
+    ],
+)
+def test_parses_ids_and_mentions(name, value, expected):
+    assert parse_setting(name, value) == frozenset(expected)
@@ -0,0 +1,41 @@
+import os
+
+import pytest
+
+import image_cache
+from tests.test_utils import encode
+from tests.test_utils import make_noise_image
+
+
+@pytest.fixture
+def cache_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_DIRECTORY", str(tmp_path))
+    monkeypatch.setattr(image_cache, "IMAGE_CACHE_MAX_SIZE", 100)
+    monkeypatch.setattr(image_cache, "get_active_image_hashes", lambda: set())
+    return tmp_path
+
+
+def test_save_image_evicts_older_images(cache_directory):
+    old_hash = image_cache.save_image(b"a" * 60)
+    os.utime(image_cache.get_image_path(old_hash), (0, 0))
+    new_hash = image_cache.save_image(b"b" * 60)
+    assert image_cache.load_image(old_hash) is None
+    assert image_cache.load_image(new_hash) == b"b" * 60
+
+
+def test_save_image_keeps_the_image_it_saved(cache_directory):
+    # the new image alone is over the limit and no poll references it yet
+    image_hash = image_cache.save_image(b"c" * 150)
+    assert image_cache.load_image(image_hash) == b"c" * 150
+
+
+@pytest.mark.parametrize("image_format", ["GIF", "WEBP"])
+def test_is_animated_image_reads_the_frames_not_the_url(image_format):
+    frames = [make_noise_image((32, 32)) for _ in range(3)]
+    animated = encode(frames[0], image_format, save_all=True, append_images=frames[1:])
+    assert image_cache.is_animated_image(animated)
+    assert not image_cache.is_animated_image(encode(make_noise_image(), image_format))
+
+
+def test_is_animated_image_refuses_what_isnt_an_image():
+    assert image_cache.is_animated_image(b"<html></html>") is None
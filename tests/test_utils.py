@@ -0,0 +1,78 @@
+import asyncio
+import os
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from benchmarks.fakes import FakeReaction
+from utils import ImageTooLargeError
+from utils import fetch_reaction_user_ids
+from utils import fit_animated_image
+from utils import fit_any_image
+from utils import fit_image
+from utils import is_animated_image_url
+
+
+def make_noise_image(size=(64, 64)):
+    # random pixels barely compress, so the encoded size is easy to push over a limit
+    return Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+
+
+def encode(image, image_format="PNG", **kwargs):
+    output = BytesIO()
+    image.save(output, format=image_format, **kwargs)
+    return output.getvalue()
+
+
+def make_noise_animation(frames=3, size=(32, 32)):
+    images = [make_noise_image(size) for _ in range(frames)]
+    return encode(images[0], "GIF", save_all=True, append_images=images[1:])
+
+
+def test_fit_image_fits_area_and_file_size():
+    fitted = fit_image(encode(make_noise_image((128, 128))), 32 * 32, 2000)
+    assert len(fitted) <= 2000
+    image = Image.open(BytesIO(fitted))
+    assert image.width * image.height <= 32 * 32
+
+
+def test_fit_image_raises_when_a_pixel_is_still_too_large():
+    with pytest.raises(ImageTooLargeError):
+        fit_image(encode(make_noise_image()), 64 * 64, 10)
+
+
+def test_fit_animated_image_raises_when_a_pixel_is_still_too_large():
+    image = Image.open(BytesIO(make_noise_animation()))
+    with pytest.raises(ImageTooLargeError):
+        fit_animated_image(image, 32 * 32, 10)
+
+
+def test_fit_any_image_keeps_animations_animated():
+    fitted, animated = fit_any_image(make_noise_animation(), 16 * 16, 256000)
+    assert animated
+    assert getattr(Image.open(BytesIO(fitted)), "is_animated", False)
+
+
+@pytest.mark.parametrize(
+    "url, animated",
+    [
+        ("https://example.com/party.gif", True),
+        ("https://example.com/party.png?size=96", False),
+        ("https://cdn.discordapp.com/emojis/1.webp?size=96&animated=true", True),
+        ("https://cdn.discordapp.com/emojis/1.webp?size=96", False),
+    ],
+)
+def test_is_animated_image_url(url, animated):
+    assert is_animated_image_url(url) == animated
+
+
+@pytest.mark.parametrize(
+    "voters, stale_count, pages", [(0, 5, 1), (99, 0, 1), (100, 100, 2), (250, 3, 3)]
+)
+def test_fetch_reaction_user_ids_counts_the_pages_fetched(voters, stale_count, pages):
+    reaction = FakeReaction("👍", list(range(1, voters + 1)))
+    reaction.count = stale_count
+    user_ids = []
+    assert asyncio.run(fetch_reaction_user_ids(reaction, user_ids)) == pages
+    assert sorted(user_ids) == list(range(1, voters + 1))
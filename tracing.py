@@ -0,0 +1,157 @@
+import contextlib
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import time
+
+from config import SLOW_INTERACTION_THRESHOLD
+from config import TRACE_EXPORT_FILE
+
+# trace of the interaction being handled, tasks started while handling it inherit it
+_current_trace = contextvars.ContextVar("current_trace", default=None)
+
+
+class Trace:
+    """Timings of the named steps taken to handle one interaction"""
+
+    def __init__(self, name, attributes):
+        """
+        Args:
+            name (str): what is being handled, e.g. the command name
+            attributes (dict): details saved with the trace, e.g. the guild ID
+        """
+        self.name = name
+        self.attributes = attributes
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        # (step name, seconds from the start of the trace, duration in seconds)
+        self.spans = []
+        self.duration = None
+        self.error = None
+
+    def add_span(self, name, started, ended):
+        """Record a step
+
+        Args:
+            name (str): name of step
+            started (float): time.monotonic() when the step started
+            ended (float): time.monotonic() when the step ended
+        """
+        if self.duration is not None:
+            # background work outliving the interaction, e.g. an image still processing
+            return
+        self.spans.append((name, started - self._started, ended - started))
+
+    def finish(self):
+        self.duration = time.monotonic() - self._started
+
+    def summary(self):
+        """Describe the steps for a log line
+
+        Returns:
+            str: e.g. "check_user_reached_limit 1ms, create_poll_message 840ms"
+        """
+        return ", ".join(
+            f"{name} {duration * 1000:.0f}ms" for name, _, duration in self.spans
+        )
+
+    def as_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration": self.duration,
+            "error": self.error,
+            "attributes": self.attributes,
+            "spans": [
+                {"name": name, "offset": offset, "duration": duration}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+@contextlib.contextmanager
+def start_trace(name, **attributes):
+    """Trace the steps taken inside the block, logging it if slow and exporting it if TRACE_EXPORT_FILE is set
+
+    Args:
+        name (str): what is being handled, e.g. the command name
+        **attributes: details saved with the trace, e.g. the guild ID
+
+    Yields:
+        Trace: the trace
+    """
+    trace = Trace(name, attributes)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except Exception as e:
+        trace.error = repr(e)
+        raise
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+        finish_trace(trace)
+
+
+def finish_trace(trace):
+    """Log a finished trace if it was slow and export it
+
+    Args:
+        trace (Trace): finished trace
+    """
+    if trace.duration >= SLOW_INTERACTION_THRESHOLD:
+        logging.warning(
+            f"Slow interaction {trace.name} took {trace.duration * 1000:.0f}ms: {trace.summary()}"
+        )
+    if TRACE_EXPORT_FILE is not None:
+        try:
+            with open(TRACE_EXPORT_FILE, "a") as f:
+                f.write(json.dumps(trace.as_dict()) + "\n")
+        except OSError as e:
+            logging.warning(f"Failed to export trace: {e}")
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the block as a step of the current trace, does nothing outside of a trace
+
+    Args:
+        name (str): name of step
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        trace.add_span(name, started, time.monotonic())
+
+
+def traced(func):
+    """Time every call of a function as a step of the current trace, named after the function
+
+    Args:
+        func (Callable): function or coroutine function
+
+    Returns:
+        Callable: wrapped function
+    """
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(func.__name__):
+                return await func(*args, **kwargs)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(func.__name__):
+                return func(*args, **kwargs)
+
+    return wrapper
@@ -1,22 +1,26 @@
 import datetime as dt
-import os
+import functools
+import logging
 import re
-from collections import Counter
+import resource
+import time
+from collections import namedtuple
 from io import BytesIO
+from urllib.parse import parse_qs
+from urllib.parse import urlsplit
 
 import discord
-import requests
 from PIL import Image
+from PIL import ImageSequence
 
-from config import ACTIVE_POLLS_PER_USER_LIMIT
-from config import MINIMUM_VOTES_FOR_POLL
 from config import NITRO_USER_VOTING_WEIGHT_FUNCTION
 from config import POLL_NO_EMOJI
-from config import POLL_PASS_THRESHOLD
 from config import POLL_YES_EMOJI
-from config import PRIVILEGED_USER_IDS
-from config import PRIVILEGED_USER_VOTE_WEIGHT
-from config import TEMP_IMAGE_FILE_NAME
+from guild_settings import get_guild_settings
+from metrics import Histogram
+
+# roughly when the process started, utils is imported by every bot module before it does any work
+PROCESS_STARTED_AT = time.monotonic()
 
 
 def validate_emoji_name(name: str):
@@ -41,7 +45,188 @@ def validate_image_url(url: str):
     Returns:
         boolean: True if valid, False if not
     """
-    return re.match(r"^https?://.+?\.(png|jpg|jpeg|PNG|JPG|JPEG)$", url) is not None
+    return (
+        re.match(r"^https?://.+?\.(png|jpg|jpeg|gif|webp|apng)$", url, re.IGNORECASE)
+        is not None
+    )
+
+
+def is_animated_image_url(url: str):
+    """Guess if an image URL is animated, for when the image hasn't been downloaded yet
+
+    Any WebP can be animated, Discord's CDN marks animated ones with `?animated=true`.
+
+    Args:
+        url (str): URL to check
+
+    Returns:
+        boolean: True if the URL is probably an animated image
+    """
+    parts = urlsplit(url)
+    if parts.path.lower().endswith((".gif", ".apng")):
+        return True
+    return parse_qs(parts.query).get("animated", [""])[-1].lower() == "true"
+
+
+# reactions are listed 100 users per request
+REACTION_USERS_PER_PAGE = 100
+
+VOTE_FETCH_SECONDS = Histogram(
+    "poll_vote_fetch_seconds", "Time to page through the reactions of a poll"
+)
+VOTE_FETCH_PAGES = Histogram(
+    "poll_vote_fetch_pages",
+    "Reaction pages requested to count a poll",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+
+async def get_voter_ids(message: discord.Message):
+    """Get the IDs of everyone who voted on a poll by paging through its reactions
+
+    Args:
+        message (discord.Message): message object of the poll
+
+    Returns:
+        List[int], List[int]: IDs of users who voted for and IDs of users who voted against
+    """
+    started = time.monotonic()
+    yes_voter_ids = []
+    no_voter_ids = []
+    pages = 0
+    for reaction in message.reactions:
+        if reaction.emoji == POLL_YES_EMOJI:
+            voter_ids = yes_voter_ids
+        elif reaction.emoji == POLL_NO_EMOJI:
+            voter_ids = no_voter_ids
+        else:
+            continue
+        pages += await fetch_reaction_user_ids(reaction, voter_ids)
+    VOTE_FETCH_SECONDS.observe(time.monotonic() - started)
+    VOTE_FETCH_PAGES.observe(pages)
+    return (yes_voter_ids, no_voter_ids)
+
+
+async def fetch_reaction_user_ids(reaction: discord.Reaction, user_ids):
+    """Page through the users of a reaction until Discord returns a short page
+
+    Each page is its own request, so the pages counted are the ones actually fetched, and a stale
+    reaction.count (which the library would otherwise stop at) doesn't cut the list short.
+
+    Args:
+        reaction (discord.Reaction): reaction to page through
+        user_ids (List[int]): list the IDs of the users are appended to
+
+    Returns:
+        int: number of pages fetched
+    """
+    pages = 0
+    after = None
+    while True:
+        page = [
+            user.id
+            async for user in reaction.users(limit=REACTION_USERS_PER_PAGE, after=after)
+        ]
+        pages += 1
+        user_ids.extend(page)
+        if len(page) < REACTION_USERS_PER_PAGE:
+            return pages
+        # pages are ordered by user ID
+        after = discord.Object(id=max(page))
+
+
+class VoteTally(
+    namedtuple(
+        "VoteTally", ["yes_votes", "no_votes", "yes_count", "no_count", "breakdown"]
+    )
+):
+    """Result of weighting a poll's votes
+
+    yes_votes/no_votes are the raw number of voters, yes_count/no_count the weighted votes.
+    breakdown maps "yes"/"no" to how many of those voters were privileged or boosting and how
+    much extra weight each category added.
+    """
+
+    __slots__ = ()
+
+
+@functools.lru_cache(maxsize=None)
+def get_nitro_vote_weight(days_boosting: int):
+    """Get the extra weight of a booster's vote, memoized since many voters share a boosting age
+
+    Args:
+        days_boosting (int): days the voter has been boosting the server
+
+    Returns:
+        float: extra weight of the vote
+    """
+    return NITRO_USER_VOTING_WEIGHT_FUNCTION(days_boosting)
+
+
+def tally_votes(
+    yes_voter_ids, no_voter_ids, self_bot_id: int, guild: discord.Guild, now=None
+):
+    """Weight the votes of a poll in one pass
+
+    Every voter is weighted once, even if they voted both ways.
+
+    Args:
+        yes_voter_ids (Iterable[int]): IDs of users who voted for
+        no_voter_ids (Iterable[int]): IDs of users who voted against
+        self_bot_id (int): ID of the bot running the check (to ignore its own reactions)
+        guild (discord.guild): Guild object representing the server
+        now (datetime.datetime, optional): time to measure boosting age against. Defaults to now.
+
+    Returns:
+        VoteTally: raw and weighted votes
+    """
+    if now is None:
+        now = dt.datetime.now(dt.timezone.utc)
+    settings = get_guild_settings(guild.id)
+    yes_voter_ids = set(yes_voter_ids)
+    yes_voter_ids.discard(self_bot_id)
+    no_voter_ids = set(no_voter_ids)
+    no_voter_ids.discard(self_bot_id)
+
+    # nitro extra weight for each voter that is boosting the server
+    nitro_weights = {}
+    for user_id in yes_voter_ids | no_voter_ids:
+        member = guild.get_member(user_id)
+        if member is not None and member.premium_since is not None:
+            nitro_weights[user_id] = get_nitro_vote_weight(
+                abs((now - member.premium_since).days)
+            )
+
+    counts = []
+    breakdown = {}
+    for side, voter_ids in (("yes", yes_voter_ids), ("no", no_voter_ids)):
+        side_breakdown = {
+            "privileged": 0,
+            "privileged_weight": 0,
+            "nitro": 0,
+            "nitro_weight": 0,
+        }
+        for user_id in voter_ids:
+            if user_id in settings.privileged_user_ids:
+                side_breakdown["privileged"] += 1
+                side_breakdown["privileged_weight"] += settings.privileged_user_vote_weight
+            if user_id in nitro_weights:
+                side_breakdown["nitro"] += 1
+                side_breakdown["nitro_weight"] += nitro_weights[user_id]
+        counts.append(
+            len(voter_ids)
+            + side_breakdown["privileged_weight"]
+            + side_breakdown["nitro_weight"]
+        )
+        breakdown[side] = side_breakdown
+
+    return VoteTally(
+        yes_votes=len(yes_voter_ids),
+        no_votes=len(no_voter_ids),
+        yes_count=counts[0],
+        no_count=counts[1],
+        breakdown=breakdown,
+    )
 
 
 async def get_votes(message: discord.Message, self_bot_id: int, guild: discord.Guild):
@@ -55,48 +240,9 @@ async def get_votes(message: discord.Message, self_bot_id: int, guild: discord.G
     Returns:
         int, int: (weighted) number of votes for and number of votes against
     """
-    yes_count = 0
-    no_count = 0
-    for reaction in message.reactions:
-        if reaction.emoji == POLL_YES_EMOJI:
-            async for user in reaction.users():
-                if user.id == self_bot_id:
-                    continue
-                elif user.id in PRIVILEGED_USER_IDS:
-                    yes_count += 1 + PRIVILEGED_USER_VOTE_WEIGHT
-                else:
-                    yes_count += 1
-                member = guild.get_member(user.id)
-                if member is not None:
-                    if member.premium_since is not None:
-                        yes_count += NITRO_USER_VOTING_WEIGHT_FUNCTION(
-                            abs(
-                                (
-                                    dt.datetime.now(dt.timezone.utc)
-                                    - member.premium_since
-                                ).days
-                            )
-                        )
-        elif reaction.emoji == POLL_NO_EMOJI:
-            async for user in reaction.users():
-                if user.id == self_bot_id:
-                    continue
-                elif user.id in PRIVILEGED_USER_IDS:
-                    no_count += 1 + PRIVILEGED_USER_VOTE_WEIGHT
-                else:
-                    no_count += 1
-                member = guild.get_member(user.id)
-                if member is not None:
-                    if member.premium_since is not None:
-                        no_count += NITRO_USER_VOTING_WEIGHT_FUNCTION(
-                            abs(
-                                (
-                                    dt.datetime.now(dt.timezone.utc)
-                                    - member.premium_since
-                                ).days
-                            )
-                        )
-    return (yes_count, no_count)
+    yes_voter_ids, no_voter_ids = await get_voter_ids(message)
+    tally = tally_votes(yes_voter_ids, no_voter_ids, self_bot_id, guild)
+    return (tally.yes_count, tally.no_count)
 
 
 async def get_poll_result(
@@ -111,14 +257,15 @@ async def get_poll_result(
         no_count (int, Optional): number of votes for no, if already pre-calculated
 
     Returns:
-        boolean: True if poll passes, False if not. Based on POLL_PASS_THRESHOLD in config.py
+        boolean: True if poll passes, False if not. Based on the guild's POLL_PASS_THRESHOLD
     """
     if yes_count is None and no_count is None:
         yes_count, no_count = await get_votes(message, self_bot_id, message.guild)
-    if yes_count + no_count < MINIMUM_VOTES_FOR_POLL or yes_count + no_count == 0:
+    settings = get_guild_settings(message.guild.id)
+    if yes_count + no_count < settings.minimum_votes_for_poll or yes_count + no_count == 0:
         return False
     else:
-        if yes_count / (yes_count + no_count) >= POLL_PASS_THRESHOLD:
+        if yes_count / (yes_count + no_count) >= settings.poll_pass_threshold:
             return True
         else:
             return False
@@ -130,6 +277,7 @@ async def get_print_string_for_poll_result(
     poll_type: str,
     yes_count=None,
     no_count=None,
+    name=None,
 ):
     """Get a string to print for the result of a poll
 
@@ -139,31 +287,35 @@ async def get_print_string_for_poll_result(
         poll_type (str): string indicating the poll type, e.g. "changeemoji"
         yes_count (int, Optional): number of votes for yes, if already pre-calculated
         no_count (int, Optional): number of votes for no, if already pre-calculated
+        name (str, Optional): name of the emoji/sticker, read from the poll message if not given
 
     Returns:
         str: string to print
     """
+    if name is None:
+        name = get_emoji_name_from_poll_message(message)
 
-    poll_short_title = f"***Poll to {pretty_poll_type(poll_type)} `{get_emoji_name_from_poll_message(message)}` results***:\n"
+    poll_short_title = f"***Poll to {pretty_poll_type(poll_type)} `{name}` results***:\n"
 
     if yes_count is None and no_count is None:
         yes_count, no_count = await get_votes(message, self_bot_id, message.guild)
-    if yes_count + no_count < MINIMUM_VOTES_FOR_POLL or yes_count + no_count == 0:
-        return f"Poll didn't reach the minimum number of votes ({MINIMUM_VOTES_FOR_POLL}) to pass. Had only {round(yes_count + no_count,2)} vote(s)."
+    settings = get_guild_settings(message.guild.id)
+    if yes_count + no_count < settings.minimum_votes_for_poll or yes_count + no_count == 0:
+        return f"Poll didn't reach the minimum number of votes ({settings.minimum_votes_for_poll}) to pass. Had only {round(yes_count + no_count,2)} vote(s)."
     result = display_percent_str(yes_count / (yes_count + no_count))
-    poll_passed = await get_poll_result(message, self_bot_id)
+    poll_passed = await get_poll_result(message, self_bot_id, yes_count, no_count)
     if poll_passed:
         return (
             poll_short_title
             + f"Poll passed with {round(yes_count,2)} vote(s) for and {round(no_count,2)} vote(s) against, leading to a {result} show in favor, above the threshold of "
-            + display_percent_str(POLL_PASS_THRESHOLD)
+            + display_percent_str(settings.poll_pass_threshold)
             + " needed to pass."
         )
     else:
         return (
             poll_short_title
             + f"Poll failed with {round(yes_count,2)} vote(s) for and {round(no_count,2)} vote(s) against, leading to a {result} show in favor, below the threshold of "
-            + display_percent_str(POLL_PASS_THRESHOLD)
+            + display_percent_str(settings.poll_pass_threshold)
             + " needed to pass."
         )
 
@@ -184,50 +336,203 @@ def get_emoji_name_from_poll_message(message: discord.Message, new=False):
         return message.embeds[0].title.split(":")[2]
 
 
-def make_and_resize_image_from_url(
-    url, max_size_px, max_size_bytes, output_file_name=TEMP_IMAGE_FILE_NAME
-):
-    """Resize an image to a maximum size
+def get_poll_metadata_from_message(message: discord.Message, poll_type: str):
+    """Get the details of a poll from its message, for polls saved without them
+
+    Args:
+        message (discord.Message): message object of the poll
+        poll_type (str): string indicating the poll type, e.g. "renameemoji"
+
+    Returns:
+        str, str, str: name of emoji/sticker, new name (None unless renaming), URL of the poll image
+    """
+    new_name = None
+    if poll_type.startswith("rename"):
+        new_name = get_emoji_name_from_poll_message(message, new=True)
+    return (
+        get_emoji_name_from_poll_message(message),
+        new_name,
+        message.embeds[0].image.url,
+    )
+
+
+class ImageTooLargeError(Exception):
+    """Raised when an image is still over the file size limit at the smallest size it can be shrunk to"""
+
+
+def encode_resized_image(image, scale):
+    """Resample an image from the original and encode it as a PNG
+
+    Args:
+        image (PIL.Image.Image): decoded original image
+        scale (float): factor to scale both dimensions by
+
+    Returns:
+        bytes: PNG file contents
+    """
+    if scale < 1:
+        image = image.resize(
+            (max(int(image.width * scale), 1), max(int(image.height * scale), 1)),
+            Image.LANCZOS,
+        )
+    output = BytesIO()
+    image.save(output, format="PNG", optimize=True)
+    return output.getvalue()
+
+
+def fit_image(image_bytes, max_size_px, max_size_bytes):
+    """Shrink an image as little as possible so it fits a maximum area and file size
+
+    The image is decoded once, then a binary search on the scale finds the largest
+    size that fits, resampling from the original at every step.
 
     Args:
-        url (str): URL of image
+        image_bytes (bytes): contents of the downloaded image file
         max_size_px (int): maximum size of image in pixels
         max_size_bytes (int): maximum size of image in bytes
-        output_file_name (str): name of output file that temporary image will be saved as
+
+    Raises:
+        ImageTooLargeError: if the image is over max_size_bytes even when shrunk to a pixel
+
+    Returns:
+        bytes: PNG file contents
     """
-    image_bytes = BytesIO(requests.get(url).content)
+    image = Image.open(BytesIO(image_bytes))
+    image.load()
+    if image.mode not in ("1", "L", "LA", "P", "RGB", "RGBA"):
+        image = image.convert("RGBA")
+
+    # largest scale allowed by the area limit
+    high = min(1, (max_size_px / (image.width * image.height)) ** 0.5)
+    fitted = encode_resized_image(image, high)
+    if len(fitted) <= max_size_bytes:
+        return fitted
+
+    # search for the largest scale that also fits the file size limit,
+    # until the bounds are less than a pixel apart
+    low = 0
+    fitted = None
+    while (high - low) * max(image.width, image.height) >= 1:
+        scale = (low + high) / 2
+        encoded = encode_resized_image(image, scale)
+        if len(encoded) <= max_size_bytes:
+            fitted = encoded
+            low = scale
+        else:
+            high = scale
+    if fitted is None:
+        fitted = encode_resized_image(image, low)
+        if len(fitted) > max_size_bytes:
+            raise ImageTooLargeError(
+                f"image is {len(fitted)} bytes at its smallest size, over the limit of {max_size_bytes}"
+            )
+    return fitted
 
-    full_output_file_name = output_file_name + ".png"
-    Image.open(image_bytes).save(full_output_file_name, format="PNG")
-    img = Image.open(full_output_file_name)
 
-    while (
-        img.width * img.height > max_size_px
-        or os.path.getsize(full_output_file_name) > max_size_bytes
-    ):
-        img = img.resize((img.width // 2, img.height // 2))
-        img.save(full_output_file_name, format="PNG")
-        img = Image.open(
-            full_output_file_name
-        )  # just to be safe that file and the object are in sync
+# palette sizes and how many frames to keep (every n-th) tried at each scale, best quality first
+ANIMATION_QUALITY_STEPS = [(256, 1), (128, 1), (64, 2), (32, 3)]
+# how much to shrink an animation when no quality step fits
+ANIMATION_SCALE_STEP = 0.75
 
-    img.save(full_output_file_name, format="PNG")
 
+def encode_resized_animation(image, scale, colors, frame_step, image_format):
+    """Resample every kept frame of an animation from the original and encode them
 
-def get_existing_emoji_by_name(name, existing_emojis):
-    """Get an existing emoji (or sticker) by name
+    Frames are decoded one at a time and only their resized, quantized copies are kept.
+    Dropped frames have their duration merged into the previous kept frame.
 
     Args:
-        name (str): name of emoji/sticker
-        existing_emojis (list[Union(interaction.Emoji,discord.Emoji)]): list of existing emojis/stickers
+        image (PIL.Image.Image): opened original animation
+        scale (float): factor to scale both dimensions by
+        colors (int): number of colors in each frame's palette
+        frame_step (int): keep every frame_step-th frame
+        image_format (str): "GIF" or "PNG" (APNG)
+
+    Returns:
+        bytes: animated image file contents
     """
-    existing_emoji_names = [emoji.name for emoji in existing_emojis]
-    if name not in existing_emoji_names:
-        return None
-    else:
-        for existing_emoji in existing_emojis:
-            if existing_emoji.name == name:
-                return existing_emoji
+    size = (max(int(image.width * scale), 1), max(int(image.height * scale), 1))
+    frames = []
+    durations = []
+    for index, frame in enumerate(ImageSequence.Iterator(image)):
+        duration = frame.info.get("duration", 100)
+        if index % frame_step != 0:
+            durations[-1] += duration
+            continue
+        frame = frame.convert("RGBA")
+        if scale < 1:
+            frame = frame.resize(size, Image.LANCZOS)
+        # keep the reduced colors as RGBA so the encoder can handle transparency and frame palettes
+        frame = frame.quantize(colors, method=Image.Quantize.FASTOCTREE)
+        frames.append(frame.convert("RGBA"))
+        durations.append(duration)
+    output = BytesIO()
+    frames[0].save(
+        output,
+        format=image_format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        loop=image.info.get("loop", 0),
+        disposal=2,
+    )
+    return output.getvalue()
+
+
+def fit_animated_image(image, max_size_px, max_size_bytes, image_format="GIF"):
+    """Shrink an animation until it fits a maximum area and file size
+
+    At each scale, smaller palettes and fewer frames are tried before shrinking further.
+
+    Args:
+        image (PIL.Image.Image): opened original animation
+        max_size_px (int): maximum size of image in pixels
+        max_size_bytes (int): maximum size of image in bytes
+        image_format (str, optional): "GIF" or "PNG" (APNG). Defaults to "GIF".
+
+    Raises:
+        ImageTooLargeError: if the animation is over max_size_bytes even when shrunk to a pixel
+
+    Returns:
+        bytes: animated image file contents
+    """
+    scale = min(1, (max_size_px / (image.width * image.height)) ** 0.5)
+    while True:
+        for colors, frame_step in ANIMATION_QUALITY_STEPS:
+            encoded = encode_resized_animation(
+                image, scale, colors, frame_step, image_format
+            )
+            if len(encoded) <= max_size_bytes:
+                return encoded
+        if max(image.width, image.height) * scale < 1:
+            raise ImageTooLargeError(
+                f"animation is {len(encoded)} bytes at its smallest size, over the limit of {max_size_bytes}"
+            )
+        scale *= ANIMATION_SCALE_STEP
+
+
+def fit_any_image(image_bytes, max_size_px, max_size_bytes, animation_format="GIF"):
+    """Fit an image to a maximum area and file size, keeping it animated if it is
+
+    Args:
+        image_bytes (bytes): contents of the downloaded image file
+        max_size_px (int): maximum size of image in pixels
+        max_size_bytes (int): maximum size of image in bytes
+        animation_format (str, optional): format of animated results, "GIF" or "PNG" (APNG). Defaults to "GIF".
+
+    Raises:
+        ImageTooLargeError: if the image can't be shrunk enough to fit max_size_bytes
+
+    Returns:
+        bytes, boolean: fitted image file contents, whether the image is animated
+    """
+    image = Image.open(BytesIO(image_bytes))
+    if getattr(image, "is_animated", False):
+        return (
+            fit_animated_image(image, max_size_px, max_size_bytes, animation_format),
+            True,
+        )
+    return (fit_image(image_bytes, max_size_px, max_size_bytes), False)
 
 
 def get_emoji_formatted_str(emoji):
@@ -293,53 +598,101 @@ def pretty_poll_type(poll_type):
     return pretty_name
 
 
-def count_poll_creator_ids(guild_id, channel_id):
-    """Gives a count of active polls created by user ids
+# discord's limit on the length of a message
+MAX_MESSAGE_LENGTH = 2000
+
+DIGEST_HEADER = "Here's an update on currently active polls:\n"
+EMPTY_DIGEST = "There are no active polls right now."
+
+
+def paginate_lines(header, lines, max_length=MAX_MESSAGE_LENGTH):
+    """Split lines into as few messages as possible without breaking a line across messages
 
     Args:
-        guild_id (int/str): discord server id
-        channel_id (int/str): discord channel id
+        header (str): text at the start of the first message
+        lines (list[str]): lines to split, each ending in a newline
+        max_length (int, optional): maximum length of a message. Defaults to MAX_MESSAGE_LENGTH.
 
     Returns:
-        dict[int,int]: dictionary of how many active polls each user id has created
+        list[str]: messages
     """
-    id_counter = Counter()
-
-    path = f"active_polls/{guild_id}/{channel_id}"
+    pages = []
+    page = [header]
+    page_length = len(header)
+    for line in lines:
+        if page_length + len(line) > max_length and page_length > 0:
+            pages.append("".join(page))
+            page = []
+            page_length = 0
+        page.append(line)
+        page_length += len(line)
+    pages.append("".join(page))
+    return pages
+
+
+def format_poll_line(poll, show_creator=False):
+    """Describe an active poll in one line of a poll listing
 
-    # Iterate over every file in the directory
-    for filename in os.listdir(path):
-        file_path = os.path.join(path, filename)
+    Args:
+        poll (poll_store.Poll): active poll
+        show_creator (bool, optional): mention the creator of the poll. Defaults to False.
 
-        # Check if the current path is a file
-        if os.path.isfile(file_path):
-            with open(file_path, "r") as file:
-                content = file.read().strip()
+    Returns:
+        str: line ending in a newline
+    """
+    name = f" `{poll.target_name}`" if poll.target_name is not None else ""
+    creator = f" by <@{poll.creator_id}>" if show_creator else ""
+    return "> https://discord.com/channels/{}/{}/{} {}{}{} closes <t:{}:R>\n".format(
+        poll.guild_id,
+        poll.channel_id,
+        poll.message_id,
+        pretty_poll_type(poll.poll_type),
+        name,
+        creator,
+        int(poll.expires_at),
+    )
+
+
+def build_poll_digests(polls):
+    """Build the digest of active polls of every channel from the stored poll details
 
-                # Assign an ID of zero for empty files
-                if content == "":
-                    id_counter[0] += 1
-                else:
-                    # Assume the file contains a single numeric ID
-                    id_counter[int(content)] += 1
+    Args:
+        polls (List[poll_store.Poll]): active polls
 
-    return dict(id_counter)
+    Returns:
+        dict[int,list[str]]: pages of the digest of each channel with active polls
+    """
+    channels_to_lines = {}
+    for poll in sorted(polls, key=lambda poll: poll.expires_at):
+        channels_to_lines.setdefault(poll.channel_id, []).append(format_poll_line(poll))
+    return {
+        channel_id: paginate_lines(DIGEST_HEADER, lines)
+        for channel_id, lines in channels_to_lines.items()
+    }
 
 
-def check_if_user_reach_poll_limit(guild_id, channel_id, user_id):
-    """Check if a user has reach the limit on active polls they can make at a time
+def get_shard_id(guild_id, shard_count):
+    """Get the shard a guild's gateway events are sent to
 
     Args:
-        guild_id (int/str): discord server id
-        channel_id (int/str): discord channel id
-        user_id (int): id of the user to check
+        guild_id (int): ID of guild
+        shard_count (int): total number of shards the bot runs
 
     Returns:
-        bool: True if reached the limit
+        int: ID of shard
     """
-    id_counter_dict = count_poll_creator_ids(guild_id, channel_id)
+    return (int(guild_id) >> 22) % shard_count
 
-    try:
-        return id_counter_dict[user_id] >= ACTIVE_POLLS_PER_USER_LIMIT
-    except KeyError:
-        return False
+
+def log_startup_stats(name):
+    """Log how long a bot took to get ready and the peak memory use of its process so far
+
+    Args:
+        name (str): name of the bot that just got ready
+    """
+    # ru_maxrss is in kilobytes on Linux
+    peak_memory_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    logging.info(
+        f"{name} ready {time.monotonic() - PROCESS_STARTED_AT:.1f}s after start, "
+        f"peak memory of the process {peak_memory_mb:.0f} MB"
+    )